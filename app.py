@@ -93,6 +93,9 @@ rstudio_container_memory_in_gb = int(
 if rstudio_container_memory_in_gb is None:
     raise ValueError("Please pass rstudio container memory for your install type")
 
+# Without a number of vCPUs, the cheapest Fargate size with the memory is used
+rstudio_container_cpu = float(app.node.try_get_context("rstudio_container_cpu") or 0)
+
 number_of_rstudio_containers = int(
     app.node.try_get_context("number_of_rstudio_containers")
 )
@@ -129,7 +132,12 @@ athena_output_bucket_name = f"{datalake_source_bucket_name}-athena-output-{insta
 athena_workgroup_name = f"rstudio-wg-{instance}"
 datasync_function_name = f"trigger-datasync-task-{instance}"
 lambda_datasync_trigger_function_arn = f"arn:aws:lambda:{env.region}:{rstudio_account_id}:function:{datasync_function_name}"
+datasync_trigger_queue_name = f"trigger-datasync-queue-{instance}"
+datasync_trigger_queue_arn = (
+    f"arn:aws:sqs:{env.region}:{rstudio_account_id}:{datasync_trigger_queue_name}"
+)
 datasync_task_arn_ssm_param_name = f"/{instance}/rstudio-datasync-taskarn"
+datasync_hourly_task_arn_ssm_param_name = f"/{instance}/rstudio-datasync-hourly-taskarn"
 ssm_cross_account_role_name = f"ssm-cross-account-role-{instance}"
 ssm_cross_account_lambda_role_name = f"get-ssm-parameter-lambda-role-{instance}"
 rstudio_container_repository_name = f"{code_repo_name}_rstudio_image_{instance}"
@@ -163,6 +171,7 @@ shiny_max_capacity = int(param_vals["Parameters"]["shiny_max_capacity"])
 shiny_container_memory_in_gb = int(
     param_vals["Parameters"]["shiny_container_memory_in_gb"]
 )
+shiny_container_cpu = float(param_vals["Parameters"]["shiny_container_cpu"])
 rstudio_container_memory_reserved = int(
     param_vals["Parameters"]["rstudio_container_memory_reserved"]
 )
@@ -206,6 +215,76 @@ home_container_path = param_vals["Parameters"]["home_container_path"]
 shiny_share_container_path = param_vals["Parameters"]["shiny_share_container_path"]
 hourly_sync_container_path = param_vals["Parameters"]["hourly_sync_container_path"]
 instant_sync_container_path = param_vals["Parameters"]["instant_sync_container_path"]
+datasync_task_arn = param_vals["Parameters"]["datasync_task_arn"]
+datasync_task_arn_cache_ttl_seconds = int(
+    param_vals["Parameters"]["datasync_task_arn_cache_ttl_seconds"]
+)
+datasync_trigger_sqs_enabled = (
+    param_vals["Parameters"]["datasync_trigger_sqs_enabled"].lower() == "true"
+)
+datasync_trigger_sqs_batch_size = int(
+    param_vals["Parameters"]["datasync_trigger_sqs_batch_size"]
+)
+datasync_trigger_sqs_max_batching_window_seconds = int(
+    param_vals["Parameters"]["datasync_trigger_sqs_max_batching_window_seconds"]
+)
+datasync_trigger_sqs_max_receive_count = int(
+    param_vals["Parameters"]["datasync_trigger_sqs_max_receive_count"]
+)
+datasync_directory_filter_threshold = int(
+    param_vals["Parameters"]["datasync_directory_filter_threshold"]
+)
+datasync_incremental_sync_enabled = (
+    param_vals["Parameters"]["datasync_incremental_sync_enabled"].lower() == "true"
+)
+datasync_incremental_sync_schedule_expression = param_vals["Parameters"][
+    "datasync_incremental_sync_schedule_expression"
+]
+datasync_full_sync_schedule_expression = param_vals["Parameters"][
+    "datasync_full_sync_schedule_expression"
+]
+datasync_hourly_task_options = param_vals["Parameters"]["datasync_hourly_task_options"]
+datasync_instant_task_options = param_vals["Parameters"][
+    "datasync_instant_task_options"
+]
+datasync_hourly_shards = param_vals["Parameters"]["datasync_hourly_shards"]
+datasync_sync_latency_alarm_threshold_seconds = int(
+    param_vals["Parameters"]["datasync_sync_latency_alarm_threshold_seconds"]
+)
+rstudio_shared_service_enabled = (
+    param_vals["Parameters"]["rstudio_shared_service_enabled"].lower() == "true"
+)
+rstudio_containers_per_stack = int(
+    param_vals["Parameters"]["rstudio_containers_per_stack"]
+)
+rstudio_scale_to_zero_enabled = (
+    param_vals["Parameters"]["rstudio_scale_to_zero_enabled"].lower() == "true"
+)
+rstudio_idle_timeout_minutes = int(
+    param_vals["Parameters"]["rstudio_idle_timeout_minutes"]
+)
+rstudio_capacity_provider_strategy = param_vals["Parameters"][
+    "rstudio_capacity_provider_strategy"
+]
+shiny_capacity_provider_strategy = param_vals["Parameters"][
+    "shiny_capacity_provider_strategy"
+]
+shiny_scaling_schedules = param_vals["Parameters"]["shiny_scaling_schedules"]
+shiny_predictive_scaling_enabled = (
+    param_vals["Parameters"]["shiny_predictive_scaling_enabled"].lower() == "true"
+)
+shiny_predictive_scaling_history_weeks = int(
+    param_vals["Parameters"]["shiny_predictive_scaling_history_weeks"]
+)
+shiny_sessions_per_target = int(param_vals["Parameters"]["shiny_sessions_per_target"])
+shiny_apps = param_vals["Parameters"]["shiny_apps"]
+shiny_app_cache_enabled = (
+    param_vals["Parameters"]["shiny_app_cache_enabled"].lower() == "true"
+)
+shiny_app_cache_refresh_seconds = int(
+    param_vals["Parameters"]["shiny_app_cache_refresh_seconds"]
+)
+efs_file_system_options = param_vals["Parameters"]["efs_file_system_options"]
 
 rstudio_pipeline_build = RstudioPipelineStack(
     app,
@@ -277,6 +356,39 @@ rstudio_pipeline_build = RstudioPipelineStack(
     shiny_share_container_path=shiny_share_container_path,
     hourly_sync_container_path=hourly_sync_container_path,
     instant_sync_container_path=instant_sync_container_path,
+    datasync_task_arn=datasync_task_arn,
+    datasync_task_arn_cache_ttl_seconds=datasync_task_arn_cache_ttl_seconds,
+    datasync_trigger_queue_name=datasync_trigger_queue_name,
+    datasync_trigger_queue_arn=datasync_trigger_queue_arn,
+    datasync_trigger_sqs_enabled=datasync_trigger_sqs_enabled,
+    datasync_trigger_sqs_batch_size=datasync_trigger_sqs_batch_size,
+    datasync_trigger_sqs_max_batching_window_seconds=datasync_trigger_sqs_max_batching_window_seconds,
+    datasync_trigger_sqs_max_receive_count=datasync_trigger_sqs_max_receive_count,
+    datasync_directory_filter_threshold=datasync_directory_filter_threshold,
+    datasync_hourly_task_arn_ssm_param_name=datasync_hourly_task_arn_ssm_param_name,
+    datasync_incremental_sync_enabled=datasync_incremental_sync_enabled,
+    datasync_incremental_sync_schedule_expression=datasync_incremental_sync_schedule_expression,
+    datasync_full_sync_schedule_expression=datasync_full_sync_schedule_expression,
+    datasync_hourly_task_options=datasync_hourly_task_options,
+    datasync_instant_task_options=datasync_instant_task_options,
+    datasync_hourly_shards=datasync_hourly_shards,
+    datasync_sync_latency_alarm_threshold_seconds=datasync_sync_latency_alarm_threshold_seconds,
+    rstudio_shared_service_enabled=rstudio_shared_service_enabled,
+    rstudio_containers_per_stack=rstudio_containers_per_stack,
+    rstudio_scale_to_zero_enabled=rstudio_scale_to_zero_enabled,
+    rstudio_idle_timeout_minutes=rstudio_idle_timeout_minutes,
+    rstudio_capacity_provider_strategy=rstudio_capacity_provider_strategy,
+    shiny_capacity_provider_strategy=shiny_capacity_provider_strategy,
+    rstudio_container_cpu=rstudio_container_cpu,
+    shiny_container_cpu=shiny_container_cpu,
+    shiny_scaling_schedules=shiny_scaling_schedules,
+    shiny_predictive_scaling_enabled=shiny_predictive_scaling_enabled,
+    shiny_predictive_scaling_history_weeks=shiny_predictive_scaling_history_weeks,
+    shiny_sessions_per_target=shiny_sessions_per_target,
+    shiny_apps=shiny_apps,
+    shiny_app_cache_enabled=shiny_app_cache_enabled,
+    shiny_app_cache_refresh_seconds=shiny_app_cache_refresh_seconds,
+    efs_file_system_options=efs_file_system_options,
     env=env,
 )
 
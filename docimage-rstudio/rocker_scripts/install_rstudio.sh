@@ -129,6 +129,12 @@ echo '#!/bin/bash
 rstudio-server stop' \
 > /etc/services.d/rstudio/finish
 
+## Session heartbeat of the scale to zero idle detector
+mkdir -p /etc/services.d/heartbeat
+echo '#!/usr/bin/with-contenv bash
+exec /rocker_scripts/session_heartbeat.sh' \
+> /etc/services.d/heartbeat/run
+
 # If CUDA enabled, make sure RStudio knows (config_cuda_R.sh handles this anyway)
 if [ ! -z "$CUDA_HOME" ]; then
   sed -i '/^rsession-ld-library-path/d' /etc/rstudio/rserver.conf
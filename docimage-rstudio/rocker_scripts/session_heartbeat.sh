@@ -0,0 +1,34 @@
+#!/bin/bash
+
+## Writes a session heartbeat line to the container log every minute in which the
+## R sessions used the CPU. The scale to zero idle detector reads the heartbeats from
+## the SessionHeartbeat metric that a metric filter extracts from these lines, so that
+## a running job keeps the container up while no browser is connected.
+
+HEARTBEAT_INTERVAL=${HEARTBEAT_INTERVAL:-60}
+## CPU seconds of the R sessions over an interval above which the session is active
+HEARTBEAT_CPU_SECONDS=${HEARTBEAT_CPU_SECONDS:-2}
+
+session_cpu_seconds() {
+  ## Clock ticks of the rsession processes and of their R child processes, read from
+  ## /proc since the image does not ship procps
+  for comm in /proc/[0-9]*/comm; do
+    case "$(cat "$comm" 2>/dev/null)" in
+      rsession|R) awk '{ print $14 + $15 + $16 + $17 }' "${comm%/comm}/stat" 2>/dev/null ;;
+    esac
+  done | awk -v hz="$(getconf CLK_TCK)" '{ sum += $1 } END { print int(sum / hz) }'
+}
+
+last_cpu_seconds=$(session_cpu_seconds)
+
+while true; do
+  sleep "$HEARTBEAT_INTERVAL"
+  cpu_seconds=$(session_cpu_seconds)
+
+  ## A session that ended lowers the total, which is not activity
+  if [ $((cpu_seconds - last_cpu_seconds)) -ge "$HEARTBEAT_CPU_SECONDS" ]; then
+    echo "{\"rstudio_heartbeat\": 1, \"instance\": \"${RSTUDIO_INSTANCE}\", \"container\": \"${RSTUDIO_CONTAINER_NAME}\"}"
+  fi
+
+  last_cpu_seconds=$cpu_seconds
+done
@@ -19,6 +19,7 @@ apt-get install -y --no-install-recommends \
     libcurl4-gnutls-dev \
     libcairo2-dev \
     libxt-dev \
+    rsync \
     xtail \
     wget
 
@@ -54,5 +55,35 @@ exec shiny-server 2>&1
 EOF
 chmod +x /etc/services.d/shiny-server/run
 
+# Active sessions of the Shiny session scaling and scale in protection of the task
+mkdir -p /etc/services.d/shiny-sessions
+cat > /etc/services.d/shiny-sessions/run << 'EOF'
+#!/usr/bin/with-contenv bash
+exec /rocker_scripts/shiny_sessions.sh
+EOF
+chmod +x /etc/services.d/shiny-sessions/run
+
+# Local copy of the apps of the share file system, made before shiny-server starts
+# and refreshed while it runs
+cat > /etc/cont-init.d/shiny-app-cache << 'EOF'
+#!/usr/bin/with-contenv bash
+if [ "$SHINY_APP_CACHE_ENABLED" = "true" ]; then
+    exec /rocker_scripts/shiny_app_cache.sh init
+fi
+EOF
+chmod +x /etc/cont-init.d/shiny-app-cache
+
+mkdir -p /etc/services.d/shiny-app-cache
+cat > /etc/services.d/shiny-app-cache/run << 'EOF'
+#!/usr/bin/with-contenv bash
+if [ "$SHINY_APP_CACHE_ENABLED" != "true" ]; then
+    ## Do not restart the service when the cache is disabled
+    s6-svc -O .
+    exit 0
+fi
+exec /rocker_scripts/shiny_app_cache.sh watch
+EOF
+chmod +x /etc/services.d/shiny-app-cache/run
+
 # Clean up
 rm -rf /var/lib/apt/lists/*
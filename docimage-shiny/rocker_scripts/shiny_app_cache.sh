@@ -0,0 +1,69 @@
+#!/bin/bash
+
+## Keeps a copy of the Shiny apps of the share file system on the local disk of the
+## container, so that sessions read the app code and data from the local disk instead
+## of EFS. "init" copies the apps and points shiny-server at the copy before it
+## starts, and "watch" refreshes the copy from the share every refresh interval.
+## The share is polled, since the publishes from the RStudio containers reach the
+## share over NFS and trigger no inotify events in this container.
+
+SHINY_APP_CACHE_SOURCE=${SHINY_APP_CACHE_SOURCE:-/srv/shiny-server}
+SHINY_APP_CACHE_DIR=${SHINY_APP_CACHE_DIR:-/srv/shiny-app-cache}
+SHINY_APP_CACHE_REFRESH_SECONDS=${SHINY_APP_CACHE_REFRESH_SECONDS:-60}
+## Fingerprints of the apps at their last sync
+FINGERPRINT_DIR=/var/lib/shiny-app-cache
+
+fingerprint() {
+  ## Hash of the paths, sizes and modification times of the files of an app, which
+  ## only reads metadata from the share
+  find "$SHINY_APP_CACHE_SOURCE/$1" -printf '%P %s %T@\n' 2>/dev/null | sort | md5sum | cut -d' ' -f1
+}
+
+sync_app() {
+  ## Only the files whose content hash changed are copied, and they are moved in
+  ## place at the end so that a new session does not load a half copied app
+  rsync -a --checksum --delete --delay-updates "$SHINY_APP_CACHE_SOURCE/$1" "$SHINY_APP_CACHE_DIR/"
+}
+
+sync_apps() {
+  mkdir -p "$SHINY_APP_CACHE_DIR" "$FINGERPRINT_DIR"
+
+  for source in "$SHINY_APP_CACHE_SOURCE"/*; do
+    [ -e "$source" ] || continue
+    app=$(basename "$source")
+    current=$(fingerprint "$app")
+
+    if [ "$current" != "$(cat "$FINGERPRINT_DIR/$app" 2>/dev/null)" ] && sync_app "$app"; then
+      echo "$current" > "$FINGERPRINT_DIR/$app"
+      echo "{\"shiny_app_cache\": \"synced\", \"app\": \"${app}\"}"
+    fi
+  done
+
+  ## Apps removed from the share
+  for cached in "$SHINY_APP_CACHE_DIR"/*; do
+    [ -e "$cached" ] || continue
+    app=$(basename "$cached")
+
+    if [ ! -e "$SHINY_APP_CACHE_SOURCE/$app" ]; then
+      rm -rf "$cached" "$FINGERPRINT_DIR/$app"
+      echo "{\"shiny_app_cache\": \"removed\", \"app\": \"${app}\"}"
+    fi
+  done
+}
+
+case "$1" in
+  init)
+    sync_apps
+    sed -i "s|site_dir .*;|site_dir ${SHINY_APP_CACHE_DIR};|" /etc/shiny-server/shiny-server.conf
+    ;;
+  watch)
+    while true; do
+      sleep "$SHINY_APP_CACHE_REFRESH_SECONDS"
+      sync_apps
+    done
+    ;;
+  *)
+    echo "Usage: $0 init|watch" >&2
+    exit 1
+    ;;
+esac
@@ -0,0 +1,71 @@
+#!/bin/bash
+
+## Logs the number of active Shiny sessions of the task every minute, and protects the
+## task from scale in while it hosts sessions. shiny-server proxies the websocket of
+## each browser session to the R worker process of its app, so a session is a
+## connection accepted by an R worker. The connections of the load balancer to
+## shiny-server, such as idle keep-alive and health check connections, are not
+## sessions. The ShinyActiveSessions metric that the session scaling policy of each app
+## pool tracks is extracted from these lines.
+
+SESSIONS_INTERVAL=${SESSIONS_INTERVAL:-60}
+## The protection is renewed every interval, so it lapses if the script stops
+PROTECTION_MINUTES=${PROTECTION_MINUTES:-10}
+## Command name of the worker processes that shiny-server starts for the apps
+SHINY_WORKER_COMMAND=${SHINY_WORKER_COMMAND:-R}
+
+worker_socket_inodes() {
+  local comm
+  for comm in /proc/[0-9]*/comm; do
+    [ "$(cat "$comm" 2>/dev/null)" = "$SHINY_WORKER_COMMAND" ] || continue
+    ls -l "${comm%/comm}/fd" 2>/dev/null
+  done | sed -n 's/.*socket:\[\([0-9]*\)\]$/\1/p'
+}
+
+active_sessions() {
+  ## Sockets of the workers connected to a port or a path the workers listen on, the
+  ## other sockets of the workers, such as database connections, are not sessions.
+  ## TCP sockets are listening (0A) or established (01), Unix sockets are connected
+  ## (03) and carry the path of their listening socket once accepted.
+  awk -v inodes="$(worker_socket_inodes)" '
+    BEGIN { n = split(inodes, list); for (i = 1; i <= n; i++) worker[list[i]] = 1 }
+    FILENAME ~ /unix$/ {
+      if (($7 in worker) && $6 == "01" && $8 != "") listening[$8] = 1
+      if (($7 in worker) && $6 == "03" && $8 != "") connected[$8]++
+      next
+    }
+    ($10 in worker) {
+      split($2, address, ":")
+      if ($4 == "0A") listening[address[2]] = 1
+      if ($4 == "01") connected[address[2]]++
+    }
+    END {
+      for (endpoint in connected) if (endpoint in listening) sessions += connected[endpoint]
+      print sessions + 0
+    }
+  ' /proc/net/tcp /proc/net/tcp6 /proc/net/unix 2>/dev/null
+}
+
+set_task_protection() {
+  ## The ECS agent endpoint is only set on ECS, skip the protection elsewhere
+  [ -z "$ECS_AGENT_URI" ] && return 0
+
+  wget -q -O /dev/null --method=PUT --header="Content-Type: application/json" \
+    --body-data="{\"ProtectionEnabled\": $1, \"ExpiresInMinutes\": ${PROTECTION_MINUTES}}" \
+    "${ECS_AGENT_URI}/task-protection/v1/state"
+}
+
+protected=false
+
+while true; do
+  sessions=$(active_sessions)
+  echo "{\"shiny_sessions\": ${sessions}, \"instance\": \"${SHINY_INSTANCE}\", \"app\": \"${SHINY_APP:-default}\"}"
+
+  if [ "$sessions" -gt 0 ]; then
+    set_task_protection true && protected=true
+  elif [ "$protected" = true ]; then
+    set_task_protection false && protected=false
+  fi
+
+  sleep "$SESSIONS_INTERVAL"
+done
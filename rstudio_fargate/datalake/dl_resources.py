@@ -31,6 +31,7 @@ from aws_cdk import (
     aws_s3_deployment as s3_deploy,
     aws_s3_notifications as s3_notifications,
     aws_lambda as _lambda,
+    aws_sqs as sqs,
 )
 from aws_cdk.core import RemovalPolicy
 
@@ -46,6 +47,9 @@ class DataLakeResourcesStack(cdk.Stack):
         datalake_source_bucket_key_hourly: str,
         datalake_source_bucket_key_instant: str,
         lambda_datasync_trigger_function_arn: str,
+        datasync_trigger_sqs_enabled: bool,
+        datasync_trigger_queue_arn: str,
+        datasync_incremental_sync_enabled: bool,
         **kwargs,
     ):
         cdk.Stack.__init__(self, scope, id, **kwargs)
@@ -110,17 +114,41 @@ class DataLakeResourcesStack(cdk.Stack):
             retain_on_delete=False,
         )
 
-        # Setup bucket notification to trigger lambda (in destination account) whenever a file is uploaded into the bucket
-        lambda_destination = s3_notifications.LambdaDestination(
-            _lambda.Function.from_function_arn(
-                self,
-                id=f"datasync-lambda-{instance}",
-                function_arn=lambda_datasync_trigger_function_arn,
+        if datasync_trigger_sqs_enabled:
+            # Buffer the notifications in the trigger queue (in destination account) so that the lambda drains them in batches
+            notification_destination = s3_notifications.SqsDestination(
+                sqs.Queue.from_queue_arn(
+                    self,
+                    id=f"datasync-trigger-queue-{instance}",
+                    queue_arn=datasync_trigger_queue_arn,
+                )
+            )
+        else:
+            # Setup bucket notification to trigger lambda (in destination account) whenever a file is uploaded into the bucket
+            notification_destination = s3_notifications.LambdaDestination(
+                _lambda.Function.from_function_arn(
+                    self,
+                    id=f"datasync-lambda-{instance}",
+                    function_arn=lambda_datasync_trigger_function_arn,
+                )
             )
-        )
 
         source_bucket.add_event_notification(
             s3.EventType.OBJECT_CREATED,
-            lambda_destination,
+            notification_destination,
             s3.NotificationKeyFilter(prefix=f"{datalake_source_bucket_key_instant}/"),
         )
+
+        if datasync_incremental_sync_enabled:
+            # Record the objects written or removed under the hourly prefix for the incremental hourly sync
+            for event_type in [
+                s3.EventType.OBJECT_CREATED,
+                s3.EventType.OBJECT_REMOVED,
+            ]:
+                source_bucket.add_event_notification(
+                    event_type,
+                    notification_destination,
+                    s3.NotificationKeyFilter(
+                        prefix=f"{datalake_source_bucket_key_hourly}/"
+                    ),
+                )
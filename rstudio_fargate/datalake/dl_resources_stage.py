@@ -44,6 +44,9 @@ class DataLakeResourcesStage(core.Stage):
         datalake_source_bucket_key_hourly: str,
         datalake_source_bucket_key_instant: str,
         lambda_datasync_trigger_function_arn: str,
+        datasync_trigger_sqs_enabled: bool,
+        datasync_trigger_queue_arn: str,
+        datasync_incremental_sync_enabled: bool,
         **kwargs,
     ):
         super().__init__(scope, id, **kwargs)
@@ -62,6 +65,9 @@ class DataLakeResourcesStage(core.Stage):
             datalake_source_bucket_key_hourly=datalake_source_bucket_key_hourly,
             datalake_source_bucket_key_instant=datalake_source_bucket_key_instant,
             lambda_datasync_trigger_function_arn=lambda_datasync_trigger_function_arn,
+            datasync_trigger_sqs_enabled=datasync_trigger_sqs_enabled,
+            datasync_trigger_queue_arn=datasync_trigger_queue_arn,
+            datasync_incremental_sync_enabled=datasync_incremental_sync_enabled,
             env=env_dict,
         )
 
@@ -0,0 +1,450 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script schedules DataSync task executions for the trigger lambda. DataSync runs
+one execution of a task at a time, so object keys are queued in a store and a lock is
+held while an execution runs. The next execution is started for the queued keys when
+the DataSync task execution state change event reports the running one as finished.
+
+"""
+
+import time
+from decimal import Decimal
+
+import sync_metrics
+from structured_logging import get_logger
+
+logger = get_logger("datasync_scheduler")
+
+# Sort key of the lock item and prefix of the pending object key items
+LOCK_SORT_KEY = "#lock"
+PENDING_SORT_KEY_PREFIX = "key#"
+# Sort key of the count of consecutive rejected executions and prefix of the parked
+# object key items, which are no longer dispatched
+REJECTIONS_SORT_KEY = "#rejections"
+PARKED_SORT_KEY_PREFIX = "parked#"
+
+# Task statuses reported by DescribeTask while an execution is in progress
+RUNNING_TASK_STATUSES = ["QUEUED", "RUNNING"]
+
+# Upper bound of queued keys read for one execution, the include filter is chunked
+# again to the DataSync filter length limit when the execution is started
+PENDING_KEYS_PER_DISPATCH = 10000
+
+# Seconds after which a lock that never got an execution arn is abandoned, longer than
+# the trigger lambda timeout so that it covers one dispatch
+UNSTARTED_LOCK_TIMEOUT_SECONDS = 300
+
+# Consecutive executions that DataSync rejects for the same queued keys before the
+# keys are parked, so that keys DataSync cannot sync do not block the scope
+MAX_CONSECUTIVE_REJECTIONS = 3
+
+
+class ExecutionRejectedError(Exception):
+    """Raised by the start_execution callable when DataSync rejects the execution,
+    with the object keys of the rejected include filter."""
+
+    def __init__(self, object_keys, reason):
+        super().__init__(reason)
+        self.object_keys = object_keys
+
+
+class InMemoryExecutionStore:
+    """Execution store kept in the memory of the current process, used when no
+    scheduler table is configured such as when running the handler locally."""
+
+    def __init__(self):
+        self.locks = {}
+        self.pending = {}
+        self.rejections = {}
+        self.parked = {}
+
+    def acquire_lock(self, scope, lock_timeout):
+        now = time.time()
+        lock = self.locks.get(scope)
+
+        if lock is not None and not is_abandoned(lock, now):
+            return False
+
+        self.locks[scope] = {
+            "execution_arn": "",
+            "oldest_received_at": 0,
+            "has_backlog": False,
+            "acquired_at": now,
+            "expires_at": now + lock_timeout,
+        }
+        return True
+
+    def set_lock_execution(
+        self, scope, execution_arn, oldest_received_at=0, has_backlog=False
+    ):
+        if scope not in self.locks:
+            return False
+
+        self.locks[scope]["execution_arn"] = execution_arn
+        self.locks[scope]["oldest_received_at"] = oldest_received_at
+        self.locks[scope]["has_backlog"] = has_backlog
+        return True
+
+    def release_lock(self, scope, execution_arn=None):
+        lock = self.locks.get(scope)
+
+        if lock is None:
+            return None
+
+        if execution_arn and lock["execution_arn"] != execution_arn:
+            return None
+
+        return self.locks.pop(scope)
+
+    def add_pending(self, scope, object_keys):
+        pending = self.pending.setdefault(scope, {})
+
+        for object_key, received_at in object_keys.items():
+            pending[object_key] = received_at
+
+    def get_pending(self, scope, limit):
+        pending = self.pending.get(scope, {})
+        return {
+            object_key: pending[object_key] for object_key in sorted(pending)[:limit]
+        }
+
+    def remove_pending(self, scope, object_keys):
+        pending = self.pending.get(scope, {})
+
+        for object_key in object_keys:
+            pending.pop(object_key, None)
+
+    def add_rejection(self, scope):
+        self.rejections[scope] = self.rejections.get(scope, 0) + 1
+        return self.rejections[scope]
+
+    def reset_rejections(self, scope):
+        self.rejections.pop(scope, None)
+
+    def park_pending(self, scope, object_keys):
+        pending = self.pending.get(scope, {})
+        parked = self.parked.setdefault(scope, {})
+
+        for object_key in object_keys:
+            if object_key in pending:
+                parked[object_key] = pending.pop(object_key)
+
+
+class DynamoDbExecutionStore:
+    """Execution store backed by the scheduler DynamoDB table. The lock is a
+    conditional write so that concurrent invocations start one execution at most."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def acquire_lock(self, scope, lock_timeout):
+        now = int(time.time())
+
+        try:
+            self.table.put_item(
+                Item={
+                    "pk": scope,
+                    "sk": LOCK_SORT_KEY,
+                    "execution_arn": "",
+                    "oldest_received_at": 0,
+                    "acquired_at": now,
+                    "expires_at": now + lock_timeout,
+                },
+                ConditionExpression=(
+                    "attribute_not_exists(pk) OR expires_at < :now OR "
+                    "(execution_arn = :empty AND acquired_at < :unstarted_before)"
+                ),
+                ExpressionAttributeValues={
+                    ":now": now,
+                    ":empty": "",
+                    ":unstarted_before": now - UNSTARTED_LOCK_TIMEOUT_SECONDS,
+                },
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+        return True
+
+    def set_lock_execution(
+        self, scope, execution_arn, oldest_received_at=0, has_backlog=False
+    ):
+        # The state change event of a short execution may release the lock before
+        # its arn is recorded, the update must not create the lock again without
+        # an expiry
+        try:
+            self.table.update_item(
+                Key={"pk": scope, "sk": LOCK_SORT_KEY},
+                UpdateExpression=(
+                    "SET execution_arn = :execution_arn, "
+                    "oldest_received_at = :oldest_received_at, "
+                    "has_backlog = :has_backlog"
+                ),
+                ConditionExpression="attribute_exists(pk)",
+                ExpressionAttributeValues={
+                    ":execution_arn": execution_arn,
+                    ":oldest_received_at": to_decimal(oldest_received_at),
+                    ":has_backlog": has_backlog,
+                },
+            )
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+        return True
+
+    def release_lock(self, scope, execution_arn=None):
+        kwargs = {
+            "Key": {"pk": scope, "sk": LOCK_SORT_KEY},
+            "ReturnValues": "ALL_OLD",
+        }
+
+        # Only release the lock held for this execution. A late event of the previous
+        # execution must not release a lock whose execution arn is not recorded yet,
+        # such a lock expires after UNSTARTED_LOCK_TIMEOUT_SECONDS if it never gets one
+        if execution_arn:
+            kwargs["ConditionExpression"] = "execution_arn = :execution_arn"
+            kwargs["ExpressionAttributeValues"] = {":execution_arn": execution_arn}
+
+        try:
+            response = self.table.delete_item(**kwargs)
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return None
+
+        lock = response.get("Attributes", {})
+
+        return {
+            "execution_arn": lock.get("execution_arn", ""),
+            "oldest_received_at": float(lock.get("oldest_received_at", 0)),
+            "has_backlog": bool(lock.get("has_backlog", False)),
+        }
+
+    def add_pending(self, scope, object_keys):
+        with self.table.batch_writer(overwrite_by_pkeys=["pk", "sk"]) as batch:
+            for object_key, received_at in object_keys.items():
+                batch.put_item(
+                    Item={
+                        "pk": scope,
+                        "sk": PENDING_SORT_KEY_PREFIX + object_key,
+                        "received_at": to_decimal(received_at),
+                    }
+                )
+
+    def get_pending(self, scope, limit):
+        object_keys = {}
+        kwargs = {
+            "KeyConditionExpression": "pk = :pk AND begins_with(sk, :prefix)",
+            "ExpressionAttributeValues": {
+                ":pk": scope,
+                ":prefix": PENDING_SORT_KEY_PREFIX,
+            },
+            "ProjectionExpression": "sk, received_at",
+        }
+
+        while len(object_keys) < limit:
+            response = self.table.query(**kwargs)
+
+            for item in response["Items"][: limit - len(object_keys)]:
+                object_key = item["sk"][len(PENDING_SORT_KEY_PREFIX) :]
+                object_keys[object_key] = float(item.get("received_at", 0))
+
+            if "LastEvaluatedKey" not in response:
+                break
+
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        return object_keys
+
+    def remove_pending(self, scope, object_keys):
+        with self.table.batch_writer(overwrite_by_pkeys=["pk", "sk"]) as batch:
+            for object_key in object_keys:
+                batch.delete_item(
+                    Key={"pk": scope, "sk": PENDING_SORT_KEY_PREFIX + object_key}
+                )
+
+    def add_rejection(self, scope):
+        response = self.table.update_item(
+            Key={"pk": scope, "sk": REJECTIONS_SORT_KEY},
+            UpdateExpression="ADD rejections :one",
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="UPDATED_NEW",
+        )
+        return int(response["Attributes"]["rejections"])
+
+    def reset_rejections(self, scope):
+        self.table.delete_item(Key={"pk": scope, "sk": REJECTIONS_SORT_KEY})
+
+    def park_pending(self, scope, object_keys):
+        # Parked keys are no longer dispatched, writing them back as pending items
+        # queues them again
+        parked_at = to_decimal(time.time())
+
+        with self.table.batch_writer(overwrite_by_pkeys=["pk", "sk"]) as batch:
+            for object_key in object_keys:
+                batch.put_item(
+                    Item={
+                        "pk": scope,
+                        "sk": PARKED_SORT_KEY_PREFIX + object_key,
+                        "parked_at": parked_at,
+                    }
+                )
+                batch.delete_item(
+                    Key={"pk": scope, "sk": PENDING_SORT_KEY_PREFIX + object_key}
+                )
+
+
+def is_abandoned(lock, now):
+    """Return whether a lock can be taken over: it expired, or it never got an
+    execution arn within UNSTARTED_LOCK_TIMEOUT_SECONDS."""
+    return lock["expires_at"] < now or (
+        not lock["execution_arn"]
+        and lock["acquired_at"] < now - UNSTARTED_LOCK_TIMEOUT_SECONDS
+    )
+
+
+def to_decimal(value):
+    # The DynamoDB resource does not accept floats
+    return Decimal(str(round(value, 3)))
+
+
+class ExecutionScheduler:
+    """Queues object keys for a sync scope and starts one DataSync execution at a
+    time for them.
+
+    Arguments:
+        :param datasync -- The DataSync client
+        :param store -- The execution store holding the lock and the queued keys
+        :param start_execution -- Callable taking a scope, a task arn and a list of
+            object keys, returning the StartTaskExecution response and the keys it
+            covers
+        :param lock_timeout -- Seconds after which a lock is considered abandoned
+    """
+
+    def __init__(self, datasync, store, start_execution, lock_timeout):
+        self.datasync = datasync
+        self.store = store
+        self.start_execution = start_execution
+        self.lock_timeout = lock_timeout
+
+    def submit(self, scope, object_keys):
+        """Queue object keys, given as a dictionary of the epoch seconds at which
+        each key was received."""
+        self.store.add_pending(scope, object_keys)
+
+    def release(self, scope, execution_arn):
+        """Release the lock held for a finished execution. Returns the lock, with the
+        time the oldest key of the execution was received and whether keys were left
+        queued when it started, or None if the lock was held for another
+        execution."""
+        return self.store.release_lock(scope, execution_arn)
+
+    def dispatch(self, scope, task_arn):
+        if not self.store.acquire_lock(scope, self.lock_timeout):
+            # An execution is running, its state change event dispatches again
+            sync_metrics.put_execution_deferred(scope)
+            return None
+
+        try:
+            running_execution_arn = self.get_running_execution(task_arn)
+
+            if running_execution_arn is not None:
+                if not self.store.set_lock_execution(scope, running_execution_arn):
+                    logger.info("Lock already released", sync_scope=scope)
+
+                sync_metrics.put_execution_deferred(scope)
+                return None
+
+            object_keys = self.store.get_pending(scope, PENDING_KEYS_PER_DISPATCH)
+
+            if not object_keys:
+                self.store.release_lock(scope)
+                return None
+
+            try:
+                response, started_keys = self.start_execution(
+                    scope, task_arn, list(object_keys)
+                )
+            except ExecutionRejectedError as e:
+                # No execution started, so no state change event will release the
+                # lock
+                self.store.release_lock(scope)
+                self.reject(scope, e)
+                return None
+
+            received_times = [object_keys[object_key] for object_key in started_keys]
+            # A full read of the queue may leave keys queued beyond the limit
+            has_backlog = (
+                len(started_keys) < len(object_keys)
+                or len(object_keys) >= PENDING_KEYS_PER_DISPATCH
+            )
+
+            # The lock is already released when the execution finished before this
+            # point, its state change event has then dispatched again
+            if not self.store.set_lock_execution(
+                scope,
+                response["TaskExecutionArn"],
+                min(received_times),
+                has_backlog=has_backlog,
+            ):
+                logger.info(
+                    "Lock already released",
+                    sync_scope=scope,
+                    execution_arn=response["TaskExecutionArn"],
+                )
+
+            self.store.remove_pending(scope, started_keys)
+            self.store.reset_rejections(scope)
+
+            sync_metrics.put_execution_started(scope, received_times, time.time())
+
+            return response
+        except Exception:
+            self.store.release_lock(scope)
+            raise
+
+    def reject(self, scope, error):
+        """Count a rejected execution, and park its keys once the executions of the
+        scope have been rejected MAX_CONSECUTIVE_REJECTIONS times in a row."""
+        rejections = self.store.add_rejection(scope)
+
+        logger.info(
+            "Execution not started",
+            sync_scope=scope,
+            reason=str(error),
+            rejections=rejections,
+        )
+        sync_metrics.put_execution_rejected(scope)
+
+        if rejections < MAX_CONSECUTIVE_REJECTIONS:
+            return
+
+        self.store.park_pending(scope, error.object_keys)
+        self.store.reset_rejections(scope)
+
+        logger.warning(
+            "Parked object keys rejected by DataSync",
+            sync_scope=scope,
+            object_keys=error.object_keys,
+        )
+        sync_metrics.put_keys_parked(scope, len(error.object_keys))
+
+    def get_running_execution(self, task_arn):
+        task = self.datasync.describe_task(TaskArn=task_arn)
+
+        if task.get("Status") not in RUNNING_TASK_STATUSES:
+            return None
+
+        return task.get("CurrentTaskExecutionArn", "")
@@ -19,6 +19,7 @@ OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 """
 
+import json
 from os import getenv
 from pathlib import Path
 
@@ -26,6 +27,11 @@ from aws_cdk import (
     core as cdk,
     aws_lambda as _lambda,
     aws_iam as iam,
+    aws_events as events,
+    aws_events_targets as event_targets,
+    aws_sqs as sqs,
+    aws_lambda_event_sources as event_sources,
+    aws_dynamodb as dynamodb,
 )
 from aws_cdk.core import (
     RemovalPolicy,
@@ -34,9 +40,19 @@ from aws_cdk.core import (
     Stack,
 )
 
+from ..rstudio.custom.lambda_layer import (
+    get_lambda_layer,
+    get_logging_environment,
+)
+
 LAMBDA_DURATION = Duration.minutes(3)
 LAMBDA_MEMORY = 1024
 LAMBDA_RUNTIME = _lambda.Runtime.PYTHON_3_7
+# Seconds after which a scheduler lock whose execution never reported completion expires
+SCHEDULER_LOCK_TIMEOUT_SECONDS = 3600
+# SQS recommends a visibility timeout of six times the function timeout
+TRIGGER_QUEUE_VISIBILITY_TIMEOUT = Duration.minutes(18)
+TRIGGER_QUEUE_RETENTION = Duration.days(14)
 
 
 class DatasyncTriggerLambdaStack(Stack):
@@ -50,34 +66,136 @@ class DatasyncTriggerLambdaStack(Stack):
         datasync_task_arn_ssm_param_name: str,
         datasync_function_name: str,
         ssm_cross_account_lambda_role_name: str,
+        datasync_task_arn: str,
+        datasync_task_arn_cache_ttl_seconds: int,
+        datasync_trigger_queue_name: str,
+        datasync_trigger_sqs_enabled: bool,
+        datasync_trigger_sqs_batch_size: int,
+        datasync_trigger_sqs_max_batching_window_seconds: int,
+        datasync_trigger_sqs_max_receive_count: int,
+        datalake_source_bucket_key_instant: str,
+        datasync_directory_filter_threshold: int,
+        datalake_source_bucket_key_hourly: str,
+        datasync_hourly_task_arn_ssm_param_name: str,
+        datasync_incremental_sync_enabled: bool,
+        datasync_incremental_sync_schedule_expression: str,
+        datasync_hourly_shards: list,
         **kwargs,
     ) -> None:
         super().__init__(scope, id, **kwargs)
 
+        # Queue of object keys and execution lock shared by all invocations
+        scheduler_table = dynamodb.Table(
+            self,
+            id=f"trigger-datasync-scheduler-table-{instance}",
+            partition_key=dynamodb.Attribute(
+                name="pk", type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(name="sk", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        trigger_environment = {
+            "DATASYNC_SCHEDULER_TABLE_NAME": scheduler_table.table_name,
+            "DATASYNC_SCHEDULER_LOCK_TIMEOUT_SECONDS": str(
+                SCHEDULER_LOCK_TIMEOUT_SECONDS
+            ),
+            "DATASYNC_TASK_ARN_SSM_PARAM_NAME": datasync_task_arn_ssm_param_name,
+            "DATASYNC_TASK_ARN_CACHE_TTL_SECONDS": str(
+                datasync_task_arn_cache_ttl_seconds
+            ),
+            "DATASYNC_SOURCE_SUBDIRECTORY": datalake_source_bucket_key_instant,
+            "DATASYNC_METRICS_INSTANCE": instance,
+            "DATASYNC_DIRECTORY_FILTER_THRESHOLD": str(
+                datasync_directory_filter_threshold
+            ),
+        }
+        trigger_environment.update(get_logging_environment(self))
+
+        # When the task arn is known at deploy time the function does not read SSM
+        if datasync_task_arn:
+            trigger_environment["DATASYNC_TASK_ARN"] = datasync_task_arn
+
+        # Queue the changes of the hourly prefix for the incremental hourly sync
+        if datasync_incremental_sync_enabled:
+            trigger_environment["DATASYNC_HOURLY_TASK_ARN_SSM_PARAM_NAME"] = (
+                datasync_hourly_task_arn_ssm_param_name
+            )
+            trigger_environment["DATASYNC_HOURLY_SOURCE_SUBDIRECTORY"] = (
+                datalake_source_bucket_key_hourly
+            )
+            trigger_environment["DATASYNC_HOURLY_SHARDS"] = json.dumps(
+                datasync_hourly_shards
+            )
+
         trigger_datasync_function = _lambda.Function(
             self,
             id=f"trigger-datasync-function-{instance}",
             code=_lambda.Code.asset("rstudio_fargate/datasync_trigger/"),
             function_name=datasync_function_name,
             handler="trigger_datasync_handler.lambda_handler",
-            layers=[],
+            layers=[get_lambda_layer(self)],
             runtime=LAMBDA_RUNTIME,
             timeout=LAMBDA_DURATION,
             memory_size=LAMBDA_MEMORY,
-            environment={
-                "DATASYNC_TASK_ARN_SSM_PARAM_NAME": datasync_task_arn_ssm_param_name
-            },
+            environment=trigger_environment,
         )
 
         # Retrieve the datasync task arn parameter
         trigger_datasync_function.add_to_role_policy(
             statement=iam.PolicyStatement(
-                actions=["datasync:StartTaskExecution"],
+                actions=["datasync:StartTaskExecution", "datasync:DescribeTask"],
                 effect=iam.Effect.ALLOW,
                 resources=[f"arn:aws:datasync:{self.region}:{self.account}:task/*"],
             )
         )
 
+        # Read the transfer results of finished executions for the sync metrics
+        trigger_datasync_function.add_to_role_policy(
+            statement=iam.PolicyStatement(
+                actions=["datasync:DescribeTaskExecution"],
+                effect=iam.Effect.ALLOW,
+                resources=[
+                    f"arn:aws:datasync:{self.region}:{self.account}:task/*/execution/*"
+                ],
+            )
+        )
+
+        scheduler_table.grant_read_write_data(trigger_datasync_function)
+
+        # Start the next execution for the queued object keys when an execution of the task finishes
+        events.Rule(
+            self,
+            id=f"DataSync-Execution-State-Change-{instance}",
+            description="Start the next instant upload DataSync execution for pending keys",
+            event_pattern=events.EventPattern(
+                source=["aws.datasync"],
+                detail_type=["DataSync Task Execution State Change"],
+                detail={"State": ["SUCCESS", "ERROR"]},
+            ),
+            targets=[event_targets.LambdaFunction(trigger_datasync_function)],
+        )
+
+        if datasync_incremental_sync_enabled:
+            # Start the hourly task for the keys changed since its previous execution
+            events.Rule(
+                self,
+                id=f"DataSync-Incremental-Sync-Schedule-{instance}",
+                description="Start the hourly DataSync task for the changed keys",
+                schedule=events.Schedule.expression(
+                    datasync_incremental_sync_schedule_expression
+                ),
+                targets=[
+                    event_targets.LambdaFunction(
+                        trigger_datasync_function,
+                        event=events.RuleTargetInput.from_object(
+                            {"sync_scope": "hourly"}
+                        ),
+                    )
+                ],
+            )
+
         trigger_datasync_function.add_to_role_policy(
             statement=iam.PolicyStatement(
                 actions=["ssm:GetParameter", "ssm:GetParameters"],
@@ -118,6 +236,58 @@ class DatasyncTriggerLambdaStack(Stack):
             source_account=datalake_account_id,
         )
 
+        if datasync_trigger_sqs_enabled:
+            # Buffer the remote S3 bucket notifications so one invocation drains many object keys
+            trigger_dead_letter_queue = sqs.Queue(
+                self,
+                id=f"trigger-datasync-dlq-{instance}",
+                queue_name=f"{datasync_trigger_queue_name}-dlq",
+                retention_period=TRIGGER_QUEUE_RETENTION,
+            )
+
+            trigger_queue = sqs.Queue(
+                self,
+                id=f"trigger-datasync-queue-{instance}",
+                queue_name=datasync_trigger_queue_name,
+                visibility_timeout=TRIGGER_QUEUE_VISIBILITY_TIMEOUT,
+                retention_period=TRIGGER_QUEUE_RETENTION,
+                dead_letter_queue=sqs.DeadLetterQueue(
+                    queue=trigger_dead_letter_queue,
+                    max_receive_count=datasync_trigger_sqs_max_receive_count,
+                ),
+            )
+
+            # To allow the remote S3 bucket to send its notifications to the queue:
+            trigger_queue.add_to_resource_policy(
+                iam.PolicyStatement(
+                    principals=[iam.ServicePrincipal("s3.amazonaws.com")],
+                    actions=[
+                        "sqs:SendMessage",
+                        "sqs:GetQueueAttributes",
+                        "sqs:GetQueueUrl",
+                    ],
+                    effect=iam.Effect.ALLOW,
+                    resources=[trigger_queue.queue_arn],
+                    conditions={
+                        "ArnLike": {
+                            "aws:SourceArn": f"arn:aws:s3:::{datalake_source_bucket_name}"
+                        },
+                        "StringEquals": {"aws:SourceAccount": datalake_account_id},
+                    },
+                )
+            )
+
+            trigger_datasync_function.add_event_source(
+                event_sources.SqsEventSource(
+                    trigger_queue,
+                    batch_size=datasync_trigger_sqs_batch_size,
+                    max_batching_window=Duration.seconds(
+                        datasync_trigger_sqs_max_batching_window_seconds
+                    ),
+                    report_batch_item_failures=True,
+                )
+            )
+
         # The following role will be used as an execution role for the lambda function that retrieves cross-account SSM parameters
         ssm_lambda_execution_role = iam.Role(
             role_name=ssm_cross_account_lambda_role_name,
@@ -34,6 +34,20 @@ class DataSyncTriggerLambdaStage(cdk.Stage):
         ssm_cross_account_lambda_role_name: str,
         datasync_task_arn_ssm_param_name: str,
         datasync_function_name: str,
+        datasync_task_arn: str,
+        datasync_task_arn_cache_ttl_seconds: int,
+        datasync_trigger_queue_name: str,
+        datasync_trigger_sqs_enabled: bool,
+        datasync_trigger_sqs_batch_size: int,
+        datasync_trigger_sqs_max_batching_window_seconds: int,
+        datasync_trigger_sqs_max_receive_count: int,
+        datalake_source_bucket_key_instant: str,
+        datasync_directory_filter_threshold: int,
+        datalake_source_bucket_key_hourly: str,
+        datasync_hourly_task_arn_ssm_param_name: str,
+        datasync_incremental_sync_enabled: bool,
+        datasync_incremental_sync_schedule_expression: str,
+        datasync_hourly_shards: list,
         **kwargs,
     ):
         super().__init__(scope, id, **kwargs)
@@ -47,6 +61,20 @@ class DataSyncTriggerLambdaStage(cdk.Stage):
             ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
             datasync_task_arn_ssm_param_name=datasync_task_arn_ssm_param_name,
             datasync_function_name=datasync_function_name,
+            datasync_task_arn=datasync_task_arn,
+            datasync_task_arn_cache_ttl_seconds=datasync_task_arn_cache_ttl_seconds,
+            datasync_trigger_queue_name=datasync_trigger_queue_name,
+            datasync_trigger_sqs_enabled=datasync_trigger_sqs_enabled,
+            datasync_trigger_sqs_batch_size=datasync_trigger_sqs_batch_size,
+            datasync_trigger_sqs_max_batching_window_seconds=datasync_trigger_sqs_max_batching_window_seconds,
+            datasync_trigger_sqs_max_receive_count=datasync_trigger_sqs_max_receive_count,
+            datalake_source_bucket_key_instant=datalake_source_bucket_key_instant,
+            datasync_directory_filter_threshold=datasync_directory_filter_threshold,
+            datalake_source_bucket_key_hourly=datalake_source_bucket_key_hourly,
+            datasync_hourly_task_arn_ssm_param_name=datasync_hourly_task_arn_ssm_param_name,
+            datasync_incremental_sync_enabled=datasync_incremental_sync_enabled,
+            datasync_incremental_sync_schedule_expression=datasync_incremental_sync_schedule_expression,
+            datasync_hourly_shards=datasync_hourly_shards,
             env={
                 "account": rstudio_account_id,
                 "region": self.region,
@@ -0,0 +1,171 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script builds the DataSync include filters for a list of S3 object keys. Filter
+patterns are paths relative to the subdirectory of the source S3 location, and keys
+sharing a directory are collapsed into a single directory pattern once their number
+reaches a threshold. A key holding the filter delimiter or a wildcard cannot have an
+exact pattern, and is included by the pattern of its closest directory that can.
+
+"""
+
+# DataSync limits a filter value to 102,400 characters; patterns are joined with "|"
+MAX_FILTER_LENGTH = 102400
+FILTER_DELIMITER = "|"
+FILTER_WILDCARD = "*"
+
+
+def get_location_prefix(subdirectory):
+    # The subdirectory of a CfnLocationS3 may be given with or without slashes
+    subdirectory = subdirectory.strip("/")
+    return f"{subdirectory}/" if subdirectory else ""
+
+
+def is_in_location(object_key, subdirectory):
+    return object_key.startswith(get_location_prefix(subdirectory))
+
+
+def get_relative_path(object_key, subdirectory):
+    """Return the path of an object key as seen by DataSync in the source location,
+    for example "instant_sync/a/b.csv" becomes "/a/b.csv" for "instant_sync"."""
+    location_prefix = get_location_prefix(subdirectory)
+
+    if not object_key.startswith(location_prefix):
+        raise ValueError(
+            f"Object key {object_key} is outside of the location subdirectory {subdirectory}"
+        )
+
+    return "/" + object_key[len(location_prefix) :]
+
+
+def is_in_prefixes(relative_path, prefixes):
+    """Return whether a relative path is included by the "/prefix" filter pattern of
+    one of the given sub-prefixes of the location."""
+    return any(
+        relative_path.startswith(f"/{prefix.strip('/')}/") for prefix in prefixes
+    )
+
+
+def get_parent_directories(relative_path):
+    """Return the parent directories of a relative path, deepest first, excluding
+    the root of the location."""
+    directories = []
+    directory = relative_path.rsplit("/", 1)[0]
+
+    while directory:
+        directories.append(directory)
+        directory = directory.rsplit("/", 1)[0]
+
+    return directories
+
+
+def is_exact_pattern(relative_path):
+    """Return whether a relative path can be used as a pattern that only includes
+    itself, which a delimiter would split and a wildcard would widen."""
+    return (
+        FILTER_DELIMITER not in relative_path and FILTER_WILDCARD not in relative_path
+    )
+
+
+def get_directory_pattern(relative_path):
+    """Return the pattern of the deepest parent directory of a relative path that can
+    be used as a pattern, or the pattern of the whole location."""
+    for directory in get_parent_directories(relative_path):
+        if is_exact_pattern(directory):
+            return f"{directory}/{FILTER_WILDCARD}"
+
+    return f"/{FILTER_WILDCARD}"
+
+
+def get_patterns(relative_paths, directory_threshold):
+    """Map each relative path to the pattern that includes it. Directories are
+    visited deepest first and collapsed into a directory pattern when they hold at
+    least directory_threshold paths not already included by a collapsed subdirectory,
+    so that a directory is only included as a whole where the uploads are. Other
+    paths keep an exact pattern. A threshold of zero disables collapsing."""
+    patterns = {
+        path: path if is_exact_pattern(path) else get_directory_pattern(path)
+        for path in relative_paths
+    }
+
+    if not directory_threshold:
+        return patterns
+
+    paths_by_directory = {}
+
+    for path in relative_paths:
+        for directory in get_parent_directories(path):
+            paths_by_directory.setdefault(directory, []).append(path)
+
+    for directory in sorted(
+        paths_by_directory, key=lambda directory: directory.count("/"), reverse=True
+    ):
+        uncovered_paths = [
+            path for path in paths_by_directory[directory] if patterns[path] == path
+        ]
+
+        if len(uncovered_paths) < directory_threshold:
+            continue
+
+        # Paths below a collapsed subdirectory are included by this pattern as well
+        for path in paths_by_directory[directory]:
+            patterns[path] = f"{directory}/*"
+
+    return patterns
+
+
+def build_include_filters(object_keys, subdirectory, directory_threshold):
+    """Coalesce object keys into "|" delimited SIMPLE_PATTERN filter values, chunked
+    so that no value exceeds the DataSync filter length limit. Each filter lists the
+    object keys its patterns include."""
+    relative_paths = {
+        object_key: get_relative_path(object_key, subdirectory)
+        for object_key in object_keys
+    }
+    patterns = get_patterns(set(relative_paths.values()), directory_threshold)
+
+    keys_by_pattern = {}
+
+    for object_key, relative_path in relative_paths.items():
+        keys_by_pattern.setdefault(patterns[relative_path], []).append(object_key)
+
+    filters = []
+    chunk_patterns = []
+    chunk_keys = []
+    length = 0
+
+    for pattern in sorted(keys_by_pattern):
+        added_length = len(pattern) + (len(FILTER_DELIMITER) if chunk_patterns else 0)
+
+        if chunk_patterns and length + added_length > MAX_FILTER_LENGTH:
+            filters.append(
+                {"Value": FILTER_DELIMITER.join(chunk_patterns), "Keys": chunk_keys}
+            )
+            chunk_patterns, chunk_keys = [], []
+            added_length = len(pattern)
+            length = 0
+
+        chunk_patterns.append(pattern)
+        chunk_keys.extend(keys_by_pattern[pattern])
+        length += added_length
+
+    if chunk_patterns:
+        filters.append(
+            {"Value": FILTER_DELIMITER.join(chunk_patterns), "Keys": chunk_keys}
+        )
+
+    return filters
@@ -0,0 +1,113 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script publishes the DataSync sync metrics of the trigger lambda as CloudWatch
+Embedded Metric Format records. The records are written to the function log and
+CloudWatch extracts the metrics from them, no API call is made.
+
+"""
+
+import json
+import os
+import time
+
+# Must match the namespace and dimensions of the dashboard in DataSyncStack
+METRICS_NAMESPACE = "Rstudio/DataSync"
+metrics_instance = os.environ.get("DATASYNC_METRICS_INSTANCE", "")
+
+
+def put_metrics(sync_scope, metrics):
+    """Write one EMF record. metrics maps metric names to (value, unit) tuples."""
+    if not metrics:
+        return
+
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["Instance", "SyncScope"]],
+                    "Metrics": [
+                        {"Name": name, "Unit": unit}
+                        for name, (value, unit) in metrics.items()
+                    ],
+                }
+            ],
+        },
+        "Instance": metrics_instance,
+        "SyncScope": sync_scope,
+    }
+
+    for name, (value, unit) in metrics.items():
+        record[name] = value
+
+    print(json.dumps(record))
+
+
+def put_execution_started(sync_scope, received_times, started_at):
+    # Latency from the S3 event of the oldest key of the execution to its start
+    put_metrics(
+        sync_scope,
+        {
+            "ExecutionStartLatency": (
+                max(started_at - min(received_times), 0) * 1000,
+                "Milliseconds",
+            ),
+            "ExecutionKeys": (len(received_times), "Count"),
+        },
+    )
+
+
+def put_execution_rejected(sync_scope):
+    # DataSync refused the execution, for instance because another one of the task
+    # was running or the include filter is invalid
+    put_metrics(sync_scope, {"ExecutionsRejected": (1, "Count")})
+
+
+def put_keys_parked(sync_scope, parked_keys):
+    # Keys of repeatedly rejected executions, which are no longer synced
+    put_metrics(sync_scope, {"ParkedKeys": (parked_keys, "Count")})
+
+
+def put_execution_deferred(sync_scope):
+    # The keys stay queued because an execution of the task holds the lock
+    put_metrics(sync_scope, {"ExecutionsDeferred": (1, "Count")})
+
+
+def put_execution_finished(sync_scope, task_execution, oldest_received_at, finished_at):
+    """Publish the metrics of a finished execution from its DescribeTaskExecution
+    response. The end to end latency is measured from the S3 event of the oldest key
+    of the execution, it is therefore the worst latency of the execution."""
+    result = task_execution.get("Result", {})
+    metrics = {
+        "ExecutionDuration": (result.get("TotalDuration", 0), "Milliseconds"),
+        "BytesTransferred": (task_execution.get("BytesTransferred", 0), "Bytes"),
+        "FilesTransferred": (task_execution.get("FilesTransferred", 0), "Count"),
+        "ExecutionsFailed": (
+            1 if task_execution.get("Status") == "ERROR" else 0,
+            "Count",
+        ),
+    }
+
+    if oldest_received_at:
+        metrics["EndToEndSyncLatency"] = (
+            max(finished_at - oldest_received_at, 0) * 1000,
+            "Milliseconds",
+        )
+
+    put_metrics(sync_scope, metrics)
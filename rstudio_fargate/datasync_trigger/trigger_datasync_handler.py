@@ -15,50 +15,435 @@ HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTIO
  OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
+This script creates the lambda handler that triggers the DataSync tasks. Object keys
+from S3 events are queued per sync scope. Keys of the instant upload scope are synced
+right away, coalesced into one include filter of paths relative to the source location,
+and keys that arrive while the task is already running are held until the DataSync task
+execution state change event for the running execution is received. Keys of the hourly
+scope are synced incrementally when the scheduled sync event is received.
+
 """
 
 import json
 import boto3
 import os
+import time
+from datetime import datetime, timezone
+from urllib.parse import unquote_plus
+
+from datasync_scheduler import (
+    DynamoDbExecutionStore,
+    ExecutionRejectedError,
+    ExecutionScheduler,
+    InMemoryExecutionStore,
+)
+from include_filters import (
+    build_include_filters,
+    get_relative_path,
+    is_in_location,
+    is_in_prefixes,
+)
+import sync_metrics
+from structured_logging import get_logger
+
+datasync_task_arn_param_name = os.environ.get("DATASYNC_TASK_ARN_SSM_PARAM_NAME", "")
+
+# The task arn can be injected at deploy time, in which case SSM is never called
+datasync_task_arn_from_env = os.environ.get("DATASYNC_TASK_ARN", "")
+
+# Seconds a task arn read from SSM is reused by a warm container
+datasync_task_arn_cache_ttl = int(
+    os.environ.get("DATASYNC_TASK_ARN_CACHE_TTL_SECONDS", "300")
+)
+
+# Minimum age of a cached task arn before a rejected execution forces a refresh, so
+# that a burst of rejections for a running execution does not turn into SSM calls
+TASK_ARN_MIN_REFRESH_SECONDS = 60
+
+# Table holding the scheduler lock and the object keys waiting for an execution
+scheduler_table_name = os.environ.get("DATASYNC_SCHEDULER_TABLE_NAME", "")
+
+# Seconds after which a lock whose state change event never arrived is taken over
+scheduler_lock_timeout = int(
+    os.environ.get("DATASYNC_SCHEDULER_LOCK_TIMEOUT_SECONDS", "3600")
+)
+
+# Subdirectory of the instant upload source location, include filters are relative to it
+datasync_source_subdirectory = os.environ.get("DATASYNC_SOURCE_SUBDIRECTORY", "")
+
+# Incremental hourly sync, enabled when the hourly task arn parameter is set
+datasync_hourly_task_arn_param_name = os.environ.get(
+    "DATASYNC_HOURLY_TASK_ARN_SSM_PARAM_NAME", ""
+)
+datasync_hourly_source_subdirectory = os.environ.get(
+    "DATASYNC_HOURLY_SOURCE_SUBDIRECTORY", ""
+)
+
+# Sub-prefixes of the hourly location synced by a task of their own, one list per shard
+datasync_hourly_shards = json.loads(os.environ.get("DATASYNC_HOURLY_SHARDS", "[]"))
+
+# Number of keys under a directory from which the directory is included as a whole
+datasync_directory_filter_threshold = int(
+    os.environ.get("DATASYNC_DIRECTORY_FILTER_THRESHOLD", "100")
+)
+
+# Scopes of the instant upload and hourly tasks in the scheduler table
+INSTANT_SYNC_SCOPE = "instant"
+HOURLY_SYNC_SCOPE = "hourly"
+
+# Terminal states of a task execution as reported by the DataSync EventBridge events
+TERMINAL_EXECUTION_STATES = ["SUCCESS", "ERROR"]
 
-datasync_task_arn_param_name = os.environ["DATASYNC_TASK_ARN_SSM_PARAM_NAME"]
+# Format of the eventTime of S3 event records
+S3_EVENT_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+logger = get_logger("trigger_datasync")
 
 # Let's use Amazon Datasync
 datasync = boto3.client("datasync")
 ssm = boto3.client("ssm")
 
+# Task arns read from SSM, keyed by parameter name
+task_arn_cache = {}
+
+
+def get_sync_scopes():
+    # Scopes of the same group are dispatched together, the hourly group holds the
+    # task of each shard of the hourly prefix and the task of the remaining keys
+    sync_scopes = {
+        INSTANT_SYNC_SCOPE: {
+            "group": INSTANT_SYNC_SCOPE,
+            "task_arn_param_name": datasync_task_arn_param_name,
+            "subdirectory": datasync_source_subdirectory,
+            "prefixes": [],
+        }
+    }
+
+    if datasync_hourly_task_arn_param_name:
+        sync_scopes[HOURLY_SYNC_SCOPE] = {
+            "group": HOURLY_SYNC_SCOPE,
+            "task_arn_param_name": datasync_hourly_task_arn_param_name,
+            "subdirectory": datasync_hourly_source_subdirectory,
+            "prefixes": [],
+        }
+
+        for shard_index, shard_prefixes in enumerate(datasync_hourly_shards):
+            sync_scopes[f"{HOURLY_SYNC_SCOPE}-shard-{shard_index}"] = {
+                "group": HOURLY_SYNC_SCOPE,
+                "task_arn_param_name": f"{datasync_hourly_task_arn_param_name}-shard-{shard_index}",
+                "subdirectory": datasync_hourly_source_subdirectory,
+                "prefixes": shard_prefixes,
+            }
+
+    return sync_scopes
+
+
+sync_scopes = get_sync_scopes()
+
 
 def lambda_handler(event, context):
-    objectKey = ""
-    datasync_task_arn = ""
+    logger.start_invocation(context, event)
+
+    if event.get("source") == "aws.datasync":
+        return handle_execution_state_change(event)
+
+    if "sync_scope" in event:
+        return handle_scheduled_sync(event["sync_scope"])
+
+    if is_sqs_event(event):
+        return handle_sqs_event(event)
+
+    submitted_scopes = submit_object_keys(get_object_keys(event))
 
-    print(event)
+    if INSTANT_SYNC_SCOPE not in submitted_scopes:
+        return {"response": None}
+
+    return {
+        "response": scheduler.dispatch(
+            INSTANT_SYNC_SCOPE, get_datasync_task_arn(INSTANT_SYNC_SCOPE)
+        )
+    }
+
+
+def is_sqs_event(event):
+    records = event.get("Records") or [{}]
+    return records[0].get("eventSource") == "aws:sqs"
+
+
+def handle_sqs_event(event):
+    # S3 event notifications delivered through the trigger queue, one S3 event per
+    # message. Only messages whose keys could not be accepted are reported back so
+    # that SQS retries them and eventually moves them to the dead letter queue.
+    batch_item_failures = []
+    submitted_scopes = set()
+
+    for record in event["Records"]:
+        try:
+            s3_event = json.loads(record["body"])
+
+            # S3 sends a test event when the notification configuration is created
+            if s3_event.get("Event") == "s3:TestEvent":
+                continue
+
+            submitted_scopes.update(submit_object_keys(get_object_keys(s3_event)))
+        except Exception as e:
+            logger.exception(
+                "Unable to queue object keys", e, message_id=record["messageId"]
+            )
+            batch_item_failures.append({"itemIdentifier": record["messageId"]})
+
+    # Queued keys are kept by the scheduler, a failure to start the execution is
+    # retried on the next event and does not require the messages to be redelivered
+    if INSTANT_SYNC_SCOPE in submitted_scopes:
+        try:
+            scheduler.dispatch(
+                INSTANT_SYNC_SCOPE, get_datasync_task_arn(INSTANT_SYNC_SCOPE)
+            )
+        except Exception as e:
+            logger.exception("Unable to start DataSync execution", e)
+
+    return {"batchItemFailures": batch_item_failures}
+
+
+def handle_scheduled_sync(sync_group):
+    # Sent by the incremental sync schedule, starts an execution of each task of the
+    # group for the keys changed since its previous one instead of a scan of the
+    # whole location
+    group_scopes = [
+        sync_scope
+        for sync_scope in sync_scopes
+        if sync_scopes[sync_scope]["group"] == sync_group
+    ]
+
+    if not group_scopes:
+        raise ValueError(f"Sync scope {sync_group} is not configured.")
+
+    return {
+        "response": [
+            scheduler.dispatch(sync_scope, get_datasync_task_arn(sync_scope))
+            for sync_scope in group_scopes
+        ]
+    }
+
+
+def get_object_keys(event):
+    # Object keys with the time of their S3 event, from which the sync latency is measured
+    object_keys = {}
 
     try:
-        objectKey = event["Records"][0]["s3"]["object"]["key"]
+        for record in event["Records"]:
+            object_key = unquote_plus(record["s3"]["object"]["key"])
+            object_keys[object_key] = get_event_time(record)
     except KeyError:
         raise KeyError(
             "Received invalid event - unable to locate Object key to upload.", event
         )
 
+    return object_keys
+
+
+def get_event_time(record):
     try:
-        parameter = ssm.get_parameter(
-            Name=datasync_task_arn_param_name, WithDecryption=True
+        return (
+            datetime.strptime(record["eventTime"], S3_EVENT_TIME_FORMAT)
+            .replace(tzinfo=timezone.utc)
+            .timestamp()
         )
-        print(parameter)
-        datasync_task_arn = parameter["Parameter"]["Value"]
-    except ValueError:
-        raise ValueError(
-            f"Unable to locate value for parameter {datasync_task_arn_param_name}.",
-            event,
+    except (KeyError, ValueError):
+        return time.time()
+
+
+def get_sync_scope(object_key):
+    # The hourly location is checked first, the instant one may be the whole bucket
+    if HOURLY_SYNC_SCOPE in sync_scopes and is_in_location(
+        object_key, datasync_hourly_source_subdirectory
+    ):
+        relative_path = get_relative_path(
+            object_key, datasync_hourly_source_subdirectory
         )
 
-    response = datasync.start_task_execution(
-        TaskArn=datasync_task_arn,
-        OverrideOptions={},
-        Includes=[
-            {"FilterType": "SIMPLE_PATTERN", "Value": "/" + os.path.basename(objectKey)}
-        ],
+        for sync_scope, scope in sync_scopes.items():
+            if is_in_prefixes(relative_path, scope["prefixes"]):
+                return sync_scope
+
+        return HOURLY_SYNC_SCOPE
+
+    if is_in_location(object_key, datasync_source_subdirectory):
+        return INSTANT_SYNC_SCOPE
+
+    return None
+
+
+def submit_object_keys(object_keys):
+    keys_by_scope = {}
+
+    for object_key, received_at in object_keys.items():
+        keys_by_scope.setdefault(get_sync_scope(object_key), {})[
+            object_key
+        ] = received_at
+
+    # The tasks only see objects under their source location subdirectory
+    ignored_keys = keys_by_scope.pop(None, {})
+
+    if ignored_keys:
+        logger.warning(
+            "Ignoring keys outside of the DataSync locations",
+            object_keys=list(ignored_keys),
+        )
+
+    for sync_scope, scope_keys in keys_by_scope.items():
+        scheduler.submit(sync_scope, scope_keys)
+
+    return set(keys_by_scope)
+
+
+def get_datasync_task_arn(sync_scope, refresh=False):
+    if sync_scope == INSTANT_SYNC_SCOPE and datasync_task_arn_from_env:
+        return datasync_task_arn_from_env
+
+    param_name = sync_scopes[sync_scope]["task_arn_param_name"]
+    cached_arn = task_arn_cache.get(param_name)
+    now = time.time()
+
+    if refresh or cached_arn is None or now >= cached_arn["expires_at"]:
+        try:
+            parameter = ssm.get_parameter(Name=param_name, WithDecryption=True)
+            logger.info(
+                "Read task arn",
+                name=param_name,
+                version=parameter["Parameter"].get("Version"),
+            )
+            cached_arn = {
+                "value": parameter["Parameter"]["Value"],
+                "fetched_at": now,
+                "expires_at": now + datasync_task_arn_cache_ttl,
+            }
+            task_arn_cache[param_name] = cached_arn
+        except ValueError:
+            raise ValueError(f"Unable to locate value for parameter {param_name}.")
+
+    return cached_arn["value"]
+
+
+def handle_execution_state_change(event):
+    execution_arns = event.get("resources", [])
+    state = event.get("detail", {}).get("State")
+
+    if state not in TERMINAL_EXECUTION_STATES:
+        return {"response": None}
+
+    # The rule matches every task in the account, only react to the synced tasks
+    for sync_scope in sync_scopes:
+        datasync_task_arn = get_datasync_task_arn(sync_scope)
+
+        if not any(arn.startswith(datasync_task_arn) for arn in execution_arns):
+            continue
+
+        lock = scheduler.release(sync_scope, execution_arns[0])
+
+        publish_execution_metrics(sync_scope, execution_arns[0], lock)
+
+        # The next incremental execution waits for the schedule, unless keys were
+        # left queued when this one started. The executions then follow each other
+        # until the keys queued at the schedule are synced, so that a backlog larger
+        # than one execution does not grow from one schedule to the next.
+        if sync_scopes[sync_scope]["group"] == HOURLY_SYNC_SCOPE and not (
+            lock and lock["has_backlog"]
+        ):
+            return {"response": None}
+
+        return {"response": scheduler.dispatch(sync_scope, datasync_task_arn)}
+
+    return {"response": None}
+
+
+def publish_execution_metrics(sync_scope, execution_arn, lock):
+    # Metrics must not prevent the next execution from being started
+    try:
+        task_execution = datasync.describe_task_execution(
+            TaskExecutionArn=execution_arn
+        )
+    except Exception as e:
+        logger.exception("Unable to describe execution", e, execution_arn=execution_arn)
+        return
+
+    # The lock only holds the receive time of executions started by the scheduler
+    oldest_received_at = 0
+
+    if lock and lock["execution_arn"] == execution_arn:
+        oldest_received_at = lock["oldest_received_at"]
+
+    sync_metrics.put_execution_finished(
+        sync_scope, task_execution, oldest_received_at, time.time()
     )
 
-    return {"response": response}
+
+def start_execution_for_keys(sync_scope, datasync_task_arn, object_keys):
+    # Only the first chunk is started, the remaining keys stay queued for the next
+    # execution
+    filters = build_include_filters(
+        object_keys,
+        sync_scopes[sync_scope]["subdirectory"],
+        datasync_directory_filter_threshold,
+    )
+
+    try:
+        response = start_task_execution(
+            sync_scope, datasync_task_arn, filters[0]["Value"]
+        )
+    except datasync.exceptions.InvalidRequestException as e:
+        raise ExecutionRejectedError(filters[0]["Keys"], str(e))
+
+    logger.info(
+        "Started execution",
+        sync_scope=sync_scope,
+        execution_arn=response["TaskExecutionArn"],
+        started_keys=len(filters[0]["Keys"]),
+        queued_keys=len(object_keys),
+    )
+
+    return response, filters[0]["Keys"]
+
+
+def start_task_execution(sync_scope, datasync_task_arn, include_filter):
+    try:
+        return datasync.start_task_execution(
+            TaskArn=datasync_task_arn,
+            OverrideOptions={},
+            Includes=[{"FilterType": "SIMPLE_PATTERN", "Value": include_filter}],
+        )
+    except datasync.exceptions.InvalidRequestException:
+        # The cached arn may belong to a task that has been replaced, retry once
+        # with a fresh value before treating the error as a running execution
+        if sync_scope == INSTANT_SYNC_SCOPE and datasync_task_arn_from_env:
+            raise
+
+        cached_arn = task_arn_cache[sync_scopes[sync_scope]["task_arn_param_name"]]
+
+        if time.time() - cached_arn["fetched_at"] < TASK_ARN_MIN_REFRESH_SECONDS:
+            raise
+
+        current_task_arn = get_datasync_task_arn(sync_scope, refresh=True)
+
+        if current_task_arn == datasync_task_arn:
+            raise
+
+        return datasync.start_task_execution(
+            TaskArn=current_task_arn,
+            OverrideOptions={},
+            Includes=[{"FilterType": "SIMPLE_PATTERN", "Value": include_filter}],
+        )
+
+
+def create_execution_store():
+    if scheduler_table_name:
+        return DynamoDbExecutionStore(
+            boto3.resource("dynamodb").Table(scheduler_table_name)
+        )
+
+    return InMemoryExecutionStore()
+
+
+scheduler = ExecutionScheduler(
+    datasync, create_execution_store(), start_execution_for_keys, scheduler_lock_timeout
+)
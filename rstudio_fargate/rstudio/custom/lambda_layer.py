@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script creates the lambda layer holding the helpers shared by the lambda
+handlers: the structured logging helper and the custom resource response helper
+
+"""
+
+from aws_cdk import (
+    core,
+    aws_lambda as lambda_,
+)
+
+LAMBDA_LAYER_ID = "Lambda-Helpers-Layer"
+
+# Fraction of invocations whose event and response payloads are logged above DEBUG level
+LOG_DEBUG_SAMPLE_RATE = "0.01"
+
+
+def get_lambda_layer(scope: core.Construct) -> lambda_.ILayerVersion:
+    """Return the lambda helpers layer of the stack of scope, the layer is created
+    by the first construct of the stack that needs it and shared by the others."""
+    stack = core.Stack.of(scope)
+    layer = stack.node.try_find_child(LAMBDA_LAYER_ID)
+
+    if layer is None:
+        layer = lambda_.LayerVersion(
+            stack,
+            id=LAMBDA_LAYER_ID,
+            code=lambda_.Code.from_asset(
+                "rstudio_fargate/rstudio/custom/lambda_layer/"
+            ),
+            compatible_runtimes=[
+                lambda_.Runtime.PYTHON_3_7,
+                lambda_.Runtime.PYTHON_3_8,
+            ],
+            description="Helpers shared by the lambda handlers",
+        )
+
+    return layer
+
+
+def get_logging_environment(scope: core.Construct) -> dict:
+    """Return the logging environment variables of a lambda handler, the level is
+    read from the lambda_log_level context value."""
+    log_level = scope.node.try_get_context("lambda_log_level") or "INFO"
+    return {"LOG_LEVEL": log_level, "LOG_DEBUG_SAMPLE_RATE": LOG_DEBUG_SAMPLE_RATE}
@@ -0,0 +1,100 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script sends the response of a CloudFormation custom resource handler. It has
+the interface of the cfnresponse module, which is only available to handlers
+deployed as inline code, so that the handlers can be deployed as assets. It also
+derives stable physical resource ids from the resource properties, so that an update
+does not make CloudFormation replace the resource.
+
+"""
+
+import hashlib
+import json
+import urllib.request
+
+from structured_logging import get_logger
+
+logger = get_logger("cfn_response")
+
+SUCCESS = "SUCCESS"
+FAILED = "FAILED"
+
+
+def get_resource_properties(properties):
+    # The service token changes with the function, not with the inputs of the resource
+    return {key: value for key, value in properties.items() if key != "ServiceToken"}
+
+
+def is_unchanged_update(event):
+    return event["RequestType"] == "Update" and get_resource_properties(
+        event["ResourceProperties"]
+    ) == get_resource_properties(event.get("OldResourceProperties", {}))
+
+
+def get_physical_resource_id(event):
+    """Return the physical resource id of a request. Deletes and updates that do not
+    change the properties keep the current id, other requests get an id derived from
+    the logical id and the properties."""
+    if event["RequestType"] == "Delete" or is_unchanged_update(event):
+        return event["PhysicalResourceId"]
+
+    properties = json.dumps(
+        get_resource_properties(event["ResourceProperties"]), sort_keys=True
+    )
+    digest = hashlib.sha256(properties.encode("utf-8")).hexdigest()[:16]
+    return f"{event['LogicalResourceId']}-{digest}"
+
+
+def send(
+    event,
+    context,
+    response_status,
+    response_data,
+    physical_resource_id=None,
+    no_echo=False,
+    reason=None,
+):
+    log_stream_name = getattr(context, "log_stream_name", "")
+    body = {
+        "Status": response_status,
+        "Reason": reason
+        or f"See the details in CloudWatch Log Stream: {log_stream_name}",
+        "PhysicalResourceId": physical_resource_id or log_stream_name,
+        "StackId": event["StackId"],
+        "RequestId": event["RequestId"],
+        "LogicalResourceId": event["LogicalResourceId"],
+        "NoEcho": no_echo,
+        "Data": response_data,
+    }
+    data = json.dumps(body).encode("utf-8")
+
+    # The response URL is a presigned S3 url, which rejects a content type
+    request = urllib.request.Request(
+        event["ResponseURL"],
+        data=data,
+        method="PUT",
+        headers={"content-type": "", "content-length": str(len(data))},
+    )
+
+    try:
+        with urllib.request.urlopen(request) as response:
+            logger.info(
+                "Sent response", status=response_status, http_status=response.status
+            )
+    except Exception as e:
+        logger.exception("Failed to send response", e, status=response_status)
@@ -0,0 +1,166 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script is the structured logging helper shared by the lambda handlers through a
+lambda layer. It writes one JSON line per log record with the correlation id of the
+invocation. The level is set with the LOG_LEVEL environment variable, and event and
+response payloads are only serialised at DEBUG level or for a sample of invocations.
+Values of secret fields are redacted.
+
+"""
+
+import json
+import os
+import random
+import time
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+log_level = LEVELS.get(os.environ.get("LOG_LEVEL", "INFO").upper(), LEVELS["INFO"])
+
+# Fraction of invocations whose payloads are logged when the level is above DEBUG
+debug_sample_rate = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0"))
+
+# Payloads are truncated so that a large event does not bloat the log ingestion
+MAX_PAYLOAD_LENGTH = int(os.environ.get("LOG_MAX_PAYLOAD_LENGTH", "4096"))
+
+# Fields whose values are never logged, compared in lower case
+REDACTED_FIELDS = {
+    "accesskeyid",
+    "secretaccesskey",
+    "sessiontoken",
+    "secretstring",
+    "secretbinary",
+    "password",
+    "authorization",
+}
+REDACTED_VALUE = "***"
+
+# State of the current invocation, shared by the loggers of all the handler modules
+invocation = {"correlation_id": "", "sampled": False}
+
+
+def redact(payload, redacted_fields=()):
+    """Return a copy of a payload without the values of the secret fields, together
+    with the additional fields given by the caller."""
+    fields = REDACTED_FIELDS.union(field.lower() for field in redacted_fields)
+
+    if isinstance(payload, dict):
+        return {
+            key: (
+                REDACTED_VALUE
+                if str(key).lower() in fields
+                else redact(value, redacted_fields)
+            )
+            for key, value in payload.items()
+        }
+
+    if isinstance(payload, (list, tuple)):
+        return [redact(value, redacted_fields) for value in payload]
+
+    return payload
+
+
+class StructuredLogger:
+    """Logger writing JSON lines with the correlation id of the current invocation.
+
+    Arguments:
+        :param name -- The name of the logger, usually the handler module
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def start_invocation(self, context, event=None, correlation_id=None):
+        """Set the correlation id of the invocation, by default the lambda request
+        id, decide whether its payloads are sampled and log the event payload."""
+        invocation["correlation_id"] = correlation_id or getattr(
+            context, "aws_request_id", ""
+        )
+        invocation["sampled"] = random.random() < debug_sample_rate
+
+        if event is not None:
+            self.payload("Received event", event)
+
+    def is_enabled(self, level):
+        return LEVELS[level] >= log_level
+
+    def log(self, level, message, **fields):
+        if self.is_enabled(level):
+            self.emit(level, message, **fields)
+
+    def emit(self, level, message, **fields):
+        record = {
+            "timestamp": round(time.time(), 3),
+            "level": level,
+            "logger": self.name,
+            "message": message,
+            "correlation_id": invocation["correlation_id"],
+        }
+        record.update(fields)
+
+        print(json.dumps(record, default=str))
+
+    def debug(self, message, **fields):
+        self.log("DEBUG", message, **fields)
+
+    def info(self, message, **fields):
+        self.log("INFO", message, **fields)
+
+    def warning(self, message, **fields):
+        self.log("WARNING", message, **fields)
+
+    def error(self, message, **fields):
+        self.log("ERROR", message, **fields)
+
+    def exception(self, message, error, **fields):
+        self.log(
+            "ERROR",
+            message,
+            error=str(error),
+            error_type=type(error).__name__,
+            **fields,
+        )
+
+    def payload(self, message, payload, redacted_fields=()):
+        """Log a redacted and truncated payload at DEBUG level, whatever the level of
+        the logger for the sampled invocations. The payload is not serialised when it
+        is not logged."""
+        if not (invocation["sampled"] or self.is_enabled("DEBUG")):
+            return
+
+        serialised = json.dumps(redact(payload, redacted_fields), default=str)
+
+        if len(serialised) > MAX_PAYLOAD_LENGTH:
+            self.emit(
+                "DEBUG",
+                message,
+                payload=serialised[:MAX_PAYLOAD_LENGTH],
+                truncated=True,
+                sampled=invocation["sampled"],
+            )
+        else:
+            self.emit(
+                "DEBUG",
+                message,
+                payload=json.loads(serialised),
+                sampled=invocation["sampled"],
+            )
+
+
+def get_logger(name):
+    return StructuredLogger(name)
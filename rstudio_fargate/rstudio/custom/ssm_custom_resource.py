@@ -36,18 +36,24 @@ from aws_cdk.custom_resources import (
 
 from datetime import datetime
 
+from .lambda_layer import (
+    get_lambda_layer,
+    get_logging_environment,
+)
 
-class SSMParameterReader(core.Construct):
-    """SSM Parameter constructs that retrieves the parameter value form an environment
+
+class SSMParametersReader(core.Construct):
+    """SSM Parameter constructs that retrieves the values of several parameters form an
+    environment with a single custom resource
     Arguments:
-        :param parameter_name -- The name of the SSM parameter to retrieve its value
+        :param parameter_names -- The names of the SSM parameters to retrieve the values
     """
 
     def __init__(
         self,
         scope: core.Construct,
         id: str,
-        parameter_name: str,
+        parameter_names: list,
         region: str,
         instance: str,
         rstudio_account_id: str,
@@ -60,11 +66,7 @@ class SSMParameterReader(core.Construct):
     ) -> None:
         super().__init__(scope, id)
 
-        with open(
-            "rstudio_fargate/rstudio/custom/ssm_custom_resource_handler.py",
-            encoding="utf-8",
-        ) as fp:
-            code_body = fp.read()
+        self.parameter_names = list(parameter_names)
 
         cross_account_role_arn_network = (
             f"arn:aws:iam::{network_account_id}:role/{ssm_cross_account_role_name}"
@@ -89,7 +91,10 @@ class SSMParameterReader(core.Construct):
             ),
         ]
 
-        params = {"ParameterName": parameter_name, "AssumeRole": cross_account_role_arn}
+        params = {
+            "ParameterNames": self.parameter_names,
+            "AssumeRole": cross_account_role_arn,
+        }
 
         role = self.get_provisioning_lambda_role(
             construct_id=id,
@@ -107,19 +112,24 @@ class SSMParameterReader(core.Construct):
                     self,
                     "Singleton",
                     uuid="f7d4f730-4ee1-11e8-9c2d-fa7ae01bbebc",
-                    code=lambda_.InlineCode(code_body),
-                    handler="index.main",
+                    code=lambda_.Code.from_asset(
+                        "rstudio_fargate/rstudio/custom/ssm_reader/"
+                    ),
+                    handler="ssm_custom_resource_handler.main",
                     timeout=core.Duration.seconds(300),
                     runtime=lambda_.Runtime.PYTHON_3_7,
                     role=role,
                     initial_policy=policy,
+                    layers=[get_lambda_layer(self)],
+                    environment=get_logging_environment(self),
                 )
             ),
             properties=params,
         )
 
-    def get_parameter_value(self):
-        return self.resource.get_att("Response").to_string()
+    def get_parameter_value(self, parameter_name: str):
+        index = self.parameter_names.index(parameter_name)
+        return self.resource.get_att(f"Value{index}").to_string()
 
     def get_provisioning_lambda_role(
         self,
@@ -135,3 +145,22 @@ class SSMParameterReader(core.Construct):
             role_arn=f"arn:aws:iam::{rstudio_account_id}:role/{ssm_cross_account_lambda_role_name}",
             mutable=True,
         )
+
+
+class SSMParameterReader(SSMParametersReader):
+    """SSM Parameter constructs that retrieves the parameter value form an environment
+    Arguments:
+        :param parameter_name -- The name of the SSM parameter to retrieve its value
+    """
+
+    def __init__(
+        self,
+        scope: core.Construct,
+        id: str,
+        parameter_name: str,
+        **kwargs,
+    ) -> None:
+        super().__init__(scope, id, parameter_names=[parameter_name], **kwargs)
+
+    def get_parameter_value(self):
+        return super().get_parameter_value(self.parameter_names[0])
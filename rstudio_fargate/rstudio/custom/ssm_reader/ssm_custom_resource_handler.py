@@ -0,0 +1,125 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script creates the lambda handler for the cross account hosted zone delegation.
+It reads a list of SSM parameters of another account and returns each value as an
+attribute of the custom resource, in the order of the names.
+
+"""
+
+import boto3
+import time
+import cfn_response
+from structured_logging import get_logger
+
+logger = get_logger("ssm_custom_resource")
+
+# Kept across invocations, the readers of a stack share this singleton function
+sts_connection = boto3.client("sts")
+# SSM clients and expiry time of their credentials per assumed role arn
+ssm_clients = {}
+# Seconds before expiry at which the credentials of a role are renewed
+CREDENTIALS_RENEWAL_MARGIN = 300
+# Maximum number of names of a GetParameters call
+MAX_PARAMETERS_PER_CALL = 10
+
+
+def get_ssm_client(role):
+    client, expires_at = ssm_clients.get(role, (None, 0))
+
+    if time.time() < expires_at - CREDENTIALS_RENEWAL_MARGIN:
+        return client
+
+    credentials = sts_connection.assume_role(
+        RoleArn=role, RoleSessionName="cross_acct_lambda"
+    )["Credentials"]
+    logger.info("Assumed role", role=role)
+
+    # create service client using the assumed role credentials
+    client = boto3.client(
+        "ssm",
+        aws_access_key_id=credentials["AccessKeyId"],
+        aws_secret_access_key=credentials["SecretAccessKey"],
+        aws_session_token=credentials["SessionToken"],
+    )
+    ssm_clients[role] = (client, credentials["Expiration"].timestamp())
+    return client
+
+
+def get_parameter_values(client, parameter_names):
+    """Return the values of the parameters by name, reading them in chunks of the
+    GetParameters limit."""
+    values = {}
+
+    for start in range(0, len(parameter_names), MAX_PARAMETERS_PER_CALL):
+        chunk = parameter_names[start : start + MAX_PARAMETERS_PER_CALL]
+        response = client.get_parameters(Names=chunk, WithDecryption=True)
+
+        # GetParameters does not fail on missing names, unlike GetParameter
+        if response["InvalidParameters"]:
+            raise ValueError(f"Parameters not found: {response['InvalidParameters']}")
+
+        for parameter in response["Parameters"]:
+            values[parameter["Name"]] = parameter["Value"]
+
+    return values
+
+
+def main(event, context):
+    physical_id = event.get("PhysicalResourceId")
+
+    logger.start_invocation(context, event, event.get("RequestId"))
+
+    try:
+        # Derived from the properties, so an update that only changes the service
+        # token keeps the reader, and a change of the parameter names replaces it.
+        # The values are read again on every update since the response replaces the
+        # attributes.
+        physical_id = cfn_response.get_physical_resource_id(event)
+
+        # Check if this is a Create and we're failing Creates
+        if event["RequestType"] == "Create" and event["ResourceProperties"].get(
+            "FailCreate", False
+        ):
+            raise RuntimeError("Create failure requested")
+        if event["RequestType"] in ["Create", "Update"]:
+            client = get_ssm_client(event["ResourceProperties"]["AssumeRole"])
+            parameter_names = event["ResourceProperties"]["ParameterNames"]
+
+            values = get_parameter_values(client, parameter_names)
+            logger.info("Read parameters", names=parameter_names)
+
+            attributes = {
+                f"Value{index}": values[parameter_name]
+                for index, parameter_name in enumerate(parameter_names)
+            }
+
+            cfn_response.send(
+                event, context, cfn_response.SUCCESS, attributes, physical_id
+            )
+
+        # Do not call into STS and SSM when the resource is being deleted by CloudFormation
+        if event["RequestType"] == "Delete":
+            attributes = {"Response": "Delete performed"}
+            cfn_response.send(
+                event, context, cfn_response.SUCCESS, attributes, physical_id
+            )
+    except Exception as e:
+        logger.exception("Request failed", e)
+        cfn_response.send(
+            event, context, cfn_response.FAILED, {}, physical_id, reason=str(e)
+        )
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script plans the shards of the hourly DataSync prefix. It balances the
+sub-prefixes of the hourly prefix across a number of shards by object count or bytes,
+and prints the datasync_hourly_shards value to set in parameters.json. Each shard is
+synced by its own DataSync task.
+
+Usage:
+    python datasync_shard_planner.py <listing> <shard_count> [hourly_prefix]
+
+The listing is either a CSV file of "sub-prefix,object count or bytes" lines, or the
+output of "aws s3 ls --recursive s3://<bucket>/<hourly_prefix>/", in which case the
+bytes are summed per first-level sub-prefix of hourly_prefix.
+
+"""
+
+import json
+import sys
+
+
+def get_shard_filter(shard_prefixes: list) -> str:
+    """Return the SIMPLE_PATTERN filter value including the sub-prefixes of a shard,
+    relative to the subdirectory of the hourly source location."""
+    return "|".join(f"/{prefix.strip('/')}" for prefix in shard_prefixes)
+
+
+def read_prefix_sizes(lines: list, hourly_prefix: str = "") -> dict:
+    """Read a CSV listing or an "aws s3 ls --recursive" listing into a dictionary of
+    sub-prefix sizes."""
+    hourly_prefix = hourly_prefix.strip("/")
+    prefix_sizes = {}
+
+    for line in lines:
+        line = line.strip()
+
+        if not line:
+            continue
+
+        if "," in line:
+            prefix, size = line.rsplit(",", 1)
+        else:
+            # "2021-01-01 00:00:00   1234 hourly_sync/prefix/key"
+            fields = line.split(None, 3)
+
+            if len(fields) < 4:
+                continue
+
+            size, key = fields[2], fields[3]
+
+            if hourly_prefix and key.startswith(f"{hourly_prefix}/"):
+                key = key[len(hourly_prefix) + 1 :]
+
+            # Objects at the root of the hourly prefix are left to the remainder task
+            if "/" not in key:
+                continue
+
+            prefix = key.split("/", 1)[0]
+
+        prefix = prefix.strip().strip("/")
+        prefix_sizes[prefix] = prefix_sizes.get(prefix, 0) + int(size)
+
+    return prefix_sizes
+
+
+def plan_shards(prefix_sizes: dict, shard_count: int) -> list:
+    """Assign each sub-prefix to a shard, largest first to the least loaded shard.
+    Ties are broken by name so that the same listing always gives the same plan."""
+    if shard_count < 1:
+        raise ValueError("The number of shards must be at least one.")
+
+    shards = [{"size": 0, "prefixes": []} for _ in range(shard_count)]
+
+    for prefix in sorted(
+        prefix_sizes, key=lambda prefix: (-prefix_sizes[prefix], prefix)
+    ):
+        shard = min(shards, key=lambda shard: shard["size"])
+        shard["size"] += prefix_sizes[prefix]
+        shard["prefixes"].append(prefix)
+
+    return [sorted(shard["prefixes"]) for shard in shards if shard["prefixes"]]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit(
+            "Usage: python datasync_shard_planner.py <listing> <shard_count> "
+            "[hourly_prefix]"
+        )
+
+    with open(sys.argv[1]) as listing:
+        prefix_sizes = read_prefix_sizes(
+            listing.readlines(), sys.argv[3] if len(sys.argv) > 3 else ""
+        )
+
+    shards = plan_shards(prefix_sizes, int(sys.argv[2]))
+
+    for shard_index, shard_prefixes in enumerate(shards):
+        shard_size = sum(prefix_sizes[prefix] for prefix in shard_prefixes)
+        print(f"Shard {shard_index}: {shard_size} in {len(shard_prefixes)} prefixes")
+
+    print(json.dumps({"datasync_hourly_shards": shards}, indent=2))
@@ -25,13 +25,33 @@ from aws_cdk import (
     aws_logs as logs,
     aws_efs as efs,
     aws_ec2 as ec2,
+    aws_cloudwatch as cloudwatch,
 )
 from aws_cdk.core import (
     RemovalPolicy,
+    Duration,
 )
 from aws_cdk.aws_ec2 import Port
 import json
 
+from .datasync_shard_planner import get_shard_filter
+
+# Namespace of the sync metrics published by the trigger lambda in the Embedded Metric Format
+SYNC_METRICS_NAMESPACE = "Rstudio/DataSync"
+SYNC_METRICS_PERIOD = Duration.minutes(5)
+SYNC_LATENCY_ALARM_EVALUATION_PERIODS = 3
+
+
+def get_task_options(task_options: dict) -> datasync.CfnTask.OptionsProperty:
+    """Build the DataSync task options from a profile of parameters.json, where all
+    values are strings and the keys are the OptionsProperty argument names."""
+    options = dict(task_options)
+
+    if "bytes_per_second" in options:
+        options["bytes_per_second"] = int(options["bytes_per_second"])
+
+    return datasync.CfnTask.OptionsProperty(**options)
+
 
 class DataSyncStack(cdk.Stack):
     def __init__(
@@ -50,6 +70,13 @@ class DataSyncStack(cdk.Stack):
         access_point_path_hourly: str,
         datalake_source_bucket_key_instant: str,
         access_point_path_instant: str,
+        datasync_hourly_task_arn_ssm_param_name: str,
+        datasync_incremental_sync_enabled: bool,
+        datasync_full_sync_schedule_expression: str,
+        datasync_hourly_task_options: dict,
+        datasync_instant_task_options: dict,
+        datasync_hourly_shards: list,
+        datasync_sync_latency_alarm_threshold_seconds: int,
         **kwargs,
     ) -> None:
         super().__init__(scope, id, **kwargs)
@@ -154,6 +181,19 @@ class DataSyncStack(cdk.Stack):
             tags=None,
         )
 
+        # The sub-prefixes of each shard of the hourly prefix are synced in parallel by
+        # a task of their own, and the first task syncs everything no shard includes
+        hourly_task_count = len(datasync_hourly_shards) + 1
+
+        def get_hourly_task_schedule_expression(task_index):
+            # With the incremental sync the trigger lambda starts the tasks hourly for
+            # the changed keys, and the scheduled full scan only reconciles the prefix
+            if datasync_incremental_sync_enabled:
+                return datasync_full_sync_schedule_expression
+
+            # Stagger the hourly runs of the tasks across the hour
+            return f"cron({task_index * 60 // hourly_task_count} * * * ? *)"
+
         # Create a task
         datasync_task_hourly = datasync.CfnTask(
             self,
@@ -161,15 +201,57 @@ class DataSyncStack(cdk.Stack):
             destination_location_arn=destination_location_hourly.attr_location_arn,
             source_location_arn=source_location_hourly.attr_location_arn,
             cloud_watch_log_group_arn=f"arn:aws:logs:{self.region}:{self.account}:log-group:{datasync_log_group.log_group_name}",
-            excludes=None,
+            excludes=(
+                [
+                    datasync.CfnTask.FilterRuleProperty(
+                        filter_type="SIMPLE_PATTERN",
+                        value=get_shard_filter(
+                            [
+                                prefix
+                                for shard_prefixes in datasync_hourly_shards
+                                for prefix in shard_prefixes
+                            ]
+                        ),
+                    )
+                ]
+                if datasync_hourly_shards
+                else None
+            ),
             name=f"rstudio-data-xfer-task-{instance}",
-            options=datasync.CfnTask.OptionsProperty(log_level="TRANSFER"),
+            options=get_task_options(datasync_hourly_task_options),
             schedule=datasync.CfnTask.TaskScheduleProperty(
-                schedule_expression="cron(0 * * * ? *)"
+                schedule_expression=get_hourly_task_schedule_expression(0)
             ),
             tags=None,
         )
 
+        datasync_task_hourly_shards = []
+
+        for shard_index, shard_prefixes in enumerate(datasync_hourly_shards):
+            datasync_task_hourly_shards.append(
+                datasync.CfnTask(
+                    self,
+                    id=f"rstudio-data-xfer-task-shard-{shard_index}-{instance}",
+                    destination_location_arn=destination_location_hourly.attr_location_arn,
+                    source_location_arn=source_location_hourly.attr_location_arn,
+                    cloud_watch_log_group_arn=f"arn:aws:logs:{self.region}:{self.account}:log-group:{datasync_log_group.log_group_name}",
+                    includes=[
+                        datasync.CfnTask.FilterRuleProperty(
+                            filter_type="SIMPLE_PATTERN",
+                            value=get_shard_filter(shard_prefixes),
+                        )
+                    ],
+                    name=f"rstudio-data-xfer-task-shard-{shard_index}-{instance}",
+                    options=get_task_options(datasync_hourly_task_options),
+                    schedule=datasync.CfnTask.TaskScheduleProperty(
+                        schedule_expression=get_hourly_task_schedule_expression(
+                            shard_index + 1
+                        )
+                    ),
+                    tags=None,
+                )
+            )
+
         efs_filesystem_hourly.connections.allow_from(
             datasync_security_group, Port.tcp(2049)
         )
@@ -229,7 +311,7 @@ class DataSyncStack(cdk.Stack):
             cloud_watch_log_group_arn=f"arn:aws:logs:{self.region}:{self.account}:log-group:{datasync_log_group.log_group_name}",
             excludes=None,
             name=f"instant-rstudio-data-xfer-task-{instance}",
-            options=datasync.CfnTask.OptionsProperty(log_level="TRANSFER"),
+            options=get_task_options(datasync_instant_task_options),
             tags=None,
         )
 
@@ -265,6 +347,9 @@ class DataSyncStack(cdk.Stack):
 
         datasync_task_hourly.node.add_dependency(datasync_log_group)
 
+        for datasync_task_hourly_shard in datasync_task_hourly_shards:
+            datasync_task_hourly_shard.node.add_dependency(datasync_log_group)
+
         instant_datasync_task.node.add_dependency(datasync_log_group)
 
         self.instant_datasync_task_arn = instant_datasync_task.attr_task_arn
@@ -278,3 +363,103 @@ class DataSyncStack(cdk.Stack):
             string_value=instant_datasync_task.attr_task_arn,
             tier=ssm.ParameterTier.ADVANCED,
         )
+
+        ssm.StringParameter(
+            self,
+            id=f"rstudio-datasync-hourly-task-arn-{instance}",
+            allowed_pattern=".*",
+            description="The arn of the hourly Datasync task",
+            parameter_name=datasync_hourly_task_arn_ssm_param_name,
+            string_value=datasync_task_hourly.attr_task_arn,
+            tier=ssm.ParameterTier.ADVANCED,
+        )
+
+        for shard_index, datasync_task_hourly_shard in enumerate(
+            datasync_task_hourly_shards
+        ):
+            ssm.StringParameter(
+                self,
+                id=f"rstudio-datasync-hourly-task-arn-shard-{shard_index}-{instance}",
+                allowed_pattern=".*",
+                description=f"The arn of the hourly Datasync task of shard {shard_index}",
+                parameter_name=f"{datasync_hourly_task_arn_ssm_param_name}-shard-{shard_index}",
+                string_value=datasync_task_hourly_shard.attr_task_arn,
+                tier=ssm.ParameterTier.ADVANCED,
+            )
+
+        # Dashboard of the sync metrics published by the trigger lambda
+        sync_scopes = ["instant"]
+
+        if datasync_incremental_sync_enabled:
+            sync_scopes.append("hourly")
+            sync_scopes.extend(
+                f"hourly-shard-{shard_index}"
+                for shard_index in range(len(datasync_hourly_shards))
+            )
+
+        def get_sync_metrics(metric_name, statistic):
+            return [
+                cloudwatch.Metric(
+                    namespace=SYNC_METRICS_NAMESPACE,
+                    metric_name=metric_name,
+                    dimensions_map={"Instance": instance, "SyncScope": sync_scope},
+                    statistic=statistic,
+                    period=SYNC_METRICS_PERIOD,
+                    label=f"{sync_scope} {statistic}",
+                )
+                for sync_scope in sync_scopes
+            ]
+
+        cloudwatch.Dashboard(
+            self,
+            id=f"Rstudio-DataSync-Dashboard-{instance}",
+            dashboard_name=f"Rstudio-DataSync-{instance}",
+            widgets=[
+                [
+                    cloudwatch.GraphWidget(
+                        title="End to end sync latency (ms)",
+                        left=get_sync_metrics("EndToEndSyncLatency", "p50")
+                        + get_sync_metrics("EndToEndSyncLatency", "p95"),
+                        width=12,
+                    ),
+                    cloudwatch.GraphWidget(
+                        title="S3 event to execution start latency (ms)",
+                        left=get_sync_metrics("ExecutionStartLatency", "p95"),
+                        width=12,
+                    ),
+                ],
+                [
+                    cloudwatch.GraphWidget(
+                        title="Execution duration (ms)",
+                        left=get_sync_metrics("ExecutionDuration", "p95"),
+                        width=8,
+                    ),
+                    cloudwatch.GraphWidget(
+                        title="Bytes and files transferred",
+                        left=get_sync_metrics("BytesTransferred", "Sum"),
+                        right=get_sync_metrics("FilesTransferred", "Sum"),
+                        width=8,
+                    ),
+                    cloudwatch.GraphWidget(
+                        title="Executions rejected, deferred and failed",
+                        left=get_sync_metrics("ExecutionsRejected", "Sum")
+                        + get_sync_metrics("ExecutionsDeferred", "Sum")
+                        + get_sync_metrics("ExecutionsFailed", "Sum"),
+                        width=8,
+                    ),
+                ],
+            ],
+        )
+
+        # The hourly scopes wait for their schedule, only the instant upload latency is alarmed
+        cloudwatch.Alarm(
+            self,
+            id=f"Rstudio-DataSync-Latency-Alarm-{instance}",
+            alarm_name=f"Rstudio-DataSync-Instant-Latency-{instance}",
+            alarm_description="p95 end to end latency of the instant upload DataSync sync is too high",
+            metric=get_sync_metrics("EndToEndSyncLatency", "p95")[0],
+            threshold=datasync_sync_latency_alarm_threshold_seconds * 1000,
+            evaluation_periods=SYNC_LATENCY_ALARM_EVALUATION_PERIODS,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+        )
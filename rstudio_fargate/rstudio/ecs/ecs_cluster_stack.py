@@ -56,6 +56,8 @@ class EcsClusterStack(cdk.Stack):
             cluster_name=ecs_cluster_name,
             vpc=vpc,
             container_insights=True,
+            # Used by the capacity provider strategies of the Fargate services
+            enable_fargate_capacity_providers=True,
         )
 
         if rstudio_install_type == "ec2":
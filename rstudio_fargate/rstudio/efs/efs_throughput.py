@@ -0,0 +1,252 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script sets the performance and throughput modes of the EFS file systems from
+their profiles in parameters.json, recommends a throughput mode at synth time from the
+expected data size and throughput, and alarms on the burst credits and I/O limit to
+the EFS alarm topic of the instance
+
+"""
+
+from aws_cdk import (
+    core as cdk,
+    aws_cloudwatch as cloudwatch,
+    aws_cloudwatch_actions as cloudwatch_actions,
+    aws_efs as efs,
+    aws_sns as sns,
+)
+
+PERFORMANCE_MODES = {
+    "general_purpose": efs.PerformanceMode.GENERAL_PURPOSE,
+    "max_io": efs.PerformanceMode.MAX_IO,
+}
+THROUGHPUT_MODES = ["bursting", "provisioned", "elastic"]
+
+# A bursting file system earns credits at 50 MiB/s per TiB of data, and bursts to
+# 100 MiB/s, or 100 MiB/s per TiB above 1 TiB
+BURSTING_BASELINE_MIBPS_PER_GIB = 50 / 1024
+BURSTING_BURST_MIBPS_PER_GIB = 100 / 1024
+BURSTING_MIN_BURST_MIBPS = 100
+
+# EFS prices in us-east-1, only their ratio matters to compare the throughput modes.
+# Elastic throughput is billed per GB transferred, between the read and write prices.
+PRICE_PER_PROVISIONED_MIBPS_MONTH = 6.0
+PRICE_PER_ELASTIC_GB = 0.04
+SECONDS_PER_MONTH = 730 * 3600
+
+# A file system starts with 2.1 TiB of burst credits
+DEFAULT_BURST_CREDIT_ALARM_THRESHOLD_GB = 500
+DEFAULT_PERCENT_IO_LIMIT_ALARM_THRESHOLD = 90
+ALARM_EVALUATION_PERIODS = 3
+ALARM_TOPIC_ID = "Efs-Alarm-Topic"
+
+
+def get_bursting_throughput(data_size_in_gb: float) -> tuple:
+    """Return the (baseline, burst) throughput in MiB/s of a bursting file system
+    holding data_size_in_gb GB."""
+    data_size_in_gib = data_size_in_gb * 1000**3 / 1024**3
+    baseline_mibps = data_size_in_gib * BURSTING_BASELINE_MIBPS_PER_GIB
+    burst_mibps = max(
+        BURSTING_MIN_BURST_MIBPS, data_size_in_gib * BURSTING_BURST_MIBPS_PER_GIB
+    )
+
+    return baseline_mibps, burst_mibps
+
+
+def recommend_throughput_mode(
+    data_size_in_gb: float, average_mibps: float, peak_mibps: float
+) -> str:
+    """Return the cheapest throughput mode that serves an average and a peak
+    throughput in MiB/s. Bursting serves them while the average stays under the
+    baseline that the data size earns, otherwise provisioned throughput is sized for
+    the peak and elastic throughput is billed for the data transferred."""
+    baseline_mibps, burst_mibps = get_bursting_throughput(data_size_in_gb)
+
+    if average_mibps <= baseline_mibps and peak_mibps <= burst_mibps:
+        return "bursting"
+
+    # Provisioned throughput is only billed above the baseline of the data size
+    provisioned_price = (
+        max(peak_mibps - baseline_mibps, 0) * PRICE_PER_PROVISIONED_MIBPS_MONTH
+    )
+    elastic_price = (
+        average_mibps * 1024**2 * SECONDS_PER_MONTH / 1000**3 * PRICE_PER_ELASTIC_GB
+    )
+
+    return "provisioned" if provisioned_price < elastic_price else "elastic"
+
+
+def get_file_system_options(profile: dict) -> dict:
+    """Build the performance and throughput arguments of a file system from a profile
+    of parameters.json, where all values are strings. The elastic throughput mode is
+    set on the CloudFormation resource by configure_file_system."""
+    performance_mode = profile.get("performance_mode", "general_purpose")
+    throughput_mode = profile.get("throughput_mode", "bursting")
+
+    if performance_mode not in PERFORMANCE_MODES:
+        raise ValueError(
+            f"The EFS performance mode {performance_mode} is not one of "
+            f"{', '.join(PERFORMANCE_MODES)}"
+        )
+
+    if throughput_mode not in THROUGHPUT_MODES:
+        raise ValueError(
+            f"The EFS throughput mode {throughput_mode} is not one of "
+            f"{', '.join(THROUGHPUT_MODES)}"
+        )
+
+    if throughput_mode == "elastic" and performance_mode != "general_purpose":
+        raise ValueError(
+            "The elastic EFS throughput mode needs the general_purpose performance mode"
+        )
+
+    file_system_options = {"performance_mode": PERFORMANCE_MODES[performance_mode]}
+
+    if throughput_mode == "provisioned":
+        file_system_options["throughput_mode"] = efs.ThroughputMode.PROVISIONED
+        file_system_options["provisioned_throughput_per_second"] = cdk.Size.mebibytes(
+            int(profile["provisioned_throughput_mibps"])
+        )
+    else:
+        file_system_options["throughput_mode"] = efs.ThroughputMode.BURSTING
+
+    return file_system_options
+
+
+def check_throughput_mode(scope: cdk.Construct, name: str, profile: dict) -> None:
+    """Warn at synth time when the throughput mode of a file system differs from the
+    one recommended for the expected data size and throughput of its profile. A
+    profile without expected_data_size_in_gb is not checked."""
+    if "expected_data_size_in_gb" not in profile:
+        return
+
+    data_size_in_gb = float(profile["expected_data_size_in_gb"])
+    average_mibps = float(profile.get("expected_average_throughput_mibps", "0"))
+    peak_mibps = float(profile.get("expected_peak_throughput_mibps", average_mibps))
+    throughput_mode = profile.get("throughput_mode", "bursting")
+    recommended_mode = recommend_throughput_mode(
+        data_size_in_gb, average_mibps, peak_mibps
+    )
+
+    if recommended_mode != throughput_mode:
+        cdk.Annotations.of(scope).add_warning(
+            f"The {name} file system uses the {throughput_mode} throughput mode, the "
+            f"{recommended_mode} mode is recommended for {data_size_in_gb:g} GB with "
+            f"{average_mibps:g} MiB/s on average and {peak_mibps:g} MiB/s at peak"
+        )
+    elif throughput_mode == "provisioned" and peak_mibps > int(
+        profile["provisioned_throughput_mibps"]
+    ):
+        cdk.Annotations.of(scope).add_warning(
+            f"The {name} file system provisions "
+            f"{profile['provisioned_throughput_mibps']} MiB/s, less than its peak of "
+            f"{peak_mibps:g} MiB/s"
+        )
+
+
+def get_alarm_topic(scope: cdk.Construct, alarm_topic_arn: str) -> sns.ITopic:
+    """Return the EFS alarm topic, imported once per stack"""
+    stack = cdk.Stack.of(scope)
+    alarm_topic = stack.node.try_find_child(ALARM_TOPIC_ID)
+
+    if alarm_topic is None:
+        alarm_topic = sns.Topic.from_topic_arn(
+            stack, id=ALARM_TOPIC_ID, topic_arn=alarm_topic_arn
+        )
+
+    return alarm_topic
+
+
+def configure_file_system(
+    scope: cdk.Construct,
+    file_system: efs.FileSystem,
+    name: str,
+    instance: str,
+    profile: dict,
+    alarm_topic_arn: str,
+) -> None:
+    """Set the elastic throughput mode of a file system, check its throughput mode
+    against the recommended one, and add the alarms of its profile. A bursting file
+    system alarms when its burst credits run low, and a general purpose file system
+    when it gets close to its I/O limit. The alarms are named after the stack, as the
+    shards of the shared service mode use the same file system name."""
+    throughput_mode = profile.get("throughput_mode", "bursting")
+
+    if throughput_mode == "elastic":
+        cfn_file_system = file_system.node.default_child
+        cfn_file_system.add_override("Properties.ThroughputMode", "elastic")
+
+    check_throughput_mode(scope, name, profile)
+
+    if profile.get("alarms_enabled", "true").lower() != "true":
+        return
+
+    dimensions_map = {"FileSystemId": file_system.file_system_id}
+    alarm_name_prefix = f"{cdk.Stack.of(scope).stack_name}-Efs-{name}"
+    alarm_action = cloudwatch_actions.SnsAction(get_alarm_topic(scope, alarm_topic_arn))
+
+    if throughput_mode == "bursting":
+        burst_credit_alarm_threshold_gb = float(
+            profile.get(
+                "burst_credit_alarm_threshold_gb",
+                DEFAULT_BURST_CREDIT_ALARM_THRESHOLD_GB,
+            )
+        )
+        burst_credit_alarm = cloudwatch.Alarm(
+            scope,
+            id=f"Efs-{name}-Burst-Credit-Alarm-{instance}",
+            alarm_name=f"{alarm_name_prefix}-BurstCreditBalance",
+            alarm_description=f"The {name} file system is running out of burst credits",
+            metric=cloudwatch.Metric(
+                namespace="AWS/EFS",
+                metric_name="BurstCreditBalance",
+                dimensions_map=dimensions_map,
+                statistic="Minimum",
+                period=cdk.Duration.minutes(5),
+            ),
+            threshold=burst_credit_alarm_threshold_gb * 1000**3,
+            evaluation_periods=ALARM_EVALUATION_PERIODS,
+            comparison_operator=cloudwatch.ComparisonOperator.LESS_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+        )
+        burst_credit_alarm.add_alarm_action(alarm_action)
+
+    # Max I/O file systems do not report PercentIOLimit
+    if profile.get("performance_mode", "general_purpose") == "general_purpose":
+        percent_io_limit_alarm = cloudwatch.Alarm(
+            scope,
+            id=f"Efs-{name}-Percent-IO-Limit-Alarm-{instance}",
+            alarm_name=f"{alarm_name_prefix}-PercentIOLimit",
+            alarm_description=f"The {name} file system is close to its I/O limit",
+            metric=cloudwatch.Metric(
+                namespace="AWS/EFS",
+                metric_name="PercentIOLimit",
+                dimensions_map=dimensions_map,
+                statistic="Maximum",
+                period=cdk.Duration.minutes(5),
+            ),
+            threshold=float(
+                profile.get(
+                    "percent_io_limit_alarm_threshold",
+                    DEFAULT_PERCENT_IO_LIMIT_ALARM_THRESHOLD,
+                )
+            ),
+            evaluation_periods=ALARM_EVALUATION_PERIODS,
+            comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+            treat_missing_data=cloudwatch.TreatMissingData.NOT_BREACHING,
+        )
+        percent_io_limit_alarm.add_alarm_action(alarm_action)
@@ -22,9 +22,13 @@ from aws_cdk import (
     aws_efs as efs,
     aws_kms as kms,
     aws_ec2 as ec2,
+    aws_sns as sns,
+    aws_sns_subscriptions as subscriptions,
 )
 from aws_cdk.core import RemovalPolicy
 
+from .efs_throughput import configure_file_system, get_file_system_options
+
 
 class RstudioEfsStack(cdk.Stack):
     def __init__(
@@ -36,6 +40,8 @@ class RstudioEfsStack(cdk.Stack):
         rstudio_efs_key_alias: str,
         access_point_path_hourly: str,
         access_point_path_instant: str,
+        efs_file_system_options: dict,
+        sns_email: str,
         **kwargs,
     ) -> None:
         super().__init__(scope, id, **kwargs)
@@ -46,6 +52,16 @@ class RstudioEfsStack(cdk.Stack):
             alias_name=rstudio_efs_key_alias,
         )
 
+        # Topic of the throughput alarms of all the file systems of the instance
+        efs_alarm_topic = sns.Topic(
+            self,
+            id=f"Rstudio-Efs-Alarm-Topic-{instance}",
+            display_name=f"Rstudio EFS Alarm Topic {instance}",
+            master_key=rstudio_efs_kms_key_alias,
+        )
+
+        efs_alarm_topic.add_subscription(subscriptions.EmailSubscription(sns_email))
+
         # File system for sharing data between Shiny and RStudio instances
         file_system_rstudio_shiny_share = efs.FileSystem(
             self,
@@ -54,12 +70,20 @@ class RstudioEfsStack(cdk.Stack):
             vpc=vpc,
             encrypted=True,
             kms_key=rstudio_efs_kms_key_alias,
-            performance_mode=efs.PerformanceMode.GENERAL_PURPOSE,
-            throughput_mode=efs.ThroughputMode.BURSTING,
+            **get_file_system_options(efs_file_system_options["share"]),
             enable_automatic_backups=True,
             removal_policy=RemovalPolicy.DESTROY,
         )
 
+        configure_file_system(
+            self,
+            file_system_rstudio_shiny_share,
+            "share",
+            instance,
+            efs_file_system_options["share"],
+            efs_alarm_topic.topic_arn,
+        )
+
         access_point_rstudio_shiny_share = efs.AccessPoint(
             self,
             id=f"Rstudio-shiny-share-access-point-{instance}",
@@ -76,12 +100,20 @@ class RstudioEfsStack(cdk.Stack):
             vpc=vpc,
             encrypted=True,
             kms_key=rstudio_efs_kms_key_alias,
-            performance_mode=efs.PerformanceMode.GENERAL_PURPOSE,
-            throughput_mode=efs.ThroughputMode.BURSTING,
+            **get_file_system_options(efs_file_system_options["hourly"]),
             enable_automatic_backups=True,
             removal_policy=RemovalPolicy.DESTROY,
         )
 
+        configure_file_system(
+            self,
+            file_system_rstudio_hourly,
+            "hourly",
+            instance,
+            efs_file_system_options["hourly"],
+            efs_alarm_topic.topic_arn,
+        )
+
         access_point_rstudio_hourly = efs.AccessPoint(
             self,
             id=f"Rstudio-access-point-hourly-{instance}",
@@ -98,12 +130,20 @@ class RstudioEfsStack(cdk.Stack):
             vpc=vpc,
             encrypted=True,
             kms_key=rstudio_efs_kms_key_alias,
-            performance_mode=efs.PerformanceMode.GENERAL_PURPOSE,
-            throughput_mode=efs.ThroughputMode.BURSTING,
+            **get_file_system_options(efs_file_system_options["instant"]),
             enable_automatic_backups=True,
             removal_policy=RemovalPolicy.DESTROY,
         )
 
+        configure_file_system(
+            self,
+            file_system_rstudio_instant,
+            "instant",
+            instance,
+            efs_file_system_options["instant"],
+            efs_alarm_topic.topic_arn,
+        )
+
         access_point_rstudio_instant = efs.AccessPoint(
             self,
             id=f"Rstudio-access-point-instant-{instance}",
@@ -112,6 +152,9 @@ class RstudioEfsStack(cdk.Stack):
             create_acl=efs.Acl(owner_uid="1000", owner_gid="1000", permissions="755"),
         )
 
+        # EFS alarm topic to pass to other stacks
+        self.efs_alarm_topic_arn = efs_alarm_topic.topic_arn
+
         # Shiny Shared file system to pass to other stacks
         self.file_system_rstudio_shiny_share_file_system_id = (
             file_system_rstudio_shiny_share.file_system_id
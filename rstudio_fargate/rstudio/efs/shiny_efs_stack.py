@@ -25,6 +25,8 @@ from aws_cdk import (
 )
 from aws_cdk.core import RemovalPolicy
 
+from .efs_throughput import configure_file_system, get_file_system_options
+
 
 class ShinyEfsStack(cdk.Stack):
     def __init__(
@@ -34,6 +36,8 @@ class ShinyEfsStack(cdk.Stack):
         vpc: ec2.Vpc,
         instance: str,
         shiny_efs_key_alias: str,
+        efs_file_system_options: dict,
+        efs_alarm_topic_arn: str,
         **kwargs,
     ) -> None:
         super().__init__(scope, id, **kwargs)
@@ -52,12 +56,20 @@ class ShinyEfsStack(cdk.Stack):
             vpc=vpc,
             encrypted=True,
             kms_key=rstudio_efs_kms_key_alias,
-            performance_mode=efs.PerformanceMode.GENERAL_PURPOSE,
-            throughput_mode=efs.ThroughputMode.BURSTING,
+            **get_file_system_options(efs_file_system_options["shiny_home"]),
             enable_automatic_backups=True,
             removal_policy=RemovalPolicy.DESTROY,
         )
 
+        configure_file_system(
+            self,
+            file_system_shiny_home,
+            "shiny-home",
+            instance,
+            efs_file_system_options["shiny_home"],
+            efs_alarm_topic_arn,
+        )
+
         access_point_shiny_home = efs.AccessPoint(
             self,
             id=f"Shiny-access-point-home-{instance}",
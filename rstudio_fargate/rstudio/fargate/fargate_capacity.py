@@ -0,0 +1,92 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script sets the Fargate capacity provider strategy of the Fargate services, which
+splits their tasks between on-demand Fargate and Fargate Spot
+
+"""
+
+from aws_cdk import (
+    core as cdk,
+    aws_ecs as ecs,
+)
+
+# Fargate Spot gives two minutes of notice before it stops a task, the longest stop
+# timeout that Fargate allows
+SPOT_STOP_TIMEOUT = cdk.Duration.seconds(120)
+
+
+def get_capacity_provider_strategy(strategy: dict) -> list:
+    """Build the capacity provider strategy of a service from a profile of
+    parameters.json, where all values are strings. The fargate_base first tasks run
+    on on-demand Fargate, the other tasks are split between on-demand Fargate and
+    Fargate Spot in the ratio of fargate_weight to fargate_spot_weight."""
+    fargate_base = int(strategy.get("fargate_base", "0"))
+    fargate_weight = int(strategy.get("fargate_weight", "1"))
+    fargate_spot_weight = int(strategy.get("fargate_spot_weight", "0"))
+
+    if fargate_weight + fargate_spot_weight < 1:
+        raise ValueError(
+            "A capacity provider strategy needs a fargate_weight or a "
+            "fargate_spot_weight of at least 1"
+        )
+
+    capacity_provider_strategy = []
+
+    if fargate_base > 0 or fargate_weight > 0:
+        capacity_provider_strategy.append(
+            {
+                "CapacityProvider": "FARGATE",
+                "Base": fargate_base,
+                "Weight": fargate_weight,
+            }
+        )
+
+    if fargate_spot_weight > 0:
+        capacity_provider_strategy.append(
+            {"CapacityProvider": "FARGATE_SPOT", "Weight": fargate_spot_weight}
+        )
+
+    return capacity_provider_strategy
+
+
+def uses_fargate_spot(strategy: dict) -> bool:
+    return int(strategy.get("fargate_spot_weight", "0")) > 0
+
+
+def get_stop_timeout(strategy: dict) -> cdk.Duration:
+    # The tasks get the Spot notice to save their state, on-demand tasks keep the
+    # default stop timeout
+    return SPOT_STOP_TIMEOUT if uses_fargate_spot(strategy) else None
+
+
+def set_capacity_provider_strategy(service: ecs.BaseService, strategy: dict) -> None:
+    """Run the tasks of a service on the capacity providers of the strategy. A strategy
+    without Fargate Spot keeps the FARGATE launch type, so that the services already
+    deployed are not updated. A strategy with Fargate Spot removes the launch type,
+    which CloudFormation can only change by replacing a deployed service."""
+    capacity_provider_strategy = get_capacity_provider_strategy(strategy)
+
+    if not uses_fargate_spot(strategy):
+        return
+
+    cfn_service = service.node.default_child
+    cfn_service.add_override(
+        "Properties.CapacityProviderStrategy", capacity_provider_strategy
+    )
+    # A service has either a launch type or a capacity provider strategy
+    cfn_service.add_deletion_override("Properties.LaunchType")
@@ -0,0 +1,113 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script maps the vCPUs and memory requested for a Fargate task to a task size that
+Fargate supports, and checks the size at synth time
+
+"""
+
+from aws_cdk import core as cdk
+
+# Memory sizes in MiB that Fargate supports for each number of CPU units
+FARGATE_SIZES = {
+    256: [512, 1024, 2048],
+    512: list(range(1024, 4096 + 1, 1024)),
+    1024: list(range(2048, 8192 + 1, 1024)),
+    2048: list(range(4096, 16384 + 1, 1024)),
+    4096: list(range(8192, 30720 + 1, 1024)),
+    8192: list(range(16384, 61440 + 1, 4096)),
+    16384: list(range(32768, 122880 + 1, 8192)),
+}
+
+# CPU units given by memory in GB before the vCPUs could be set, as (largest memory,
+# CPU units), with 256 CPU units under 1 GB
+MEMORY_ONLY_CPU_LADDER = [(2, 512), (8, 1024), (16, 2048), (30, 4096)]
+
+# Fargate Linux on-demand prices per hour, only their ratio matters to compare sizes
+PRICE_PER_VCPU_HOUR = 0.04048
+PRICE_PER_GB_HOUR = 0.004445
+
+
+def get_hourly_price(cpu: int, memory_mib: int) -> float:
+    return cpu / 1024 * PRICE_PER_VCPU_HOUR + memory_mib / 1024 * PRICE_PER_GB_HOUR
+
+
+def get_fargate_sizes() -> list:
+    """Return the (CPU units, memory in MiB) sizes that Fargate supports, from the
+    cheapest to the most expensive."""
+    return sorted(
+        (
+            (cpu, memory_mib)
+            for cpu, memory_sizes in FARGATE_SIZES.items()
+            for memory_mib in memory_sizes
+        ),
+        key=lambda size: get_hourly_price(*size),
+    )
+
+
+def get_memory_only_cpu(memory_in_gb: float) -> int:
+    """Return the CPU units of a task sized on its memory only, those of the former
+    memory ladder, or zero for the cheapest size above 30 GB."""
+    if memory_in_gb < 1:
+        return 256
+
+    for max_memory_in_gb, cpu in MEMORY_ONLY_CPU_LADDER:
+        if memory_in_gb <= max_memory_in_gb:
+            return cpu
+
+    return 0
+
+
+def recommend_fargate_size(vcpu: float, memory_in_gb: float) -> tuple:
+    """Return the cheapest Fargate size, as (CPU units, memory in MiB), with at least
+    vcpu vCPUs and memory_in_gb GB of memory. A vcpu of zero only sizes the task on
+    its memory, with the CPU units of the former memory ladder."""
+    if vcpu < 0 or memory_in_gb <= 0:
+        raise ValueError(
+            f"A Fargate task needs a positive memory and vCPUs, got {vcpu} vCPU and "
+            f"{memory_in_gb} GB"
+        )
+
+    cpu = int(vcpu * 1024) if vcpu > 0 else get_memory_only_cpu(memory_in_gb)
+    memory_mib = int(memory_in_gb * 1024)
+
+    for size in get_fargate_sizes():
+        if size[0] >= cpu and size[1] >= memory_mib:
+            return size
+
+    raise ValueError(
+        f"No Fargate task size has {vcpu} vCPU and {memory_in_gb} GB, the largest is "
+        f"{max(FARGATE_SIZES) // 1024} vCPU and "
+        f"{max(FARGATE_SIZES[max(FARGATE_SIZES)]) // 1024} GB"
+    )
+
+
+def get_fargate_size(scope: cdk.Construct, vcpu: float, memory_in_gb: float) -> tuple:
+    """Return the Fargate size of a task as (CPU units, memory in MiB). A combination
+    that Fargate does not support is rounded up to the cheapest size that holds it,
+    with a synth warning, and a combination larger than all the sizes fails the
+    synth."""
+    cpu, memory_mib = recommend_fargate_size(vcpu, memory_in_gb)
+    cpu_rounded_up = vcpu > 0 and cpu != int(vcpu * 1024)
+
+    if cpu_rounded_up or memory_mib != int(memory_in_gb * 1024):
+        cdk.Annotations.of(scope).add_warning(
+            f"Fargate does not support {vcpu} vCPU with {memory_in_gb} GB, using "
+            f"{cpu / 1024:g} vCPU with {memory_mib / 1024:g} GB"
+        )
+
+    return cpu, memory_mib
@@ -16,7 +16,10 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 """
-from ..custom.ssm_custom_resource import SSMParameterReader
+from ..custom.ssm_custom_resource import SSMParametersReader
+from .rstudio_stack_shards import check_stack_resources
+from .rstudio_scale_to_zero import RstudioScaleToZero
+from ..efs.efs_throughput import configure_file_system, get_file_system_options
 
 from aws_cdk import (
     core as cdk,
@@ -73,6 +76,7 @@ class RstudioEc2Stack(cdk.Stack):
         ssm_cross_account_role_name: str,
         ssm_cross_account_lambda_role_name: str,
         number_of_rstudio_containers: int,
+        first_container_number: int,
         rstudio_user_key_alias: str,
         rstudio_efs_key_alias: str,
         rstudio_cwlogs_key_alias: str,
@@ -82,14 +86,21 @@ class RstudioEc2Stack(cdk.Stack):
         shiny_share_container_path: str,
         hourly_sync_container_path: str,
         instant_sync_container_path: str,
+        rstudio_scale_to_zero_enabled: bool,
+        rstudio_idle_timeout_minutes: int,
+        efs_file_system_options: dict,
+        efs_alarm_topic_arn: str,
         **kwargs,
     ) -> None:
         super().__init__(scope, id, **kwargs)
 
-        ssm_repo_name_reader = SSMParameterReader(
+        ssm_repo_reader = SSMParametersReader(
             self,
-            id=f"SSM-Repo-Name-{instance}",
-            parameter_name=rstudio_container_repository_name_ssm_param,
+            id=f"SSM-Repo-{instance}",
+            parameter_names=[
+                rstudio_container_repository_name_ssm_param,
+                rstudio_container_repository_arn_ssm_param,
+            ],
             region=self.region,
             instance=instance,
             rstudio_account_id=self.account,
@@ -100,23 +111,13 @@ class RstudioEc2Stack(cdk.Stack):
             ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
         )
 
-        ssm_repo_arn_reader = SSMParameterReader(
-            self,
-            id=f"SSM-Repo-Arn-{instance}",
-            parameter_name=rstudio_container_repository_arn_ssm_param,
-            region=self.region,
-            instance=instance,
-            rstudio_account_id=self.account,
-            network_account_id=network_account_id,
-            rstudio_pipeline_account_id=rstudio_pipeline_account_id,
-            cross_account_id=rstudio_pipeline_account_id,
-            ssm_cross_account_role_name=ssm_cross_account_role_name,
-            ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
+        rstudio_repository_name = ssm_repo_reader.get_parameter_value(
+            rstudio_container_repository_name_ssm_param
         )
 
-        rstudio_repository_name = ssm_repo_name_reader.get_parameter_value()
-
-        rstudio_repository_arn = ssm_repo_arn_reader.get_parameter_value()
+        rstudio_repository_arn = ssm_repo_reader.get_parameter_value(
+            rstudio_container_repository_arn_ssm_param
+        )
 
         rstudio_image_repo = Repository.from_repository_attributes(
             self,
@@ -135,6 +136,7 @@ class RstudioEc2Stack(cdk.Stack):
             "RSTUDIO_VERSION": "1.4.1717",
             "AWS_S3_BUCKET": f"s3://{athena_output_bucket_name}/Athena-Query",
             "AWS_ATHENA_WG": f"{athena_workgroup_name}-{instance}",
+            "RSTUDIO_INSTANCE": instance,
         }
 
         rstudio_efs_kms_key_alias = kms.Alias.from_alias_name(
@@ -278,10 +280,23 @@ class RstudioEc2Stack(cdk.Stack):
             security_groups=[asg_security_group],
         )
 
+        # Idle containers are scaled to zero and started again on their next request
+        if rstudio_scale_to_zero_enabled:
+            rstudio_scale_to_zero = RstudioScaleToZero(
+                self,
+                id=f"Rstudio-Scale-To-Zero-{instance}",
+                instance=instance,
+                ecs_cluster_name=ecs_cluster_name,
+                idle_timeout_minutes=rstudio_idle_timeout_minutes,
+            )
+
         rstudio_load_balancer_arn_list = []
         secretpass_arn_list = []
 
-        for i in range(1, number_of_rstudio_containers + 1):
+        for i in range(
+            first_container_number,
+            first_container_number + number_of_rstudio_containers,
+        ):
 
             # RStudio Instance Home File System
             file_system_rstudio_home = efs.FileSystem(
@@ -291,12 +306,20 @@ class RstudioEc2Stack(cdk.Stack):
                 vpc=vpc,
                 encrypted=True,
                 kms_key=rstudio_efs_kms_key_alias,
-                performance_mode=efs.PerformanceMode.GENERAL_PURPOSE,
-                throughput_mode=efs.ThroughputMode.BURSTING,
+                **get_file_system_options(efs_file_system_options["rstudio_home"]),
                 enable_automatic_backups=True,
                 removal_policy=RemovalPolicy.DESTROY,
             )
 
+            configure_file_system(
+                self,
+                file_system_rstudio_home,
+                f"rstudio{i}-home",
+                instance,
+                efs_file_system_options["rstudio_home"],
+                efs_alarm_topic_arn,
+            )
+
             access_point_rstudio_home = efs.AccessPoint(
                 self,
                 id=f"Rstudio{i}-access-point-home-{instance}",
@@ -353,7 +376,7 @@ class RstudioEc2Stack(cdk.Stack):
             rstudio_container = rstudio_task.add_container(
                 f"Rstudio{i}-ec2-{instance}",
                 image=ecs.ContainerImage.from_ecr_repository(rstudio_image_repo),
-                environment=envvars_cont,
+                environment={**envvars_cont, "RSTUDIO_CONTAINER_NAME": f"container{i}"},
                 secrets=secret_vars,
                 memory_reservation_mib=rstudio_container_memory_reserved,
                 logging=ecs.LogDrivers.aws_logs(
@@ -514,6 +537,16 @@ class RstudioEc2Stack(cdk.Stack):
                 rstudio_service.service, Port.tcp(2049)
             )
 
+            if rstudio_scale_to_zero_enabled:
+                rstudio_scale_to_zero.add_service(
+                    service=rstudio_service.service,
+                    load_balancer=rstudio_service.load_balancer,
+                    listener=rstudio_service.listener,
+                    log_group=rstudio_logs_container,
+                    host_name=rstudio_individual_domain,
+                    container_name=f"container{i}",
+                )
+
             rstudio_load_balancer_arn_list.append(
                 rstudio_service.load_balancer.load_balancer_arn
             )
@@ -526,3 +559,5 @@ class RstudioEc2Stack(cdk.Stack):
 
         self.rstudio_load_balancer_arn = rstudio_load_balancer_arn_list
         self.secretpass_arn = secretpass_arn_list
+
+        check_stack_resources(self, number_of_rstudio_containers)
@@ -16,7 +16,12 @@ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 """
-from ..custom.ssm_custom_resource import SSMParameterReader
+from ..custom.ssm_custom_resource import SSMParametersReader
+from .rstudio_stack_shards import check_stack_resources
+from .rstudio_scale_to_zero import RstudioScaleToZero
+from ..efs.efs_throughput import configure_file_system, get_file_system_options
+from .fargate_capacity import get_stop_timeout, set_capacity_provider_strategy
+from .fargate_sizing import get_fargate_size
 
 from aws_cdk import (
     core as cdk,
@@ -42,6 +47,10 @@ from aws_cdk.aws_elasticloadbalancingv2 import ApplicationProtocol
 from aws_cdk.aws_ecr import Repository
 from aws_cdk.aws_iam import PolicyStatement, Effect
 
+# Base of the POSIX user and group ids of the home access points in the shared service
+# mode, container <number> gets this id plus its number
+SHARED_HOME_FIRST_POSIX_ID = 10000
+
 
 class RstudioFargateStack(cdk.Stack):
     def __init__(
@@ -72,6 +81,7 @@ class RstudioFargateStack(cdk.Stack):
         athena_output_bucket_name: str,
         athena_workgroup_name: str,
         number_of_rstudio_containers: int,
+        first_container_number: int,
         ssm_cross_account_role_name: str,
         ssm_cross_account_lambda_role_name: str,
         rstudio_user_key_alias: str,
@@ -82,14 +92,24 @@ class RstudioFargateStack(cdk.Stack):
         shiny_share_container_path: str,
         hourly_sync_container_path: str,
         instant_sync_container_path: str,
+        rstudio_shared_service_enabled: bool,
+        rstudio_scale_to_zero_enabled: bool,
+        rstudio_idle_timeout_minutes: int,
+        rstudio_capacity_provider_strategy: dict,
+        rstudio_container_cpu: float,
+        efs_file_system_options: dict,
+        efs_alarm_topic_arn: str,
         **kwargs,
     ) -> None:
         super().__init__(scope, id, **kwargs)
 
-        ssm_repo_name_reader = SSMParameterReader(
+        ssm_repo_reader = SSMParametersReader(
             self,
-            id=f"SSM-Repo-Name-{instance}",
-            parameter_name=rstudio_container_repository_name_ssm_param,
+            id=f"SSM-Repo-{instance}",
+            parameter_names=[
+                rstudio_container_repository_name_ssm_param,
+                rstudio_container_repository_arn_ssm_param,
+            ],
             region=self.region,
             instance=instance,
             rstudio_account_id=self.account,
@@ -100,23 +120,13 @@ class RstudioFargateStack(cdk.Stack):
             ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
         )
 
-        ssm_repo_arn_reader = SSMParameterReader(
-            self,
-            id=f"SSM-Repo-Arn-{instance}",
-            parameter_name=rstudio_container_repository_arn_ssm_param,
-            region=self.region,
-            instance=instance,
-            rstudio_account_id=self.account,
-            network_account_id=network_account_id,
-            rstudio_pipeline_account_id=rstudio_pipeline_account_id,
-            cross_account_id=rstudio_pipeline_account_id,
-            ssm_cross_account_role_name=ssm_cross_account_role_name,
-            ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
+        rstudio_repository_name = ssm_repo_reader.get_parameter_value(
+            rstudio_container_repository_name_ssm_param
         )
 
-        rstudio_repository_name = ssm_repo_name_reader.get_parameter_value()
-
-        rstudio_repository_arn = ssm_repo_arn_reader.get_parameter_value()
+        rstudio_repository_arn = ssm_repo_reader.get_parameter_value(
+            rstudio_container_repository_arn_ssm_param
+        )
 
         rstudio_image_repo = Repository.from_repository_attributes(
             self,
@@ -135,6 +145,7 @@ class RstudioFargateStack(cdk.Stack):
             "RSTUDIO_VERSION": "1.4.1717",
             "AWS_S3_BUCKET": f"s3://{athena_output_bucket_name}/Athena-Query",
             "AWS_ATHENA_WG": f"{athena_workgroup_name}-{instance}",
+            "RSTUDIO_INSTANCE": instance,
         }
 
         rstudio_efs_kms_key_alias = kms.Alias.from_alias_name(
@@ -143,18 +154,9 @@ class RstudioFargateStack(cdk.Stack):
             alias_name=rstudio_efs_key_alias,
         )
 
-        if rstudio_container_memory_in_gb < 1:
-            cont_cpu = 256
-        elif 1 <= rstudio_container_memory_in_gb <= 2:
-            cont_cpu = 512
-        elif 2 < rstudio_container_memory_in_gb <= 8:
-            cont_cpu = 1024
-        elif 8 < rstudio_container_memory_in_gb <= 16:
-            cont_cpu = 2048
-        elif 16 < rstudio_container_memory_in_gb <= 32:
-            cont_cpu = 4096
-
-        cont_mem = rstudio_container_memory_in_gb * 1024
+        cont_cpu, cont_mem = get_fargate_size(
+            self, rstudio_container_cpu, rstudio_container_memory_in_gb
+        )
 
         # Configure the Shiny/Rstudio shared file system volume
 
@@ -285,35 +287,187 @@ class RstudioFargateStack(cdk.Stack):
             security_groups=[],
         )
 
+        # Idle containers are scaled to zero and started again on their next request
+        if rstudio_scale_to_zero_enabled:
+            rstudio_scale_to_zero = RstudioScaleToZero(
+                self,
+                id=f"Rstudio-Scale-To-Zero-{instance}",
+                instance=instance,
+                ecs_cluster_name=ecs_cluster_name,
+                idle_timeout_minutes=rstudio_idle_timeout_minutes,
+            )
+
         rstudio_load_balancer_arn_list = []
         secretpass_arn_list = []
 
-        for i in range(1, number_of_rstudio_containers + 1):
-
-            # RStudio Instance Home File System
-            file_system_rstudio_home = efs.FileSystem(
+        # In the shared service mode, the containers share one load balancer, one home
+        # file system and one log group instead of getting their own
+        if rstudio_shared_service_enabled:
+            file_system_rstudio_shared_home = efs.FileSystem(
                 self,
-                id=f"Rstudio{i}-cont-user-home-{instance}",
-                file_system_name=f"Rstudio{i}-cont-fs-home-{instance}",
+                id=f"Rstudio-shared-user-home-{instance}",
+                file_system_name=f"Rstudio-shared-fs-home-{instance}",
                 vpc=vpc,
                 encrypted=True,
                 kms_key=rstudio_efs_kms_key_alias,
-                performance_mode=efs.PerformanceMode.GENERAL_PURPOSE,
-                throughput_mode=efs.ThroughputMode.BURSTING,
+                **get_file_system_options(efs_file_system_options["rstudio_home"]),
                 enable_automatic_backups=True,
                 removal_policy=RemovalPolicy.DESTROY,
+                # The task roles only allow their own access point, a mount without
+                # an access point would reach the homes of all the users
+                file_system_policy=iam.PolicyDocument(
+                    statements=[
+                        PolicyStatement(
+                            actions=[
+                                "elasticfilesystem:ClientMount",
+                                "elasticfilesystem:ClientWrite",
+                                "elasticfilesystem:ClientRootAccess",
+                            ],
+                            effect=Effect.DENY,
+                            principals=[iam.AnyPrincipal()],
+                            resources=["*"],
+                            conditions={
+                                "Null": {"elasticfilesystem:AccessPointArn": "true"}
+                            },
+                        )
+                    ]
+                ),
+            )
+
+            configure_file_system(
+                self,
+                file_system_rstudio_shared_home,
+                "rstudio-shared-home",
+                instance,
+                efs_file_system_options["rstudio_home"],
+                efs_alarm_topic_arn,
+            )
+
+            rstudio_shared_logs_container = logs.LogGroup(
+                self,
+                id=f"rstudio-shared-cw-logs-container-{instance}",
+                log_group_name=f"Rstudio-shared-cont-fg-{instance}/{id}",
+                removal_policy=RemovalPolicy.DESTROY,
+                retention=logs.RetentionDays.ONE_WEEK,
+                encryption_key=rstudio_cloudwatch_log_kms_key_alias,
             )
 
-            access_point_rstudio_home = efs.AccessPoint(
+            rstudio_shared_logs_container.node.add_dependency(
+                rstudio_cloudwatch_log_kms_key_alias
+            )
+
+            # A single security group, so that the file system and load balancer
+            # rules do not grow with the number of containers
+            rstudio_shared_security_group = ec2.SecurityGroup(
                 self,
-                id=f"Rstudio{i}-access-point-home-{instance}",
-                file_system=file_system_rstudio_home,
-                path=f"/rstudio{i}-path-home",
-                create_acl=efs.Acl(
-                    owner_uid="1000", owner_gid="1000", permissions="755"
+                id=f"Rstudio-shared-service-sg-{instance}",
+                vpc=vpc,
+                description="RStudio containers of the shared service mode",
+            )
+
+            for file_system in [
+                file_system_rstudio_shared_home,
+                file_system_rstudio_shiny_share,
+                file_system_rstudio_hourly,
+                file_system_rstudio_instant,
+            ]:
+                file_system.connections.allow_from(
+                    rstudio_shared_security_group, Port.tcp(2049)
+                )
+
+            rstudio_shared_load_balancer = alb.ApplicationLoadBalancer(
+                self,
+                id=f"Rstudio-shared-alb-{instance}",
+                vpc=vpc,
+                internet_facing=True,
+            )
+
+            # Containers are routed by host name, unknown host names get a 404
+            rstudio_shared_listener = rstudio_shared_load_balancer.add_listener(
+                f"Rstudio-shared-listener-{instance}",
+                port=443,
+                protocol=ApplicationProtocol.HTTPS,
+                certificates=[alb.ListenerCertificate.from_certificate_manager(cert)],
+                default_action=alb.ListenerAction.fixed_response(
+                    404, content_type="text/plain", message_body="Not Found"
                 ),
             )
 
+            # The certificate is a wildcard of the RStudio zone, so is the record. The
+            # stacks of the other container shards add records of their containers,
+            # which take precedence over the wildcard.
+            if first_container_number == 1:
+                r53.ARecord(
+                    self,
+                    id=f"Rstudio-shared-alias-record-{instance}",
+                    zone=rstudio_zone,
+                    record_name=f"*.{rstudio_zone.zone_name}",
+                    target=r53.RecordTarget.from_alias(
+                        route53_targets.LoadBalancerTarget(rstudio_shared_load_balancer)
+                    ),
+                )
+
+            rstudio_load_balancer_arn_list.append(
+                rstudio_shared_load_balancer.load_balancer_arn
+            )
+
+        for i in range(
+            first_container_number,
+            first_container_number + number_of_rstudio_containers,
+        ):
+
+            # RStudio Instance Home File System
+            if rstudio_shared_service_enabled:
+                file_system_rstudio_home = file_system_rstudio_shared_home
+            else:
+                file_system_rstudio_home = efs.FileSystem(
+                    self,
+                    id=f"Rstudio{i}-cont-user-home-{instance}",
+                    file_system_name=f"Rstudio{i}-cont-fs-home-{instance}",
+                    vpc=vpc,
+                    encrypted=True,
+                    kms_key=rstudio_efs_kms_key_alias,
+                    **get_file_system_options(efs_file_system_options["rstudio_home"]),
+                    enable_automatic_backups=True,
+                    removal_policy=RemovalPolicy.DESTROY,
+                )
+
+                configure_file_system(
+                    self,
+                    file_system_rstudio_home,
+                    f"rstudio{i}-home",
+                    instance,
+                    efs_file_system_options["rstudio_home"],
+                    efs_alarm_topic_arn,
+                )
+
+            if rstudio_shared_service_enabled:
+                # The users of the shared file system get their own POSIX ids, so that
+                # the NFS permissions separate their homes as well
+                home_posix_id = str(SHARED_HOME_FIRST_POSIX_ID + i)
+                access_point_rstudio_home = efs.AccessPoint(
+                    self,
+                    id=f"Rstudio{i}-access-point-home-{instance}",
+                    file_system=file_system_rstudio_home,
+                    path=f"/rstudio{i}-path-home",
+                    create_acl=efs.Acl(
+                        owner_uid=home_posix_id,
+                        owner_gid=home_posix_id,
+                        permissions="750",
+                    ),
+                    posix_user=efs.PosixUser(uid=home_posix_id, gid=home_posix_id),
+                )
+            else:
+                access_point_rstudio_home = efs.AccessPoint(
+                    self,
+                    id=f"Rstudio{i}-access-point-home-{instance}",
+                    file_system=file_system_rstudio_home,
+                    path=f"/rstudio{i}-path-home",
+                    create_acl=efs.Acl(
+                        owner_uid="1000", owner_gid="1000", permissions="755"
+                    ),
+                )
+
             volume_config_rstudio_home = ecs.Volume(
                 name=f"efs-volume-rstudio{i}-home-{instance}",
                 efs_volume_configuration=ecs.EfsVolumeConfiguration(
@@ -321,18 +475,22 @@ class RstudioFargateStack(cdk.Stack):
                     transit_encryption="ENABLED",
                     authorization_config=ecs.AuthorizationConfig(
                         access_point_id=access_point_rstudio_home.access_point_id,
+                        iam="ENABLED",
                     ),
                 ),
             )
 
-            rstudio_logs_container = logs.LogGroup(
-                self,
-                id=f"rstudio{i}-cw-logs-container-{instance}",
-                log_group_name=f"Rstudio{i}-cont-fg-{instance}/{id}",
-                removal_policy=RemovalPolicy.DESTROY,
-                retention=logs.RetentionDays.ONE_WEEK,
-                encryption_key=rstudio_cloudwatch_log_kms_key_alias,
-            )
+            if rstudio_shared_service_enabled:
+                rstudio_logs_container = rstudio_shared_logs_container
+            else:
+                rstudio_logs_container = logs.LogGroup(
+                    self,
+                    id=f"rstudio{i}-cw-logs-container-{instance}",
+                    log_group_name=f"Rstudio{i}-cont-fg-{instance}/{id}",
+                    removal_policy=RemovalPolicy.DESTROY,
+                    retention=logs.RetentionDays.ONE_WEEK,
+                    encryption_key=rstudio_cloudwatch_log_kms_key_alias,
+                )
 
             rstudio_task = ecs.FargateTaskDefinition(
                 self,
@@ -362,9 +520,10 @@ class RstudioFargateStack(cdk.Stack):
             rstudio_container = rstudio_task.add_container(
                 f"Rstudio{i}-fg-{instance}",
                 image=ecs.ContainerImage.from_ecr_repository(rstudio_image_repo),
-                environment=envvars_cont,
+                environment={**envvars_cont, "RSTUDIO_CONTAINER_NAME": f"container{i}"},
                 secrets=secret_vars,
                 memory_limit_mib=cont_mem,
+                stop_timeout=get_stop_timeout(rstudio_capacity_provider_strategy),
                 logging=ecs.LogDrivers.aws_logs(
                     stream_prefix=f"Rstudio{i}-fg-{instance}",
                     log_group=rstudio_logs_container,
@@ -417,50 +576,152 @@ class RstudioFargateStack(cdk.Stack):
                 )
             )
 
-            rstudio_logs_container.node.add_dependency(
-                rstudio_cloudwatch_log_kms_key_alias
+            # Mounts the home file system with the task role, through its own access
+            # point only
+            rstudio_task.add_to_task_role_policy(
+                PolicyStatement(
+                    actions=[
+                        "elasticfilesystem:ClientMount",
+                        "elasticfilesystem:ClientWrite",
+                    ],
+                    effect=Effect.ALLOW,
+                    resources=[file_system_rstudio_home.file_system_arn],
+                    conditions={
+                        "StringEquals": {
+                            "elasticfilesystem:AccessPointArn": (
+                                access_point_rstudio_home.access_point_arn
+                            )
+                        }
+                    },
+                )
             )
 
+            if not rstudio_shared_service_enabled:
+                rstudio_logs_container.node.add_dependency(
+                    rstudio_cloudwatch_log_kms_key_alias
+                )
+
             rstudio_container.node.add_dependency(rstudio_logs_container)
 
             rstudio_container.node.add_dependency(rstudio_task)
 
             rstudio_individual_domain = f"container{i}.{rstudio_zone.zone_name}"
 
-            individual_zone = r53.PublicHostedZone(
-                self,
-                id=f"route53-individual-Rstudio{i}-zone-{instance}",
-                zone_name=rstudio_individual_domain,
-            )
+            if rstudio_shared_service_enabled:
+                rstudio_service = ecs.FargateService(
+                    self,
+                    id=f"Rstudio{i}-fg-service-{instance}",
+                    cluster=cluster_fg,
+                    task_definition=rstudio_task,
+                    desired_count=1,
+                    security_groups=[rstudio_shared_security_group],
+                    platform_version=ecs.FargatePlatformVersion.VERSION1_4,
+                    health_check_grace_period=cdk.Duration.seconds(900),
+                )
 
-            rstudio_recordset = r53.RecordSet(
-                self,
-                id=f"ns-rstudio{i}-individual-record-set-{instance}",
-                zone=rstudio_zone,
-                record_type=RecordType.NS,
-                target=RecordTarget.from_values(
-                    *individual_zone.hosted_zone_name_servers
-                ),
-                record_name=rstudio_individual_domain,
-            )
+                rstudio_shared_listener.add_targets(
+                    f"Rstudio{i}-fg-target-{instance}",
+                    priority=i,
+                    conditions=[
+                        alb.ListenerCondition.host_headers([rstudio_individual_domain])
+                    ],
+                    port=8787,
+                    protocol=ApplicationProtocol.HTTP,
+                    targets=[
+                        rstudio_service.load_balancer_target(
+                            container_name=rstudio_container.container_name,
+                            container_port=8787,
+                        )
+                    ],
+                    health_check=alb.HealthCheck(healthy_http_codes="200,301,302"),
+                )
 
-            rstudio_recordset.node.add_dependency(individual_zone)
+                if first_container_number != 1:
+                    r53.ARecord(
+                        self,
+                        id=f"Rstudio{i}-alias-record-{instance}",
+                        zone=rstudio_zone,
+                        record_name=rstudio_individual_domain,
+                        target=r53.RecordTarget.from_alias(
+                            route53_targets.LoadBalancerTarget(
+                                rstudio_shared_load_balancer
+                            )
+                        ),
+                    )
+
+                fargate_service = rstudio_service
+                rstudio_load_balancer = rstudio_shared_load_balancer
+                rstudio_listener = rstudio_shared_listener
+            else:
+                individual_zone = r53.PublicHostedZone(
+                    self,
+                    id=f"route53-individual-Rstudio{i}-zone-{instance}",
+                    zone_name=rstudio_individual_domain,
+                )
 
-            rstudio_service = ecs_patterns.ApplicationLoadBalancedFargateService(
-                self,
-                id=f"Rstudio{i}-fg-service-{instance}",
-                cluster=cluster_fg,
-                memory_limit_mib=cont_mem,
-                cpu=cont_cpu,
-                task_definition=rstudio_task,
-                desired_count=1,
-                certificate=cert,
-                domain_name=individual_zone.zone_name,
-                domain_zone=individual_zone,
-                protocol=ApplicationProtocol.HTTPS,
-                platform_version=ecs.FargatePlatformVersion.VERSION1_4,
-                health_check_grace_period=cdk.Duration.seconds(900),
-            )
+                rstudio_recordset = r53.RecordSet(
+                    self,
+                    id=f"ns-rstudio{i}-individual-record-set-{instance}",
+                    zone=rstudio_zone,
+                    record_type=RecordType.NS,
+                    target=RecordTarget.from_values(
+                        *individual_zone.hosted_zone_name_servers
+                    ),
+                    record_name=rstudio_individual_domain,
+                )
+
+                rstudio_recordset.node.add_dependency(individual_zone)
+
+                rstudio_service = ecs_patterns.ApplicationLoadBalancedFargateService(
+                    self,
+                    id=f"Rstudio{i}-fg-service-{instance}",
+                    cluster=cluster_fg,
+                    memory_limit_mib=cont_mem,
+                    cpu=cont_cpu,
+                    task_definition=rstudio_task,
+                    desired_count=1,
+                    certificate=cert,
+                    domain_name=individual_zone.zone_name,
+                    domain_zone=individual_zone,
+                    protocol=ApplicationProtocol.HTTPS,
+                    platform_version=ecs.FargatePlatformVersion.VERSION1_4,
+                    health_check_grace_period=cdk.Duration.seconds(900),
+                )
+
+                rstudio_service.target_group.configure_health_check(
+                    healthy_http_codes="200,301,302"
+                )
+
+                fargate_service = rstudio_service.service
+                rstudio_load_balancer = rstudio_service.load_balancer
+                rstudio_listener = rstudio_service.listener
+
+                file_system_rstudio_hourly.connections.allow_from(
+                    fargate_service, Port.tcp(2049)
+                )
+                file_system_rstudio_home.connections.allow_from(
+                    fargate_service, Port.tcp(2049)
+                )
+                file_system_rstudio_instant.connections.allow_from(
+                    fargate_service, Port.tcp(2049)
+                )
+                file_system_rstudio_shiny_share.connections.allow_from(
+                    fargate_service, Port.tcp(2049)
+                )
+
+                rstudio_load_balancer_arn_list.append(
+                    rstudio_service.load_balancer.load_balancer_arn
+                )
+
+            if rstudio_scale_to_zero_enabled:
+                rstudio_scale_to_zero.add_service(
+                    service=fargate_service,
+                    load_balancer=rstudio_load_balancer,
+                    listener=rstudio_listener,
+                    log_group=rstudio_logs_container,
+                    host_name=rstudio_individual_domain,
+                    container_name=f"container{i}",
+                )
 
             rstudio_kms_policy = iam.PolicyStatement(
                 actions=[
@@ -485,50 +746,26 @@ class RstudioFargateStack(cdk.Stack):
                 ],
             )
 
-            rstudio_service.task_definition.add_to_task_role_policy(rstudio_kms_policy)
-            rstudio_service.task_definition.add_to_task_role_policy(
-                rstudio_secret_policy
-            )
-            rstudio_service.task_definition.add_to_execution_role_policy(
-                rstudio_kms_policy
-            )
-            rstudio_service.task_definition.add_to_execution_role_policy(
-                rstudio_secret_policy
-            )
+            rstudio_task.add_to_task_role_policy(rstudio_kms_policy)
+            rstudio_task.add_to_task_role_policy(rstudio_secret_policy)
+            rstudio_task.add_to_execution_role_policy(rstudio_kms_policy)
+            rstudio_task.add_to_execution_role_policy(rstudio_secret_policy)
 
             encryption_key.grant_decrypt(
-                rstudio_service.task_definition.obtain_execution_role()
+                rstudio_task.obtain_execution_role()
             )  # Grant decrypt to task definition
 
-            rstudio_secret.grant_read(
-                rstudio_service.task_definition.obtain_execution_role()
-            )
+            rstudio_secret.grant_read(rstudio_task.obtain_execution_role())
 
             rstudio_service.node.add_dependency(rstudio_container)
 
-            rstudio_service.target_group.configure_health_check(
-                healthy_http_codes="200,301,302"
-            )
-
-            cfn_service = rstudio_service.service.node.default_child
+            cfn_service = fargate_service.node.default_child
             cfn_service.add_override("Properties.EnableExecuteCommand", True)
 
-            file_system_rstudio_hourly.connections.allow_from(
-                rstudio_service.service, Port.tcp(2049)
-            )
-            file_system_rstudio_home.connections.allow_from(
-                rstudio_service.service, Port.tcp(2049)
-            )
-            file_system_rstudio_instant.connections.allow_from(
-                rstudio_service.service, Port.tcp(2049)
-            )
-            file_system_rstudio_shiny_share.connections.allow_from(
-                rstudio_service.service, Port.tcp(2049)
+            set_capacity_provider_strategy(
+                fargate_service, rstudio_capacity_provider_strategy
             )
 
-            rstudio_load_balancer_arn_list.append(
-                rstudio_service.load_balancer.load_balancer_arn
-            )
             secretpass_arn_list.append(rstudio_secret.secret_arn)
 
         # Pass variables to other stacks
@@ -538,3 +775,5 @@ class RstudioFargateStack(cdk.Stack):
 
         self.rstudio_load_balancer_arn = rstudio_load_balancer_arn_list
         self.secretpass_arn = secretpass_arn_list
+
+        check_stack_resources(self, number_of_rstudio_containers)
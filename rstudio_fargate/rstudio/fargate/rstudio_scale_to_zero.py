@@ -0,0 +1,242 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script creates the scale to zero mode of the RStudio containers: an idle detector
+lambda which scales the idle services to zero, and a wake lambda behind the load
+balancers which starts them again on the next request
+
+"""
+
+from aws_cdk import (
+    core as cdk,
+    aws_ecs as ecs,
+    aws_elasticloadbalancingv2 as alb,
+    aws_elasticloadbalancingv2_targets as alb_targets,
+    aws_events as events,
+    aws_events_targets as events_targets,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+    aws_logs as logs,
+)
+
+from ..custom.lambda_layer import (
+    get_lambda_layer,
+    get_logging_environment,
+)
+
+# Must match the tag keys of the scale_to_zero_services handler module
+SCALE_TO_ZERO_GROUP_TAG = "RstudioScaleToZeroGroup"
+HOST_NAME_TAG = "RstudioHostName"
+CONTAINER_TAG = "RstudioContainer"
+LISTENER_TAG = "RstudioListenerArn"
+WAKE_TARGET_GROUP_TAG = "RstudioWakeTargetGroupArn"
+
+# Must match the namespace and metric name of the idle detector handler
+HEARTBEAT_NAMESPACE = "Rstudio/Sessions"
+HEARTBEAT_METRIC_NAME = "SessionHeartbeat"
+
+IDLE_CHECK_INTERVAL_MINUTES = 5
+
+
+# Stack statuses after which a deployment may have put back the listener rules and
+# actions managed by CloudFormation
+DEPLOYED_STACK_STATUSES = [
+    "CREATE_COMPLETE",
+    "UPDATE_COMPLETE",
+    "UPDATE_ROLLBACK_COMPLETE",
+]
+
+
+class RstudioScaleToZero(cdk.Construct):
+    """Scale to zero mode of the RStudio services of a stack. The services are added
+    with add_service, which tags them for the lambdas, leaves their desired count to
+    the lambdas, gives their load balancer a target group of the wake lambda and
+    extracts the session heartbeats of their log group into the SessionHeartbeat
+    metric. The idle detector also runs when a deployment of the stack completes, to
+    restore the listener rules that the deployment put back.
+    Arguments:
+        :param idle_timeout_minutes -- The minutes without load balancer request and
+            session heartbeat after which a service is scaled to zero
+    """
+
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        id: str,
+        instance: str,
+        ecs_cluster_name: str,
+        idle_timeout_minutes: int,
+        **kwargs,
+    ) -> None:
+        super().__init__(scope, id)
+
+        # The lambdas of a stack only manage the services of the stack
+        self.scale_to_zero_group = cdk.Stack.of(self).stack_name
+
+        policy = [
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "ecs:ListServices",
+                    "ecs:DescribeServices",
+                    "ecs:ListTasks",
+                    "ecs:DescribeTasks",
+                    "ecs:UpdateService",
+                ],
+                resources=["*"],
+            ),
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "elasticloadbalancing:DescribeRules",
+                    "elasticloadbalancing:DescribeTargetHealth",
+                    "elasticloadbalancing:ModifyListener",
+                    "elasticloadbalancing:ModifyRule",
+                ],
+                resources=["*"],
+            ),
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["cloudwatch:GetMetricData"],
+                resources=["*"],
+            ),
+        ]
+
+        environment = {
+            "CLUSTER_NAME": ecs_cluster_name,
+            "SCALE_TO_ZERO_GROUP": self.scale_to_zero_group,
+            "RSTUDIO_INSTANCE": instance,
+            "IDLE_TIMEOUT_MINUTES": str(idle_timeout_minutes),
+        }
+        environment.update(get_logging_environment(self))
+
+        code = lambda_.Code.from_asset("rstudio_fargate/rstudio/fargate/scale_to_zero/")
+
+        idle_detector = lambda_.Function(
+            self,
+            id=f"Idle-Detector-{instance}",
+            code=code,
+            handler="idle_detector_handler.main",
+            timeout=cdk.Duration.minutes(5),
+            runtime=lambda_.Runtime.PYTHON_3_8,
+            initial_policy=policy,
+            layers=[get_lambda_layer(self)],
+            environment=environment,
+        )
+
+        events.Rule(
+            self,
+            id=f"Idle-Detector-Schedule-{instance}",
+            schedule=events.Schedule.rate(
+                cdk.Duration.minutes(IDLE_CHECK_INTERVAL_MINUTES)
+            ),
+            targets=[events_targets.LambdaFunction(idle_detector)],
+        )
+
+        events.Rule(
+            self,
+            id=f"Idle-Detector-Deployment-{instance}",
+            event_pattern=events.EventPattern(
+                source=["aws.cloudformation"],
+                detail_type=["CloudFormation Stack Status Change"],
+                resources=[cdk.Stack.of(self).stack_id],
+                detail={"status-details": {"status": DEPLOYED_STACK_STATUSES}},
+            ),
+            targets=[events_targets.LambdaFunction(idle_detector)],
+        )
+
+        self.wake_function = lambda_.Function(
+            self,
+            id=f"Wake-{instance}",
+            code=code,
+            handler="wake_handler.main",
+            timeout=cdk.Duration.seconds(30),
+            runtime=lambda_.Runtime.PYTHON_3_8,
+            initial_policy=policy,
+            layers=[get_lambda_layer(self)],
+            environment=environment,
+        )
+
+        self.instance = instance
+        self.wake_target_groups = {}
+        self.heartbeat_log_groups = set()
+
+    def get_wake_target_group(
+        self, load_balancer: alb.IApplicationLoadBalancer
+    ) -> alb.ApplicationTargetGroup:
+        # A target group can only be used by one load balancer
+        key = load_balancer.node.path
+
+        if key not in self.wake_target_groups:
+            self.wake_target_groups[key] = alb.ApplicationTargetGroup(
+                self,
+                id=f"Wake-Target-Group-{load_balancer.node.id}",
+                targets=[alb_targets.LambdaTarget(self.wake_function)],
+            )
+
+        return self.wake_target_groups[key]
+
+    def add_heartbeat_metric_filter(self, log_group: logs.ILogGroup) -> None:
+        key = log_group.node.path
+
+        if key in self.heartbeat_log_groups:
+            return
+
+        # Lines written by session_heartbeat.sh of the RStudio image
+        logs.MetricFilter(
+            self,
+            id=f"Heartbeat-{log_group.node.id}",
+            log_group=log_group,
+            filter_pattern=logs.FilterPattern.number_value(
+                "$.rstudio_heartbeat", "=", 1
+            ),
+            metric_namespace=HEARTBEAT_NAMESPACE,
+            metric_name=HEARTBEAT_METRIC_NAME,
+            metric_value="1",
+            dimensions={"Instance": "$.instance", "Container": "$.container"},
+        )
+        self.heartbeat_log_groups.add(key)
+
+    def add_service(
+        self,
+        service: ecs.BaseService,
+        load_balancer: alb.IApplicationLoadBalancer,
+        listener: alb.IApplicationListener,
+        log_group: logs.ILogGroup,
+        host_name: str,
+        container_name: str,
+    ) -> None:
+        wake_target_group = self.get_wake_target_group(load_balancer)
+        self.add_heartbeat_metric_filter(log_group)
+
+        tags = {
+            SCALE_TO_ZERO_GROUP_TAG: self.scale_to_zero_group,
+            HOST_NAME_TAG: host_name,
+            CONTAINER_TAG: container_name,
+            LISTENER_TAG: listener.listener_arn,
+            WAKE_TARGET_GROUP_TAG: wake_target_group.target_group_arn,
+        }
+
+        for key, value in tags.items():
+            cdk.Tags.of(service).add(
+                key, value, include_resource_types=["AWS::ECS::Service"]
+            )
+
+        # Without a desired count CloudFormation creates the service with one task and
+        # keeps the count set by the lambdas on updates
+        cfn_service = service.node.default_child
+        cfn_service.add_property_deletion_override("DesiredCount")
@@ -0,0 +1,91 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script splits the RStudio containers across several sibling stacks, and checks
+at synth time that the stacks of the containers stay under the CloudFormation limit
+of resources per stack.
+
+"""
+
+from aws_cdk import core as cdk
+
+# CloudFormation quota of resources per stack
+MAX_STACK_RESOURCES = 500
+# Share of the quota above which synth warns that the stack is getting full
+STACK_RESOURCES_WARNING_RATIO = 0.8
+
+
+def get_container_shards(
+    number_of_rstudio_containers: int, rstudio_containers_per_stack: int
+) -> list:
+    """Return the (first container number, number of containers) of each stack. A
+    number of containers per stack of zero keeps all the containers in one stack."""
+    if rstudio_containers_per_stack < 1:
+        return [(1, number_of_rstudio_containers)]
+
+    return [
+        (
+            first_container_number,
+            min(
+                rstudio_containers_per_stack,
+                number_of_rstudio_containers - first_container_number + 1,
+            ),
+        )
+        for first_container_number in range(
+            1, number_of_rstudio_containers + 1, rstudio_containers_per_stack
+        )
+    ]
+
+
+def get_shard_stack_id(stack_id: str, shard_index: int) -> str:
+    # The first shard keeps the id of the unsharded stack, so enabling sharding does
+    # not replace the containers already deployed
+    return stack_id if shard_index == 0 else f"{stack_id}-shard{shard_index}"
+
+
+def count_stack_resources(stack: cdk.Stack) -> int:
+    return sum(
+        1
+        for construct in stack.node.find_all()
+        if isinstance(construct, cdk.CfnResource) and cdk.Stack.of(construct) is stack
+    )
+
+
+def check_stack_resources(stack: cdk.Stack, number_of_rstudio_containers: int) -> None:
+    """Fail the synth when the stack has more resources than CloudFormation allows,
+    and warn when it gets close, with the number of containers per stack that would
+    fit in the limit."""
+    resource_count = count_stack_resources(stack)
+
+    if resource_count <= MAX_STACK_RESOURCES * STACK_RESOURCES_WARNING_RATIO:
+        return
+
+    # Rounded down and counting the shared resources per container, so it fits
+    containers_per_stack = max(
+        MAX_STACK_RESOURCES * number_of_rstudio_containers // resource_count, 1
+    )
+    message = (
+        f"Stack {stack.node.id} has {resource_count} resources for "
+        f"{number_of_rstudio_containers} containers, the CloudFormation limit is "
+        f"{MAX_STACK_RESOURCES}. Set rstudio_containers_per_stack in parameters.json "
+        f"to {containers_per_stack} or less."
+    )
+
+    if resource_count > MAX_STACK_RESOURCES:
+        raise ValueError(message)
+
+    cdk.Annotations.of(stack).add_warning(message)
@@ -0,0 +1,221 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script creates the lambda function handler of the idle detector of the RStudio
+scale to zero mode. It runs on a schedule and scales to zero the services that had
+no load balancer request and no session heartbeat for the idle timeout. The listener
+rule of the service is pointed to the wake lambda before the service is scaled in, so
+that the next request starts it again. When a deployment of the stack completes, it
+only restores the listener rules that the deployment put back.
+
+"""
+
+import boto3
+import os
+from datetime import datetime, timedelta, timezone
+from structured_logging import get_logger
+from scale_to_zero_services import (
+    CONTAINER_TAG,
+    WAKE_TARGET_GROUP_TAG,
+    cluster_name,
+    forward_to,
+    get_listener_rule,
+    get_scale_to_zero_services,
+    get_service_target_group_arn,
+    has_healthy_target,
+    is_forwarding_to,
+)
+
+logger = get_logger("idle_detector")
+
+ecs_client = boto3.client("ecs")
+elbv2_client = boto3.client("elbv2")
+cloudwatch_client = boto3.client("cloudwatch")
+
+idle_timeout_minutes = int(os.environ.get("IDLE_TIMEOUT_MINUTES", "60"))
+rstudio_instance = os.environ.get("RSTUDIO_INSTANCE", "")
+
+# Must match the namespace and dimensions of the session heartbeat metric filter
+HEARTBEAT_NAMESPACE = "Rstudio/Sessions"
+HEARTBEAT_METRIC_NAME = "SessionHeartbeat"
+# Two queries per service, a GetMetricData call takes at most 500 queries
+MAX_SERVICES_PER_METRICS_CALL = 250
+
+
+def get_target_group_dimension(target_group_arn):
+    # The dimension is the end of the arn, targetgroup/<name>/<id>
+    return target_group_arn.split(":")[-1]
+
+
+def get_last_task_start(service):
+    task_arns = ecs_client.list_tasks(
+        cluster=cluster_name,
+        serviceName=service["serviceName"],
+        desiredStatus="RUNNING",
+    )["taskArns"]
+
+    if not task_arns:
+        return None
+
+    tasks = ecs_client.describe_tasks(cluster=cluster_name, tasks=task_arns)["tasks"]
+    started_at = [task["startedAt"] for task in tasks if "startedAt" in task]
+
+    return max(started_at) if started_at else None
+
+
+def get_activity(services, start_time, end_time):
+    """Return the number of load balancer requests and session heartbeats of each
+    service over the period, keyed by service name."""
+    queries = []
+    period = int((end_time - start_time).total_seconds())
+
+    for i, service in enumerate(services):
+        queries.append(
+            {
+                "Id": f"requests{i}",
+                "MetricStat": {
+                    "Metric": {
+                        "Namespace": "AWS/ApplicationELB",
+                        "MetricName": "RequestCountPerTarget",
+                        "Dimensions": [
+                            {
+                                "Name": "TargetGroup",
+                                "Value": get_target_group_dimension(
+                                    get_service_target_group_arn(service)
+                                ),
+                            }
+                        ],
+                    },
+                    "Period": period,
+                    "Stat": "Sum",
+                },
+            }
+        )
+        queries.append(
+            {
+                "Id": f"heartbeats{i}",
+                "MetricStat": {
+                    "Metric": {
+                        "Namespace": HEARTBEAT_NAMESPACE,
+                        "MetricName": HEARTBEAT_METRIC_NAME,
+                        "Dimensions": [
+                            {"Name": "Instance", "Value": rstudio_instance},
+                            {
+                                "Name": "Container",
+                                "Value": service["tagsByKey"][CONTAINER_TAG],
+                            },
+                        ],
+                    },
+                    "Period": period,
+                    "Stat": "Sum",
+                },
+            }
+        )
+
+    sums = {}
+    paginator = cloudwatch_client.get_paginator("get_metric_data")
+
+    for page in paginator.paginate(
+        MetricDataQueries=queries, StartTime=start_time, EndTime=end_time
+    ):
+        for result in page["MetricDataResults"]:
+            sums[result["Id"]] = sums.get(result["Id"], 0) + sum(result["Values"])
+
+    return {
+        service["serviceName"]: sums.get(f"requests{i}", 0)
+        + sums.get(f"heartbeats{i}", 0)
+        for i, service in enumerate(services)
+    }
+
+
+def restore_rule(service, target_group_arn):
+    """Point the listener rule of a service to a target group, if a deployment or a
+    wake pointed it elsewhere. Returns whether the rule was changed."""
+    rule = get_listener_rule(elbv2_client, service)
+
+    if is_forwarding_to(rule, target_group_arn):
+        return False
+
+    forward_to(elbv2_client, service, rule, target_group_arn)
+    return True
+
+
+def scale_to_zero(service):
+    rule = get_listener_rule(elbv2_client, service)
+    forward_to(elbv2_client, service, rule, service["tagsByKey"][WAKE_TARGET_GROUP_TAG])
+    ecs_client.update_service(
+        cluster=cluster_name, service=service["serviceName"], desiredCount=0
+    )
+    logger.info("Scaled service to zero", service=service["serviceName"])
+
+
+def main(event, context):
+    logger.start_invocation(context, event)
+
+    # Sent by the deployment rule rather than the schedule
+    rules_only = event.get("source") == "aws.cloudformation"
+
+    end_time = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    start_time = end_time - timedelta(minutes=idle_timeout_minutes)
+    candidates = []
+
+    for service in get_scale_to_zero_services(ecs_client):
+        if service["desiredCount"] == 0:
+            # A deployment may have pointed the rule back to the stopped service
+            if restore_rule(service, service["tagsByKey"][WAKE_TARGET_GROUP_TAG]):
+                logger.info("Restored wake rule", service=service["serviceName"])
+
+            continue
+
+        if rules_only:
+            # A deployment may have kept the rule of a running service on the wake
+            # lambda, which only routes it back on the next request
+            target_group_arn = get_service_target_group_arn(service)
+
+            if has_healthy_target(elbv2_client, target_group_arn) and restore_rule(
+                service, target_group_arn
+            ):
+                logger.info("Restored service rule", service=service["serviceName"])
+
+            continue
+
+        # Tasks started during the period, by a wake or a deployment, are not idle
+        last_task_start = get_last_task_start(service)
+
+        if last_task_start is None or last_task_start > start_time:
+            continue
+
+        candidates.append(service)
+
+    for i in range(0, len(candidates), MAX_SERVICES_PER_METRICS_CALL):
+        services = candidates[i : i + MAX_SERVICES_PER_METRICS_CALL]
+        activity = get_activity(services, start_time, end_time)
+
+        for service in services:
+            if activity[service["serviceName"]] > 0:
+                continue
+
+            try:
+                scale_to_zero(service)
+            except Exception as e:
+                logger.exception(
+                    "Failed to scale service to zero",
+                    e,
+                    service=service["serviceName"],
+                )
+
+    logger.info("Checked services", candidates=len(candidates))
@@ -0,0 +1,126 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script holds the helpers shared by the idle detector and the wake handlers of
+the RStudio scale to zero mode. The RStudio services are found from their ECS tags,
+and the listener rule of a service forwards either to the target group of the service
+while it runs, or to the target group of the wake lambda while it is scaled to zero.
+
+"""
+
+import os
+
+# Must match the tag keys of RstudioScaleToZero
+SCALE_TO_ZERO_GROUP_TAG = "RstudioScaleToZeroGroup"
+HOST_NAME_TAG = "RstudioHostName"
+CONTAINER_TAG = "RstudioContainer"
+LISTENER_TAG = "RstudioListenerArn"
+WAKE_TARGET_GROUP_TAG = "RstudioWakeTargetGroupArn"
+
+# Maximum number of services of a DescribeServices call
+MAX_SERVICES_PER_CALL = 10
+
+cluster_name = os.environ.get("CLUSTER_NAME", "")
+scale_to_zero_group = os.environ.get("SCALE_TO_ZERO_GROUP", "")
+
+
+def get_scale_to_zero_services(ecs_client):
+    """Return the services of the cluster tagged with the scale to zero group of the
+    stack, with their tags as a dictionary."""
+    service_arns = []
+    paginator = ecs_client.get_paginator("list_services")
+
+    for page in paginator.paginate(cluster=cluster_name):
+        service_arns.extend(page["serviceArns"])
+
+    services = []
+
+    for i in range(0, len(service_arns), MAX_SERVICES_PER_CALL):
+        response = ecs_client.describe_services(
+            cluster=cluster_name,
+            services=service_arns[i : i + MAX_SERVICES_PER_CALL],
+            include=["TAGS"],
+        )
+
+        for service in response["services"]:
+            service["tagsByKey"] = {
+                tag["key"]: tag["value"] for tag in service.get("tags", [])
+            }
+
+            if service["tagsByKey"].get(SCALE_TO_ZERO_GROUP_TAG) == scale_to_zero_group:
+                services.append(service)
+
+    return services
+
+
+def get_service_target_group_arn(service):
+    return service["loadBalancers"][0]["targetGroupArn"]
+
+
+def get_listener_rule(elbv2_client, service):
+    """Return the listener rule routing to the service: the rule of its host name in
+    the shared service mode, else the default rule of its own load balancer."""
+    host_name = service["tagsByKey"][HOST_NAME_TAG]
+    default_rule = None
+    paginator = elbv2_client.get_paginator("describe_rules")
+
+    for page in paginator.paginate(ListenerArn=service["tagsByKey"][LISTENER_TAG]):
+        for rule in page["Rules"]:
+            if rule["IsDefault"]:
+                default_rule = rule
+
+            for condition in rule["Conditions"]:
+                values = condition.get("HostHeaderConfig", {}).get(
+                    "Values", condition.get("Values", [])
+                )
+
+                if condition["Field"] == "host-header" and host_name in values:
+                    return rule
+
+    return default_rule
+
+
+def is_forwarding_to(rule, target_group_arn):
+    for action in rule["Actions"]:
+        if action.get("TargetGroupArn") == target_group_arn:
+            return True
+
+        for target_group in action.get("ForwardConfig", {}).get("TargetGroups", []):
+            if target_group["TargetGroupArn"] == target_group_arn:
+                return True
+
+    return False
+
+
+def forward_to(elbv2_client, service, rule, target_group_arn):
+    actions = [{"Type": "forward", "TargetGroupArn": target_group_arn}]
+
+    if rule["IsDefault"]:
+        elbv2_client.modify_listener(
+            ListenerArn=service["tagsByKey"][LISTENER_TAG], DefaultActions=actions
+        )
+    else:
+        elbv2_client.modify_rule(RuleArn=rule["RuleArn"], Actions=actions)
+
+
+def has_healthy_target(elbv2_client, target_group_arn):
+    response = elbv2_client.describe_target_health(TargetGroupArn=target_group_arn)
+
+    return any(
+        target["TargetHealth"]["State"] == "healthy"
+        for target in response["TargetHealthDescriptions"]
+    )
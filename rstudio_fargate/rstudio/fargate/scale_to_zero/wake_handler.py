@@ -0,0 +1,133 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script creates the lambda function handler of the wake path of the RStudio scale
+to zero mode. The load balancer sends the requests of a service scaled to zero to
+this function, which sets the desired count of the service back to one and answers
+with a page that reloads itself. Once a task of the service is healthy, the listener
+rule is pointed back to the service and the request is redirected to it.
+
+"""
+
+import boto3
+from structured_logging import get_logger
+from scale_to_zero_services import (
+    HOST_NAME_TAG,
+    cluster_name,
+    forward_to,
+    get_listener_rule,
+    get_scale_to_zero_services,
+    get_service_target_group_arn,
+    has_healthy_target,
+)
+
+logger = get_logger("wake")
+
+ecs_client = boto3.client("ecs")
+elbv2_client = boto3.client("elbv2")
+
+# Service names per host name, kept across invocations
+service_names = {}
+
+# Seconds between two reloads of the starting page
+RELOAD_SECONDS = 10
+
+STARTING_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta http-equiv="refresh" content="{reload_seconds}">
+<title>Starting RStudio</title>
+</head>
+<body>
+<p>Your RStudio session is starting, this page reloads until it is ready.</p>
+</body>
+</html>
+"""
+
+
+def get_service_name(host_name):
+    if host_name not in service_names:
+        service_names.clear()
+
+        for service in get_scale_to_zero_services(ecs_client):
+            service_names[service["tagsByKey"][HOST_NAME_TAG]] = service["serviceName"]
+
+    return service_names.get(host_name)
+
+
+def get_service(service_name):
+    service = ecs_client.describe_services(
+        cluster=cluster_name, services=[service_name], include=["TAGS"]
+    )["services"][0]
+    service["tagsByKey"] = {tag["key"]: tag["value"] for tag in service["tags"]}
+    return service
+
+
+def get_request_url(event, host_name):
+    query = "&".join(
+        f"{key}={value}"
+        for key, value in (event.get("queryStringParameters") or {}).items()
+    )
+    return f"https://{host_name}{event.get('path', '/')}" + (
+        f"?{query}" if query else ""
+    )
+
+
+def get_response(status_code, status_description, body="", headers=None):
+    return {
+        "statusCode": status_code,
+        "statusDescription": status_description,
+        "isBase64Encoded": False,
+        "headers": {
+            "Content-Type": "text/html",
+            "Cache-Control": "no-store",
+            **(headers or {}),
+        },
+        "body": body,
+    }
+
+
+def main(event, context):
+    logger.start_invocation(context, event)
+
+    host_name = event.get("headers", {}).get("host", "").split(":")[0].lower()
+    service_name = get_service_name(host_name)
+
+    if service_name is None:
+        logger.warning("No service for the host name", host_name=host_name)
+        return get_response(404, "404 Not Found", "Not Found")
+
+    service = get_service(service_name)
+
+    if service["desiredCount"] == 0:
+        ecs_client.update_service(
+            cluster=cluster_name, service=service_name, desiredCount=1
+        )
+        logger.info("Woke service", service=service_name)
+
+    if has_healthy_target(elbv2_client, get_service_target_group_arn(service)):
+        rule = get_listener_rule(elbv2_client, service)
+        forward_to(elbv2_client, service, rule, get_service_target_group_arn(service))
+        logger.info("Service is healthy", service=service_name)
+
+        return get_response(
+            302, "302 Found", headers={"Location": get_request_url(event, host_name)}
+        )
+
+    return get_response(
+        200, "200 OK", STARTING_PAGE.format(reload_seconds=RELOAD_SECONDS)
+    )
@@ -0,0 +1,117 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script creates the scheduled lambda of the Shiny predictive scaling, which sets
+the minimum capacity of the Shiny service before each hour from its past traffic
+
+"""
+
+from aws_cdk import (
+    core as cdk,
+    aws_ecs as ecs,
+    aws_elasticloadbalancingv2 as alb,
+    aws_events as events,
+    aws_events_targets as events_targets,
+    aws_iam as iam,
+    aws_lambda as lambda_,
+)
+
+from ..custom.lambda_layer import (
+    get_lambda_layer,
+    get_logging_environment,
+)
+
+# Minute of each hour at which the capacity of the next hour is set, early enough for
+# the new tasks to boot before the hour starts
+PREDICTION_MINUTE = "45"
+
+
+class ShinyPredictiveScaling(cdk.Construct):
+    """Scheduled lambda that predicts the capacity of the next hour from the request
+    counts of the load balancer over the previous weeks, and sets it as the minimum
+    capacity of the service.
+    Arguments:
+        :param requests_per_target -- The requests per minute that a task serves, the
+            target of the request count scaling policy
+        :param history_weeks -- The weeks of request counts the prediction reads
+    """
+
+    def __init__(
+        self,
+        scope: cdk.Construct,
+        id: str,
+        instance: str,
+        ecs_cluster_name: str,
+        service: ecs.BaseService,
+        load_balancer: alb.IApplicationLoadBalancer,
+        target_group: alb.ApplicationTargetGroup,
+        requests_per_target: int,
+        min_capacity: int,
+        max_capacity: int,
+        history_weeks: int,
+        **kwargs,
+    ) -> None:
+        super().__init__(scope, id)
+
+        environment = {
+            "CLUSTER_NAME": ecs_cluster_name,
+            "SERVICE_NAME": service.service_name,
+            "LOAD_BALANCER_DIMENSION": load_balancer.load_balancer_full_name,
+            "TARGET_GROUP_DIMENSION": target_group.target_group_full_name,
+            "HISTORY_WEEKS": str(history_weeks),
+            "REQUESTS_PER_TARGET": str(requests_per_target),
+            "MIN_CAPACITY": str(min_capacity),
+            "MAX_CAPACITY": str(max_capacity),
+        }
+        environment.update(get_logging_environment(self))
+
+        func = lambda_.Function(
+            self,
+            id=f"Shiny-Predictive-Scaling-{instance}",
+            code=lambda_.Code.from_asset(
+                "rstudio_fargate/rstudio/fargate/shiny_scaling/"
+            ),
+            handler="shiny_predictive_scaling_handler.main",
+            timeout=cdk.Duration.minutes(1),
+            runtime=lambda_.Runtime.PYTHON_3_8,
+            initial_policy=[
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=["cloudwatch:GetMetricData"],
+                    resources=["*"],
+                ),
+                # Registering an ECS scalable target also reads and updates the service
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=[
+                        "application-autoscaling:RegisterScalableTarget",
+                        "ecs:DescribeServices",
+                        "ecs:UpdateService",
+                    ],
+                    resources=["*"],
+                ),
+            ],
+            layers=[get_lambda_layer(self)],
+            environment=environment,
+        )
+
+        events.Rule(
+            self,
+            id=f"Shiny-Predictive-Scaling-Schedule-{instance}",
+            schedule=events.Schedule.cron(minute=PREDICTION_MINUTE),
+            targets=[events_targets.LambdaFunction(func)],
+        )
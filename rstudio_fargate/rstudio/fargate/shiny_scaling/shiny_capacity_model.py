@@ -0,0 +1,172 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script is the seasonal model of the Shiny predictive scaling. The capacity of an
+hour is predicted from the peak request rate of the same hour in the previous weeks,
+or in the previous days when there is no weekly history yet, divided by the requests
+per task of the request count scaling policy.
+
+It only uses the standard library, so that the model can be tested offline against
+a CSV of past load balancer request counts, with a timestamp,request_count header:
+
+    python shiny_capacity_model.py metrics.csv --requests-per-target 50
+
+"""
+
+import argparse
+import csv
+import math
+from datetime import datetime, timedelta, timezone
+
+# Seasons tried in order, the first with history for the hour gives the prediction
+SEASONS = [timedelta(weeks=1), timedelta(days=1)]
+
+
+def parse_timestamp(value):
+    # CloudWatch exports use a Z suffix, which fromisoformat only reads from 3.11
+    timestamp = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+
+    return timestamp
+
+
+def get_hour_peaks(history, period_seconds):
+    """Return the peak request rate per minute of each hour of the history, keyed by
+    the start of the hour. history holds (timestamp, request count of the period)
+    datapoints."""
+    peaks = {}
+
+    for timestamp, request_count in history:
+        hour_start = timestamp.replace(minute=0, second=0, microsecond=0)
+        requests_per_minute = request_count * 60 / period_seconds
+        peaks[hour_start] = max(peaks.get(hour_start, 0), requests_per_minute)
+
+    return peaks
+
+
+def predict_requests_per_minute(hour_peaks, hour_start, history_weeks):
+    """Return the predicted peak request rate per minute of the hour starting at
+    hour_start: the highest peak of the same hour over the history of the first
+    season with data, or None without history."""
+    for season in SEASONS:
+        seasons_in_history = int(timedelta(weeks=history_weeks) / season)
+        peaks = [
+            hour_peaks[hour_start - season * k]
+            for k in range(1, seasons_in_history + 1)
+            if hour_start - season * k in hour_peaks
+        ]
+
+        if peaks:
+            return max(peaks)
+
+    return None
+
+
+def get_capacity(requests_per_minute, requests_per_target, min_capacity, max_capacity):
+    if requests_per_minute is None:
+        return min_capacity
+
+    capacity = math.ceil(requests_per_minute / requests_per_target)
+    return min(max(capacity, min_capacity), max_capacity)
+
+
+def predict_capacity(
+    history,
+    hour_start,
+    period_seconds,
+    history_weeks,
+    requests_per_target,
+    min_capacity,
+    max_capacity,
+):
+    hour_peaks = get_hour_peaks(history, period_seconds)
+    requests_per_minute = predict_requests_per_minute(
+        hour_peaks, hour_start, history_weeks
+    )
+    return get_capacity(
+        requests_per_minute, requests_per_target, min_capacity, max_capacity
+    )
+
+
+def read_history(csv_path):
+    with open(csv_path, newline="") as csv_file:
+        return [
+            (parse_timestamp(row["timestamp"]), float(row["request_count"]))
+            for row in csv.DictReader(csv_file)
+        ]
+
+
+def replay(
+    history,
+    period_seconds,
+    history_weeks,
+    requests_per_target,
+    min_capacity,
+    max_capacity,
+):
+    """Predict each hour of the history from the hours before it, and print the
+    predicted capacity next to the capacity that the hour needed."""
+    hour_peaks = get_hour_peaks(history, period_seconds)
+    under_provisioned_hours = 0
+    extra_tasks = 0
+
+    print("hour,predicted_capacity,needed_capacity")
+
+    # The predictions only read the hours before hour_start
+    for hour_start in sorted(hour_peaks):
+        predicted = get_capacity(
+            predict_requests_per_minute(hour_peaks, hour_start, history_weeks),
+            requests_per_target,
+            min_capacity,
+            max_capacity,
+        )
+        needed = get_capacity(
+            hour_peaks[hour_start], requests_per_target, min_capacity, max_capacity
+        )
+        under_provisioned_hours += predicted < needed
+        extra_tasks += max(predicted - needed, 0)
+
+        print(f"{hour_start.isoformat()},{predicted},{needed}")
+
+    print(
+        f"# {len(hour_peaks)} hours, {under_provisioned_hours} under-provisioned, "
+        f"{extra_tasks} extra task hours"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay the Shiny capacity predictions over past request counts"
+    )
+    parser.add_argument("csv_path", help="CSV with timestamp,request_count columns")
+    parser.add_argument("--period-seconds", type=int, default=300)
+    parser.add_argument("--history-weeks", type=int, default=4)
+    parser.add_argument("--requests-per-target", type=int, default=50)
+    parser.add_argument("--min-capacity", type=int, default=2)
+    parser.add_argument("--max-capacity", type=int, default=4)
+    args = parser.parse_args()
+
+    replay(
+        read_history(args.csv_path),
+        args.period_seconds,
+        args.history_weeks,
+        args.requests_per_target,
+        args.min_capacity,
+        args.max_capacity,
+    )
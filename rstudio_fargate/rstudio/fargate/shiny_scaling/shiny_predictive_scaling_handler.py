@@ -0,0 +1,109 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script creates the lambda function handler of the Shiny predictive scaling. It
+runs before each hour, predicts the capacity of the next hour from the load balancer
+request counts of the previous weeks and sets it as the minimum capacity of the Shiny
+service, so that the tasks are up when the traffic arrives. The reactive scaling
+policies still add tasks above the minimum.
+
+"""
+
+import boto3
+import os
+from datetime import datetime, timedelta, timezone
+from structured_logging import get_logger
+from shiny_capacity_model import predict_capacity
+
+logger = get_logger("shiny_predictive_scaling")
+
+cloudwatch_client = boto3.client("cloudwatch")
+autoscaling_client = boto3.client("application-autoscaling")
+
+cluster_name = os.environ.get("CLUSTER_NAME", "")
+service_name = os.environ.get("SERVICE_NAME", "")
+load_balancer_dimension = os.environ.get("LOAD_BALANCER_DIMENSION", "")
+target_group_dimension = os.environ.get("TARGET_GROUP_DIMENSION", "")
+history_weeks = int(os.environ.get("HISTORY_WEEKS", "4"))
+requests_per_target = int(os.environ.get("REQUESTS_PER_TARGET", "50"))
+min_capacity = int(os.environ.get("MIN_CAPACITY", "1"))
+max_capacity = int(os.environ.get("MAX_CAPACITY", "1"))
+
+# Period of the request counts, finer periods are only kept for 15 days
+PERIOD_SECONDS = 300
+
+
+def get_request_counts(start_time, end_time):
+    history = []
+    paginator = cloudwatch_client.get_paginator("get_metric_data")
+
+    for page in paginator.paginate(
+        MetricDataQueries=[
+            {
+                "Id": "requests",
+                "MetricStat": {
+                    "Metric": {
+                        "Namespace": "AWS/ApplicationELB",
+                        "MetricName": "RequestCount",
+                        "Dimensions": [
+                            {"Name": "LoadBalancer", "Value": load_balancer_dimension},
+                            {"Name": "TargetGroup", "Value": target_group_dimension},
+                        ],
+                    },
+                    "Period": PERIOD_SECONDS,
+                    "Stat": "Sum",
+                },
+            }
+        ],
+        StartTime=start_time,
+        EndTime=end_time,
+    ):
+        for result in page["MetricDataResults"]:
+            history.extend(zip(result["Timestamps"], result["Values"]))
+
+    return history
+
+
+def main(event, context):
+    logger.start_invocation(context, event)
+
+    now = datetime.now(timezone.utc)
+    hour_start = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    history = get_request_counts(hour_start - timedelta(weeks=history_weeks), now)
+
+    capacity = predict_capacity(
+        history,
+        hour_start,
+        PERIOD_SECONDS,
+        history_weeks,
+        requests_per_target,
+        min_capacity,
+        max_capacity,
+    )
+
+    autoscaling_client.register_scalable_target(
+        ServiceNamespace="ecs",
+        ResourceId=f"service/{cluster_name}/{service_name}",
+        ScalableDimension="ecs:service:DesiredCount",
+        MinCapacity=capacity,
+    )
+    logger.info(
+        "Set minimum capacity",
+        hour=hour_start.isoformat(),
+        min_capacity=capacity,
+        datapoints=len(history),
+    )
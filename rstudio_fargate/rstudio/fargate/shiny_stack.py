@@ -17,10 +17,17 @@ OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 """
 
-from ..custom.ssm_custom_resource import SSMParameterReader
+import re
+
+from ..custom.ssm_custom_resource import SSMParametersReader
+from .fargate_capacity import get_stop_timeout, set_capacity_provider_strategy
+from .fargate_sizing import get_fargate_size
+from .shiny_predictive_scaling import ShinyPredictiveScaling
 
 from aws_cdk import (
     core as cdk,
+    aws_applicationautoscaling as appscaling,
+    aws_cloudwatch as cloudwatch,
     aws_route53 as r53,
     aws_route53_targets as route53_targets,
     aws_certificatemanager as acm,
@@ -28,6 +35,7 @@ from aws_cdk import (
     aws_ecs as ecs,
     aws_ecs_patterns as ecs_patterns,
     aws_efs as efs,
+    aws_elasticloadbalancingv2 as alb,
     aws_logs as logs,
     aws_secretsmanager as sm,
     aws_kms as kms,
@@ -40,6 +48,56 @@ from aws_cdk.aws_elasticloadbalancingv2 import ApplicationProtocol
 from aws_cdk.aws_ecr import Repository
 from aws_cdk.aws_iam import PolicyStatement, Effect
 
+# Active sessions per task, logged every minute by the shiny_sessions.sh service
+SESSIONS_NAMESPACE = "Rstudio/Sessions"
+SESSIONS_METRIC_NAME = "ShinyActiveSessions"
+
+# App name of the sessions of the default service, which serves the paths of no pool
+DEFAULT_POOL_NAME = "default"
+
+
+def get_scaling_schedule(schedule: dict) -> dict:
+    """Build the arguments of a scheduled scaling action from a window of
+    parameters.json, where all values are strings. A window sets the minimum
+    capacity, the maximum capacity or both from its schedule expression on."""
+    scaling_schedule = {
+        key: int(schedule[key])
+        for key in ["min_capacity", "max_capacity"]
+        if key in schedule
+    }
+    scaling_schedule["schedule"] = appscaling.Schedule.expression(schedule["schedule"])
+
+    return scaling_schedule
+
+
+def get_shiny_app(
+    app: dict,
+    shiny_container_cpu: float,
+    shiny_container_memory_in_gb: int,
+    shiny_min_capacity: int,
+    shiny_max_capacity: int,
+) -> dict:
+    """Build the pool of an app of the catalogue in parameters.json, where all values
+    are strings. The path is the URL path of the app under the Shiny domain, /name by
+    default, and the size and the capacity default to the ones of the default
+    service."""
+    name = app["name"]
+
+    if not re.fullmatch(r"[a-z0-9][a-z0-9-]*", name) or name == DEFAULT_POOL_NAME:
+        raise ValueError(
+            f"The Shiny app name {name} must be made of lowercase letters, digits "
+            f"and dashes, and differ from {DEFAULT_POOL_NAME}"
+        )
+
+    return {
+        "name": name,
+        "path": "/" + app.get("path", name).strip("/"),
+        "cpu": float(app.get("cpu", shiny_container_cpu)),
+        "memory_in_gb": float(app.get("memory_in_gb", shiny_container_memory_in_gb)),
+        "min_capacity": int(app.get("min_capacity", shiny_min_capacity)),
+        "max_capacity": int(app.get("max_capacity", shiny_max_capacity)),
+    }
+
 
 class ShinyStack(cdk.Stack):
     def __init__(
@@ -86,14 +144,26 @@ class ShinyStack(cdk.Stack):
         shiny_share_container_path: str,
         hourly_sync_container_path: str,
         instant_sync_container_path: str,
+        shiny_capacity_provider_strategy: dict,
+        shiny_container_cpu: float,
+        shiny_scaling_schedules: list,
+        shiny_predictive_scaling_enabled: bool,
+        shiny_predictive_scaling_history_weeks: int,
+        shiny_sessions_per_target: int,
+        shiny_apps: list,
+        shiny_app_cache_enabled: bool,
+        shiny_app_cache_refresh_seconds: int,
         **kwargs,
     ) -> None:
         super().__init__(scope, id, **kwargs)
 
-        ssm_repo_name_reader = SSMParameterReader(
+        ssm_repo_reader = SSMParametersReader(
             self,
-            id=f"SSM-Repo-Name-{instance}",
-            parameter_name=shiny_container_repository_name_ssm_param,
+            id=f"SSM-Repo-{instance}",
+            parameter_names=[
+                shiny_container_repository_name_ssm_param,
+                shiny_container_repository_arn_ssm_param,
+            ],
             region=self.region,
             instance=instance,
             rstudio_account_id=self.account,
@@ -104,23 +174,13 @@ class ShinyStack(cdk.Stack):
             ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
         )
 
-        ssm_repo_arn_reader = SSMParameterReader(
-            self,
-            id=f"SSM-Repo-Arn-{instance}",
-            parameter_name=shiny_container_repository_arn_ssm_param,
-            region=self.region,
-            instance=instance,
-            rstudio_account_id=self.account,
-            network_account_id=network_account_id,
-            rstudio_pipeline_account_id=rstudio_pipeline_account_id,
-            cross_account_id=rstudio_pipeline_account_id,
-            ssm_cross_account_role_name=ssm_cross_account_role_name,
-            ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
+        shiny_repository_name = ssm_repo_reader.get_parameter_value(
+            shiny_container_repository_name_ssm_param
         )
 
-        shiny_repository_name = ssm_repo_name_reader.get_parameter_value()
-
-        shiny_repository_arn = ssm_repo_arn_reader.get_parameter_value()
+        shiny_repository_arn = ssm_repo_reader.get_parameter_value(
+            shiny_container_repository_arn_ssm_param
+        )
 
         shiny_image_repo = Repository.from_repository_attributes(
             self,
@@ -129,18 +189,9 @@ class ShinyStack(cdk.Stack):
             repository_name=shiny_repository_name,
         )
 
-        if shiny_container_memory_in_gb < 1:
-            cont_cpu = 256
-        elif 1 <= shiny_container_memory_in_gb <= 2:
-            cont_cpu = 512
-        elif 2 < shiny_container_memory_in_gb <= 8:
-            cont_cpu = 1024
-        elif 8 < shiny_container_memory_in_gb <= 16:
-            cont_cpu = 2048
-        elif 16 < shiny_container_memory_in_gb <= 32:
-            cont_cpu = 4096
-
-        cont_mem = shiny_container_memory_in_gb * 1024
+        cont_cpu, cont_mem = get_fargate_size(
+            self, shiny_container_cpu, shiny_container_memory_in_gb
+        )
 
         cluster_fg = ecs.Cluster.from_cluster_attributes(
             self,
@@ -303,76 +354,159 @@ class ShinyStack(cdk.Stack):
 
         shiny_logs_container.node.add_dependency(shiny_cloudwatch_log_kms_key_alias)
 
-        shiny_task_fg = ecs.FargateTaskDefinition(
+        logs.MetricFilter(
             self,
-            id=f"Shiny-fg-task-{instance}",
-            memory_limit_mib=cont_mem,
-            cpu=cont_cpu,
-            volumes=[
-                volume_config_shiny_home,
-                volume_config_rstudio_shiny_share,
-                volume_config_rstudio_hourly,
-                volume_config_rstudio_instant,
-            ],
-        )
-
-        shiny_task_fg.add_to_task_role_policy(
-            PolicyStatement(
-                actions=[
-                    "ssmmessages:CreateControlChannel",
-                    "ssmmessages:CreateDataChannel",
-                    "ssmmessages:OpenControlChannel",
-                    "ssmmessages:OpenDataChannel",
+            id=f"Shiny-sessions-{instance}",
+            log_group=shiny_logs_container,
+            filter_pattern=logs.FilterPattern.exists("$.shiny_sessions"),
+            metric_namespace=SESSIONS_NAMESPACE,
+            metric_name=SESSIONS_METRIC_NAME,
+            metric_value="$.shiny_sessions",
+            dimensions={"Instance": "$.instance", "App": "$.app"},
+        )
+
+        def add_shiny_task(id_prefix, app_name, cont_cpu, cont_mem):
+            """Add a Shiny task definition and its container, which serves the apps of
+            the shared file systems and logs the sessions of app_name."""
+            shiny_task = ecs.FargateTaskDefinition(
+                self,
+                id=f"{id_prefix}-fg-task-{instance}",
+                memory_limit_mib=cont_mem,
+                cpu=cont_cpu,
+                volumes=[
+                    volume_config_shiny_home,
+                    volume_config_rstudio_shiny_share,
+                    volume_config_rstudio_hourly,
+                    volume_config_rstudio_instant,
                 ],
-                effect=Effect.ALLOW,
-                resources=["*"],
             )
-        )
 
-        shiny_container_fg = shiny_task_fg.add_container(
-            id=f"Shiny-fg-{instance}",
-            image=ecs.ContainerImage.from_ecr_repository(shiny_image_repo),
-            memory_limit_mib=cont_mem,
-            logging=ecs.LogDrivers.aws_logs(
-                stream_prefix=f"Shiny-fg-{instance}",
-                log_group=shiny_logs_container,
-            ),
-            linux_parameters=ecs.LinuxParameters(
-                self,
-                id=f"Shiny-linux-params-{instance}",
-                init_process_enabled=True,
-            ),
-        )
+            shiny_task.add_to_task_role_policy(
+                PolicyStatement(
+                    actions=[
+                        "ssmmessages:CreateControlChannel",
+                        "ssmmessages:CreateDataChannel",
+                        "ssmmessages:OpenControlChannel",
+                        "ssmmessages:OpenDataChannel",
+                    ],
+                    effect=Effect.ALLOW,
+                    resources=["*"],
+                )
+            )
 
-        shiny_container_fg.node.add_dependency(shiny_logs_container)
+            # A task protects itself from scale in while it hosts active sessions
+            shiny_task.add_to_task_role_policy(
+                PolicyStatement(
+                    actions=[
+                        "ecs:GetTaskProtection",
+                        "ecs:UpdateTaskProtection",
+                    ],
+                    effect=Effect.ALLOW,
+                    resources=["*"],
+                )
+            )
 
-        shiny_container_fg.node.add_dependency(shiny_task_fg)
+            shiny_container = shiny_task.add_container(
+                id=f"{id_prefix}-fg-{instance}",
+                image=ecs.ContainerImage.from_ecr_repository(shiny_image_repo),
+                memory_limit_mib=cont_mem,
+                stop_timeout=get_stop_timeout(shiny_capacity_provider_strategy),
+                environment={
+                    "SHINY_INSTANCE": instance,
+                    "SHINY_APP": app_name,
+                    "SHINY_APP_CACHE_ENABLED": str(shiny_app_cache_enabled).lower(),
+                    "SHINY_APP_CACHE_SOURCE": shiny_share_container_path,
+                    "SHINY_APP_CACHE_REFRESH_SECONDS": str(
+                        shiny_app_cache_refresh_seconds
+                    ),
+                },
+                logging=ecs.LogDrivers.aws_logs(
+                    stream_prefix=f"{id_prefix}-fg-{instance}",
+                    log_group=shiny_logs_container,
+                ),
+                linux_parameters=ecs.LinuxParameters(
+                    self,
+                    id=f"{id_prefix}-linux-params-{instance}",
+                    init_process_enabled=True,
+                ),
+            )
 
-        shiny_container_fg.add_port_mappings(
-            ecs.PortMapping(container_port=3838),
-        )
+            shiny_container.node.add_dependency(shiny_logs_container)
 
-        shiny_container_fg.add_mount_points(
-            ecs.MountPoint(
-                container_path=home_container_path,
-                source_volume=volume_config_shiny_home.name,
-                read_only=False,
-            ),
-            ecs.MountPoint(
-                container_path=shiny_share_container_path,
-                source_volume=volume_config_rstudio_shiny_share.name,
-                read_only=False,
-            ),
-            ecs.MountPoint(
-                container_path=hourly_sync_container_path,
-                source_volume=volume_config_rstudio_hourly.name,
-                read_only=False,
-            ),
-            ecs.MountPoint(
-                container_path=instant_sync_container_path,
-                source_volume=volume_config_rstudio_instant.name,
-                read_only=False,
-            ),
+            shiny_container.node.add_dependency(shiny_task)
+
+            shiny_container.add_port_mappings(
+                ecs.PortMapping(container_port=3838),
+            )
+
+            shiny_container.add_mount_points(
+                ecs.MountPoint(
+                    container_path=home_container_path,
+                    source_volume=volume_config_shiny_home.name,
+                    read_only=False,
+                ),
+                ecs.MountPoint(
+                    container_path=shiny_share_container_path,
+                    source_volume=volume_config_rstudio_shiny_share.name,
+                    read_only=False,
+                ),
+                ecs.MountPoint(
+                    container_path=hourly_sync_container_path,
+                    source_volume=volume_config_rstudio_hourly.name,
+                    read_only=False,
+                ),
+                ecs.MountPoint(
+                    container_path=instant_sync_container_path,
+                    source_volume=volume_config_rstudio_instant.name,
+                    read_only=False,
+                ),
+            )
+
+            return shiny_task, shiny_container
+
+        def add_scaling_policies(scalable_target, target_group, app_name):
+            scalable_target.scale_on_cpu_utilization(
+                "CpuScaling",
+                target_utilization_percent=shiny_cpu_target_utilization_percent,
+                scale_in_cooldown=cdk.Duration.seconds(shiny_scale_in_cooldown),
+                scale_out_cooldown=cdk.Duration.seconds(shiny_scale_out_cooldown),
+            )
+
+            scalable_target.scale_on_memory_utilization(
+                "MemoryScaling",
+                target_utilization_percent=shiny_memory_target_utilization_percent,
+                scale_in_cooldown=cdk.Duration.seconds(shiny_scale_in_cooldown),
+                scale_out_cooldown=cdk.Duration.seconds(shiny_scale_out_cooldown),
+            )
+
+            scalable_target.scale_on_request_count(
+                "RequestCountScaling",
+                requests_per_target=shiny_requests_per_target,
+                target_group=target_group,
+                scale_in_cooldown=cdk.Duration.seconds(shiny_scale_in_cooldown),
+                scale_out_cooldown=cdk.Duration.seconds(shiny_scale_out_cooldown),
+            )
+
+            # Shiny sessions hold a websocket for their whole life, so the request
+            # count misses long sessions and the session count tracks the load of
+            # the tasks
+            if shiny_sessions_per_target > 0:
+                scalable_target.scale_to_track_custom_metric(
+                    "SessionScaling",
+                    metric=cloudwatch.Metric(
+                        namespace=SESSIONS_NAMESPACE,
+                        metric_name=SESSIONS_METRIC_NAME,
+                        dimensions_map={"Instance": instance, "App": app_name},
+                        statistic="Average",
+                        period=cdk.Duration.minutes(1),
+                    ),
+                    target_value=shiny_sessions_per_target,
+                    scale_in_cooldown=cdk.Duration.seconds(shiny_scale_in_cooldown),
+                    scale_out_cooldown=cdk.Duration.seconds(shiny_scale_out_cooldown),
+                )
+
+        shiny_task_fg, shiny_container_fg = add_shiny_task(
+            "Shiny", DEFAULT_POOL_NAME, cont_cpu, cont_mem
         )
 
         shiny_zone_fg = r53.PublicHostedZone.from_hosted_zone_attributes(
@@ -419,44 +553,138 @@ class ShinyStack(cdk.Stack):
         cfn_service = shiny_service_fg.service.node.default_child
         cfn_service.add_override("Properties.EnableExecuteCommand", True)
 
+        # The base tasks run on on-demand Fargate, the tasks added by the autoscaling
+        # can run on Fargate Spot
+        set_capacity_provider_strategy(
+            shiny_service_fg.service, shiny_capacity_provider_strategy
+        )
+
         shiny_scalable_target = shiny_service_fg.service.auto_scale_task_count(
             min_capacity=shiny_min_capacity,
             max_capacity=shiny_max_capacity,
         )
 
-        shiny_scalable_target.scale_on_cpu_utilization(
-            "CpuScaling",
-            target_utilization_percent=shiny_cpu_target_utilization_percent,
-            scale_in_cooldown=cdk.Duration.seconds(shiny_scale_in_cooldown),
-            scale_out_cooldown=cdk.Duration.seconds(shiny_scale_out_cooldown),
+        add_scaling_policies(
+            shiny_scalable_target, shiny_service_fg.target_group, DEFAULT_POOL_NAME
         )
 
-        shiny_scalable_target.scale_on_memory_utilization(
-            "MemoryScaling",
-            target_utilization_percent=shiny_memory_target_utilization_percent,
-            scale_in_cooldown=cdk.Duration.seconds(shiny_scale_in_cooldown),
-            scale_out_cooldown=cdk.Duration.seconds(shiny_scale_out_cooldown),
-        )
+        # The predictive lambda sets the minimum every hour, which would override the
+        # minimum of a window until the next window
+        if shiny_predictive_scaling_enabled and any(
+            "min_capacity" in schedule for schedule in shiny_scaling_schedules
+        ):
+            raise ValueError(
+                "The Shiny predictive scaling sets the minimum capacity every hour, "
+                "the shiny_scaling_schedules windows can only set max_capacity with it"
+            )
 
-        shiny_scalable_target.scale_on_request_count(
-            "RequestCountScaling",
-            requests_per_target=shiny_requests_per_target,
-            target_group=shiny_service_fg.target_group,
-            scale_in_cooldown=cdk.Duration.seconds(shiny_scale_in_cooldown),
-            scale_out_cooldown=cdk.Duration.seconds(shiny_scale_out_cooldown),
-        )
+        # Scheduled windows raise the capacity ahead of known traffic peaks
+        for schedule in shiny_scaling_schedules:
+            shiny_scalable_target.scale_on_schedule(
+                f"Schedule-{schedule['name']}", **get_scaling_schedule(schedule)
+            )
 
-        file_system_shiny_home.connections.allow_from(
-            shiny_service_fg.service, Port.tcp(2049)
-        )
-        file_system_rstudio_shiny_share.connections.allow_from(
-            shiny_service_fg.service, Port.tcp(2049)
-        )
-        file_system_rstudio_hourly.connections.allow_from(
-            shiny_service_fg.service, Port.tcp(2049)
-        )
-        file_system_rstudio_instant.connections.allow_from(
-            shiny_service_fg.service, Port.tcp(2049)
-        )
+        if shiny_predictive_scaling_enabled:
+            ShinyPredictiveScaling(
+                self,
+                id=f"Shiny-Predictive-Scaling-{instance}",
+                instance=instance,
+                ecs_cluster_name=ecs_cluster_name,
+                service=shiny_service_fg.service,
+                load_balancer=shiny_service_fg.load_balancer,
+                target_group=shiny_service_fg.target_group,
+                requests_per_target=shiny_requests_per_target,
+                min_capacity=shiny_min_capacity,
+                max_capacity=shiny_max_capacity,
+                history_weeks=shiny_predictive_scaling_history_weeks,
+            )
+
+        shiny_services = [shiny_service_fg.service]
+
+        # Each app of the catalogue runs in its own pool of tasks, sized and scaled
+        # on its own, behind a path rule of the listener of the default service. The
+        # rules are evaluated in the order of the catalogue, and the paths of no pool
+        # go to the default service.
+        for i, shiny_app in enumerate(shiny_apps, start=1):
+            app = get_shiny_app(
+                shiny_app,
+                shiny_container_cpu,
+                shiny_container_memory_in_gb,
+                shiny_min_capacity,
+                shiny_max_capacity,
+            )
+            app_name = app["name"]
+
+            app_cpu, app_mem = get_fargate_size(self, app["cpu"], app["memory_in_gb"])
+
+            app_task, app_container = add_shiny_task(
+                f"Shiny-{app_name}", app_name, app_cpu, app_mem
+            )
+
+            app_service = ecs.FargateService(
+                self,
+                id=f"Shiny-{app_name}-fg-service-{instance}",
+                cluster=cluster_fg,
+                task_definition=app_task,
+                desired_count=app["min_capacity"],
+                platform_version=ecs.FargatePlatformVersion.VERSION1_4,
+                health_check_grace_period=cdk.Duration.seconds(
+                    shiny_health_check_grace_period
+                ),
+            )
+
+            app_service.node.add_dependency(app_container)
+
+            app_target_group = shiny_service_fg.listener.add_targets(
+                f"Shiny-{app_name}-fg-target-{instance}",
+                priority=i,
+                conditions=[
+                    alb.ListenerCondition.path_patterns(
+                        [app["path"], f"{app['path']}/*"]
+                    )
+                ],
+                port=3838,
+                protocol=ApplicationProtocol.HTTP,
+                targets=[
+                    app_service.load_balancer_target(
+                        container_name=app_container.container_name,
+                        container_port=3838,
+                    )
+                ],
+                health_check=alb.HealthCheck(
+                    path=f"{app['path']}/", healthy_http_codes="200,301,302"
+                ),
+                stickiness_cookie_duration=cdk.Duration.hours(
+                    shiny_cookie_stickiness_duration
+                ),
+            )
+
+            cfn_app_service = app_service.node.default_child
+            cfn_app_service.add_override("Properties.EnableExecuteCommand", True)
+
+            set_capacity_provider_strategy(
+                app_service, shiny_capacity_provider_strategy
+            )
+
+            app_scalable_target = app_service.auto_scale_task_count(
+                min_capacity=app["min_capacity"],
+                max_capacity=app["max_capacity"],
+            )
+
+            add_scaling_policies(app_scalable_target, app_target_group, app_name)
+
+            shiny_services.append(app_service)
+
+        for shiny_service in shiny_services:
+            file_system_shiny_home.connections.allow_from(shiny_service, Port.tcp(2049))
+            file_system_rstudio_shiny_share.connections.allow_from(
+                shiny_service, Port.tcp(2049)
+            )
+            file_system_rstudio_hourly.connections.allow_from(
+                shiny_service, Port.tcp(2049)
+            )
+            file_system_rstudio_instant.connections.allow_from(
+                shiny_service, Port.tcp(2049)
+            )
 
         self.shiny_load_balancer_arn = shiny_service_fg.load_balancer.load_balancer_arn
@@ -67,6 +67,8 @@ class KmsStack(cdk.Stack):
                 principals=[
                     iam.ServicePrincipal(f"logs.{self.region}.amazonaws.com"),
                     iam.ServicePrincipal("sns.amazonaws.com"),
+                    # Publishes the alarms to the encrypted EFS alarm topic
+                    iam.ServicePrincipal("cloudwatch.amazonaws.com"),
                 ],
             )
         )
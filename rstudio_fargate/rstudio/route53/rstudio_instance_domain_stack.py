@@ -17,7 +17,7 @@ OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 """
 
-from ..custom.ssm_custom_resource import SSMParameterReader
+from ..custom.ssm_custom_resource import SSMParametersReader
 
 from aws_cdk import (
     core as cdk,
@@ -47,11 +47,11 @@ class InstanceDomainStack(cdk.Stack):
     ) -> None:
         super().__init__(scope, id, **kwargs)
 
-        # Get the hosted zone id from network account
-        ssm_zone_id_reader = SSMParameterReader(
+        # Get the hosted zone id and name from network account
+        ssm_zone_reader = SSMParametersReader(
             self,
-            id=f"SSM-Reader-Zone-Id-{instance}",
-            parameter_name=ssm_route53_delegation_id,
+            id=f"SSM-Reader-Zone-{instance}",
+            parameter_names=[ssm_route53_delegation_id, ssm_route53_delegation_name],
             region=self.region,
             instance=instance,
             rstudio_account_id=rstudio_account_id,
@@ -62,25 +62,12 @@ class InstanceDomainStack(cdk.Stack):
             ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
         )
 
-        build_zone_id = ssm_zone_id_reader.get_parameter_value()
+        build_zone_id = ssm_zone_reader.get_parameter_value(ssm_route53_delegation_id)
 
-        # Get the hosted zone name from network account
-        ssm_zone_name_reader = SSMParameterReader(
-            self,
-            id=f"SSM-Reader-Zone-Name-{instance}",
-            parameter_name=ssm_route53_delegation_name,
-            region=self.region,
-            instance=instance,
-            rstudio_account_id=rstudio_account_id,
-            network_account_id=network_account_id,
-            rstudio_pipeline_account_id=rstudio_pipeline_account_id,
-            cross_account_id=network_account_id,
-            ssm_cross_account_role_name=ssm_cross_account_role_name,
-            ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
+        build_zone_name = ssm_zone_reader.get_parameter_value(
+            ssm_route53_delegation_name
         )
 
-        build_zone_name = ssm_zone_name_reader.get_parameter_value()
-
         instance_domain = f"{instance}.{build_zone_name}"
 
         instance_zone = r53.PublicHostedZone(
@@ -26,6 +26,7 @@ from .efs.rstudio_efs_stack import RstudioEfsStack
 from .efs.shiny_efs_stack import ShinyEfsStack
 from .fargate.rstudio_ec2_stack import RstudioEc2Stack
 from .fargate.rstudio_fargate_stack import RstudioFargateStack
+from .fargate.rstudio_stack_shards import get_container_shards, get_shard_stack_id
 from .fargate.shiny_stack import ShinyStack
 from .waf.rstudio_waf_stack import RstudioWafStack
 from .waf.shiny_waf_stack import ShinyWafStack
@@ -90,11 +91,34 @@ class PipelineStage(cdk.Stage):
         access_point_path_hourly: str,
         datalake_source_bucket_key_instant: str,
         access_point_path_instant: str,
+        datasync_hourly_task_arn_ssm_param_name: str,
+        datasync_incremental_sync_enabled: bool,
+        datasync_full_sync_schedule_expression: str,
+        datasync_hourly_task_options: dict,
+        datasync_instant_task_options: dict,
+        datasync_hourly_shards: list,
+        datasync_sync_latency_alarm_threshold_seconds: int,
         athena_output_bucket_key: str,
         home_container_path: str,
         shiny_share_container_path: str,
         hourly_sync_container_path: str,
         instant_sync_container_path: str,
+        rstudio_shared_service_enabled: bool,
+        rstudio_containers_per_stack: int,
+        rstudio_scale_to_zero_enabled: bool,
+        rstudio_idle_timeout_minutes: int,
+        rstudio_capacity_provider_strategy: dict,
+        shiny_capacity_provider_strategy: dict,
+        rstudio_container_cpu: float,
+        shiny_container_cpu: float,
+        shiny_scaling_schedules: list,
+        shiny_predictive_scaling_enabled: bool,
+        shiny_predictive_scaling_history_weeks: int,
+        shiny_sessions_per_target: int,
+        shiny_apps: list,
+        shiny_app_cache_enabled: bool,
+        shiny_app_cache_refresh_seconds: int,
+        efs_file_system_options: dict,
         **kwargs,
     ):
         super().__init__(scope, id, **kwargs)
@@ -147,6 +171,8 @@ class PipelineStage(cdk.Stage):
             rstudio_efs_key_alias=rstudio_efs_key_alias,
             access_point_path_hourly=access_point_path_hourly,
             access_point_path_instant=access_point_path_instant,
+            efs_file_system_options=efs_file_system_options,
+            sns_email=sns_email,
             env=env_dict,
         )
 
@@ -156,6 +182,8 @@ class PipelineStage(cdk.Stage):
             vpc=vpc_stack_build.vpc,
             instance=instance,
             shiny_efs_key_alias=shiny_efs_key_alias,
+            efs_file_system_options=efs_file_system_options,
+            efs_alarm_topic_arn=rstudio_efs_stack_build.efs_alarm_topic_arn,
             env=env_dict,
         )
 
@@ -173,87 +201,124 @@ class PipelineStage(cdk.Stage):
             env=env_dict,
         )
 
-        if rstudio_install_type == "ec2":
-            rstudio_stack_build = RstudioEc2Stack(
-                self,
-                id=f"RstudioEc2Stack-{instance}",
-                vpc=vpc_stack_build.vpc,
-                instance=instance,
-                file_system_rstudio_shiny_share_file_system_id=rstudio_efs_stack_build.file_system_rstudio_shiny_share_file_system_id,
-                file_system_rstudio_shiny_share_security_group_id=rstudio_efs_stack_build.file_system_rstudio_shiny_share_security_group_id,
-                access_point_id_rstudio_shiny_share=rstudio_efs_stack_build.access_point_id_rstudio_shiny_share,
-                file_system_rstudio_hourly_file_system_id=rstudio_efs_stack_build.file_system_rstudio_hourly_file_system_id,
-                file_system_rstudio_hourly_security_group_id=rstudio_efs_stack_build.file_system_rstudio_hourly_security_group_id,
-                access_point_id_rstudio_hourly=rstudio_efs_stack_build.access_point_id_rstudio_hourly,
-                file_system_rstudio_instant_file_system_id=rstudio_efs_stack_build.file_system_rstudio_instant_file_system_id,
-                file_system_rstudio_instant_security_group_id=rstudio_efs_stack_build.file_system_rstudio_instant_security_group_id,
-                access_point_id_rstudio_instant=rstudio_efs_stack_build.access_point_id_rstudio_instant,
-                rstudio_pipeline_account_id=self.account,
-                network_account_id=network_account_id,
-                rstudio_cert_arn=route53_instance_stack_build.rstudio_cert_arn,
-                rstudio_hosted_zone_id=route53_instance_stack_build.rstudio_hosted_zone_id,
-                rstudio_hosted_zone_name=route53_instance_stack_build.rstudio_hosted_zone_name,
-                ecs_cluster_security_group_id=ecs_cluster_stack_build.ecs_cluster_security_group_id,
-                ecs_cluster_name=ecs_cluster_stack_build.ecs_cluster_name,
-                rstudio_container_repository_name_ssm_param=rstudio_container_repository_name_ssm_param,
-                rstudio_container_repository_arn_ssm_param=rstudio_container_repository_arn_ssm_param,
-                ssm_cross_account_role_name=ssm_cross_account_role_name,
-                ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
-                athena_output_bucket_name=athena_output_bucket_name,
-                athena_workgroup_name=athena_workgroup_name,
-                number_of_rstudio_containers=number_of_rstudio_containers,
-                rstudio_cwlogs_key_alias=rstudio_cwlogs_key_alias,
-                rstudio_efs_key_alias=rstudio_efs_key_alias,
-                rstudio_user_key_alias=rstudio_user_key_alias,
-                rstudio_container_memory_reserved=rstudio_container_memory_reserved,
-                rstudio_health_check_grace_period=rstudio_health_check_grace_period,
-                home_container_path=home_container_path,
-                shiny_share_container_path=shiny_share_container_path,
-                hourly_sync_container_path=hourly_sync_container_path,
-                instant_sync_container_path=instant_sync_container_path,
-                env=env_dict,
-            )
+        # The containers are split across sibling stacks, which the pipeline deploys
+        # in parallel since they do not depend on each other
+        rstudio_stack_builds = []
 
-        if rstudio_install_type == "fargate":
-            rstudio_stack_build = RstudioFargateStack(
-                self,
-                id=f"RstudioFargateStack-{instance}",
-                vpc=vpc_stack_build.vpc,
-                instance=instance,
-                file_system_rstudio_shiny_share_file_system_id=rstudio_efs_stack_build.file_system_rstudio_shiny_share_file_system_id,
-                file_system_rstudio_shiny_share_security_group_id=rstudio_efs_stack_build.file_system_rstudio_shiny_share_security_group_id,
-                access_point_id_rstudio_shiny_share=rstudio_efs_stack_build.access_point_id_rstudio_shiny_share,
-                file_system_rstudio_hourly_file_system_id=rstudio_efs_stack_build.file_system_rstudio_hourly_file_system_id,
-                file_system_rstudio_hourly_security_group_id=rstudio_efs_stack_build.file_system_rstudio_hourly_security_group_id,
-                access_point_id_rstudio_hourly=rstudio_efs_stack_build.access_point_id_rstudio_hourly,
-                file_system_rstudio_instant_file_system_id=rstudio_efs_stack_build.file_system_rstudio_instant_file_system_id,
-                file_system_rstudio_instant_security_group_id=rstudio_efs_stack_build.file_system_rstudio_instant_security_group_id,
-                access_point_id_rstudio_instant=rstudio_efs_stack_build.access_point_id_rstudio_instant,
-                rstudio_pipeline_account_id=self.account,
-                network_account_id=network_account_id,
-                rstudio_container_memory_in_gb=rstudio_container_memory_in_gb,
-                rstudio_cert_arn=route53_instance_stack_build.rstudio_cert_arn,
-                rstudio_hosted_zone_id=route53_instance_stack_build.rstudio_hosted_zone_id,
-                rstudio_hosted_zone_name=route53_instance_stack_build.rstudio_hosted_zone_name,
-                ecs_cluster_security_group_id=ecs_cluster_stack_build.ecs_cluster_security_group_id,
-                ecs_cluster_name=ecs_cluster_stack_build.ecs_cluster_name,
-                rstudio_container_repository_name_ssm_param=rstudio_container_repository_name_ssm_param,
-                rstudio_container_repository_arn_ssm_param=rstudio_container_repository_arn_ssm_param,
-                athena_output_bucket_name=athena_output_bucket_name,
-                athena_workgroup_name=athena_workgroup_name,
-                ssm_cross_account_role_name=ssm_cross_account_role_name,
-                ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
-                number_of_rstudio_containers=number_of_rstudio_containers,
-                rstudio_cwlogs_key_alias=rstudio_cwlogs_key_alias,
-                rstudio_efs_key_alias=rstudio_efs_key_alias,
-                rstudio_user_key_alias=rstudio_user_key_alias,
-                rstudio_health_check_grace_period=rstudio_health_check_grace_period,
-                home_container_path=home_container_path,
-                shiny_share_container_path=shiny_share_container_path,
-                hourly_sync_container_path=hourly_sync_container_path,
-                instant_sync_container_path=instant_sync_container_path,
-                env=env_dict,
+        for shard_index, (first_container_number, shard_containers) in enumerate(
+            get_container_shards(
+                number_of_rstudio_containers, rstudio_containers_per_stack
             )
+        ):
+            if rstudio_install_type == "ec2":
+                rstudio_stack_build = RstudioEc2Stack(
+                    self,
+                    id=get_shard_stack_id(f"RstudioEc2Stack-{instance}", shard_index),
+                    vpc=vpc_stack_build.vpc,
+                    instance=instance,
+                    file_system_rstudio_shiny_share_file_system_id=rstudio_efs_stack_build.file_system_rstudio_shiny_share_file_system_id,
+                    file_system_rstudio_shiny_share_security_group_id=rstudio_efs_stack_build.file_system_rstudio_shiny_share_security_group_id,
+                    access_point_id_rstudio_shiny_share=rstudio_efs_stack_build.access_point_id_rstudio_shiny_share,
+                    file_system_rstudio_hourly_file_system_id=rstudio_efs_stack_build.file_system_rstudio_hourly_file_system_id,
+                    file_system_rstudio_hourly_security_group_id=rstudio_efs_stack_build.file_system_rstudio_hourly_security_group_id,
+                    access_point_id_rstudio_hourly=rstudio_efs_stack_build.access_point_id_rstudio_hourly,
+                    file_system_rstudio_instant_file_system_id=rstudio_efs_stack_build.file_system_rstudio_instant_file_system_id,
+                    file_system_rstudio_instant_security_group_id=rstudio_efs_stack_build.file_system_rstudio_instant_security_group_id,
+                    access_point_id_rstudio_instant=rstudio_efs_stack_build.access_point_id_rstudio_instant,
+                    rstudio_pipeline_account_id=self.account,
+                    network_account_id=network_account_id,
+                    rstudio_cert_arn=route53_instance_stack_build.rstudio_cert_arn,
+                    rstudio_hosted_zone_id=route53_instance_stack_build.rstudio_hosted_zone_id,
+                    rstudio_hosted_zone_name=route53_instance_stack_build.rstudio_hosted_zone_name,
+                    ecs_cluster_security_group_id=ecs_cluster_stack_build.ecs_cluster_security_group_id,
+                    ecs_cluster_name=ecs_cluster_stack_build.ecs_cluster_name,
+                    rstudio_container_repository_name_ssm_param=rstudio_container_repository_name_ssm_param,
+                    rstudio_container_repository_arn_ssm_param=rstudio_container_repository_arn_ssm_param,
+                    ssm_cross_account_role_name=ssm_cross_account_role_name,
+                    ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
+                    athena_output_bucket_name=athena_output_bucket_name,
+                    athena_workgroup_name=athena_workgroup_name,
+                    number_of_rstudio_containers=shard_containers,
+                    first_container_number=first_container_number,
+                    rstudio_cwlogs_key_alias=rstudio_cwlogs_key_alias,
+                    rstudio_efs_key_alias=rstudio_efs_key_alias,
+                    rstudio_user_key_alias=rstudio_user_key_alias,
+                    rstudio_container_memory_reserved=rstudio_container_memory_reserved,
+                    rstudio_health_check_grace_period=rstudio_health_check_grace_period,
+                    home_container_path=home_container_path,
+                    shiny_share_container_path=shiny_share_container_path,
+                    hourly_sync_container_path=hourly_sync_container_path,
+                    instant_sync_container_path=instant_sync_container_path,
+                    rstudio_scale_to_zero_enabled=rstudio_scale_to_zero_enabled,
+                    rstudio_idle_timeout_minutes=rstudio_idle_timeout_minutes,
+                    efs_file_system_options=efs_file_system_options,
+                    efs_alarm_topic_arn=rstudio_efs_stack_build.efs_alarm_topic_arn,
+                    env=env_dict,
+                )
+
+            if rstudio_install_type == "fargate":
+                rstudio_stack_build = RstudioFargateStack(
+                    self,
+                    id=get_shard_stack_id(
+                        f"RstudioFargateStack-{instance}", shard_index
+                    ),
+                    vpc=vpc_stack_build.vpc,
+                    instance=instance,
+                    file_system_rstudio_shiny_share_file_system_id=rstudio_efs_stack_build.file_system_rstudio_shiny_share_file_system_id,
+                    file_system_rstudio_shiny_share_security_group_id=rstudio_efs_stack_build.file_system_rstudio_shiny_share_security_group_id,
+                    access_point_id_rstudio_shiny_share=rstudio_efs_stack_build.access_point_id_rstudio_shiny_share,
+                    file_system_rstudio_hourly_file_system_id=rstudio_efs_stack_build.file_system_rstudio_hourly_file_system_id,
+                    file_system_rstudio_hourly_security_group_id=rstudio_efs_stack_build.file_system_rstudio_hourly_security_group_id,
+                    access_point_id_rstudio_hourly=rstudio_efs_stack_build.access_point_id_rstudio_hourly,
+                    file_system_rstudio_instant_file_system_id=rstudio_efs_stack_build.file_system_rstudio_instant_file_system_id,
+                    file_system_rstudio_instant_security_group_id=rstudio_efs_stack_build.file_system_rstudio_instant_security_group_id,
+                    access_point_id_rstudio_instant=rstudio_efs_stack_build.access_point_id_rstudio_instant,
+                    rstudio_pipeline_account_id=self.account,
+                    network_account_id=network_account_id,
+                    rstudio_container_memory_in_gb=rstudio_container_memory_in_gb,
+                    rstudio_cert_arn=route53_instance_stack_build.rstudio_cert_arn,
+                    rstudio_hosted_zone_id=route53_instance_stack_build.rstudio_hosted_zone_id,
+                    rstudio_hosted_zone_name=route53_instance_stack_build.rstudio_hosted_zone_name,
+                    ecs_cluster_security_group_id=ecs_cluster_stack_build.ecs_cluster_security_group_id,
+                    ecs_cluster_name=ecs_cluster_stack_build.ecs_cluster_name,
+                    rstudio_container_repository_name_ssm_param=rstudio_container_repository_name_ssm_param,
+                    rstudio_container_repository_arn_ssm_param=rstudio_container_repository_arn_ssm_param,
+                    athena_output_bucket_name=athena_output_bucket_name,
+                    athena_workgroup_name=athena_workgroup_name,
+                    ssm_cross_account_role_name=ssm_cross_account_role_name,
+                    ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
+                    number_of_rstudio_containers=shard_containers,
+                    first_container_number=first_container_number,
+                    rstudio_cwlogs_key_alias=rstudio_cwlogs_key_alias,
+                    rstudio_efs_key_alias=rstudio_efs_key_alias,
+                    rstudio_user_key_alias=rstudio_user_key_alias,
+                    rstudio_health_check_grace_period=rstudio_health_check_grace_period,
+                    home_container_path=home_container_path,
+                    shiny_share_container_path=shiny_share_container_path,
+                    hourly_sync_container_path=hourly_sync_container_path,
+                    instant_sync_container_path=instant_sync_container_path,
+                    rstudio_shared_service_enabled=rstudio_shared_service_enabled,
+                    rstudio_scale_to_zero_enabled=rstudio_scale_to_zero_enabled,
+                    rstudio_idle_timeout_minutes=rstudio_idle_timeout_minutes,
+                    rstudio_capacity_provider_strategy=rstudio_capacity_provider_strategy,
+                    rstudio_container_cpu=rstudio_container_cpu,
+                    efs_file_system_options=efs_file_system_options,
+                    efs_alarm_topic_arn=rstudio_efs_stack_build.efs_alarm_topic_arn,
+                    env=env_dict,
+                )
+
+            rstudio_stack_builds.append(rstudio_stack_build)
+
+        rstudio_load_balancer_arn = [
+            load_balancer_arn
+            for rstudio_stack_build in rstudio_stack_builds
+            for load_balancer_arn in rstudio_stack_build.rstudio_load_balancer_arn
+        ]
+        secretpass_arn = [
+            secret_arn
+            for rstudio_stack_build in rstudio_stack_builds
+            for secret_arn in rstudio_stack_build.secretpass_arn
+        ]
 
         shiny_fargate_stack_build = ShinyStack(
             self,
@@ -298,6 +363,15 @@ class PipelineStage(cdk.Stage):
             shiny_share_container_path=shiny_share_container_path,
             hourly_sync_container_path=hourly_sync_container_path,
             instant_sync_container_path=instant_sync_container_path,
+            shiny_capacity_provider_strategy=shiny_capacity_provider_strategy,
+            shiny_container_cpu=shiny_container_cpu,
+            shiny_scaling_schedules=shiny_scaling_schedules,
+            shiny_predictive_scaling_enabled=shiny_predictive_scaling_enabled,
+            shiny_predictive_scaling_history_weeks=shiny_predictive_scaling_history_weeks,
+            shiny_sessions_per_target=shiny_sessions_per_target,
+            shiny_apps=shiny_apps,
+            shiny_app_cache_enabled=shiny_app_cache_enabled,
+            shiny_app_cache_refresh_seconds=shiny_app_cache_refresh_seconds,
             env=env_dict,
         )
 
@@ -316,6 +390,13 @@ class PipelineStage(cdk.Stage):
             access_point_path_hourly=access_point_path_hourly,
             datalake_source_bucket_key_instant=datalake_source_bucket_key_instant,
             access_point_path_instant=access_point_path_instant,
+            datasync_hourly_task_arn_ssm_param_name=datasync_hourly_task_arn_ssm_param_name,
+            datasync_incremental_sync_enabled=datasync_incremental_sync_enabled,
+            datasync_full_sync_schedule_expression=datasync_full_sync_schedule_expression,
+            datasync_hourly_task_options=datasync_hourly_task_options,
+            datasync_instant_task_options=datasync_instant_task_options,
+            datasync_hourly_shards=datasync_hourly_shards,
+            datasync_sync_latency_alarm_threshold_seconds=datasync_sync_latency_alarm_threshold_seconds,
             env=env_dict,
         )
 
@@ -323,7 +404,7 @@ class PipelineStage(cdk.Stage):
             self,
             id=f"Waf-RstudioStack-{instance}",
             instance=instance,
-            rstudio_load_balancer_arn=rstudio_stack_build.rstudio_load_balancer_arn,
+            rstudio_load_balancer_arn=rstudio_load_balancer_arn,
             allowed_ips=allowed_ips,
             env=env_dict,
         )
@@ -346,7 +427,7 @@ class PipelineStage(cdk.Stage):
             shiny_hosted_zone_id=route53_instance_stack_build.shiny_hosted_zone_id,
             shiny_hosted_zone_name=route53_instance_stack_build.shiny_hosted_zone_name,
             sns_email=sns_email,
-            secretpass_arn=rstudio_stack_build.secretpass_arn,
+            secretpass_arn=secretpass_arn,
             number_of_rstudio_containers=number_of_rstudio_containers,
             rstudio_user_key_alias=rstudio_user_key_alias,
             env=env_dict,
@@ -355,10 +436,12 @@ class PipelineStage(cdk.Stage):
         ecs_cluster_stack_build.add_dependency(vpc_stack_build)
         rstudio_efs_stack_build.add_dependency(vpc_stack_build)
         shiny_efs_stack_build.add_dependency(vpc_stack_build)
+        shiny_efs_stack_build.add_dependency(rstudio_efs_stack_build)
 
-        rstudio_stack_build.add_dependency(route53_instance_stack_build)
-        rstudio_stack_build.add_dependency(ecs_cluster_stack_build)
-        rstudio_stack_build.add_dependency(rstudio_efs_stack_build)
+        for rstudio_stack_build in rstudio_stack_builds:
+            rstudio_stack_build.add_dependency(route53_instance_stack_build)
+            rstudio_stack_build.add_dependency(ecs_cluster_stack_build)
+            rstudio_stack_build.add_dependency(rstudio_efs_stack_build)
 
         shiny_fargate_stack_build.add_dependency(route53_instance_stack_build)
         shiny_fargate_stack_build.add_dependency(ecs_cluster_stack_build)
@@ -366,6 +449,8 @@ class PipelineStage(cdk.Stage):
         shiny_fargate_stack_build.add_dependency(shiny_efs_stack_build)
 
         datasync_stack_build.add_dependency(rstudio_efs_stack_build)
-        rstudio_waf_stack_build.add_dependency(rstudio_stack_build)
+        for rstudio_stack_build in rstudio_stack_builds:
+            rstudio_waf_stack_build.add_dependency(rstudio_stack_build)
         shiny_waf_stack_build.add_dependency(shiny_fargate_stack_build)
-        ses_email_stack_build.add_dependency(rstudio_stack_build)
+        for rstudio_stack_build in rstudio_stack_builds:
+            ses_email_stack_build.add_dependency(rstudio_stack_build)
@@ -16,7 +16,7 @@ HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTIO
 OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 """
-from .ses_custom_resource import SESSendEmail
+from .ses_custom_resource import SESSendEmails
 
 from aws_cdk import (
     core as cdk,
@@ -25,6 +25,39 @@ from aws_cdk import (
     aws_route53 as r53,
 )
 
+# SES template of the welcome email, the password is added to the template data of
+# each user by the mailer. Double braces escape HTML, triple braces do not.
+WELCOME_EMAIL_SUBJECT = "Welcome to RStudio"
+
+WELCOME_EMAIL_HTML = """
+            <html>
+              <body>
+                <h1>Good day,</h1>
+                 <p style="font-size:18px">Hello rstudio@container{{container}},<br/><br/>Your username is: rstudio <br/>
+                                                Your password is: {{password}}<br/><br/>
+                                                To acess rstudio click {{rstudio_url}}<br/><br/>
+                                                  To acess shiny click {{shiny_url}}<br/><br/>
+                                                  In RStudio, save shiny app files in: /srv/shiny-server to deploy shiny apps.<br/><br/>
+                                            Regards,
+                                            <br>Rstudio@container{{container}}.{{instance}}</p>
+              </body>
+            </html>
+        """
+
+WELCOME_EMAIL_TEXT = """Hello rstudio@container{{container}},
+
+Your username is: rstudio
+Your password is: {{{password}}}
+
+To acess rstudio click {{{rstudio_url}}}
+
+To acess shiny click {{{shiny_url}}}
+
+In RStudio, save shiny app files in: /srv/shiny-server to deploy shiny apps.
+
+Regards,
+Rstudio@container{{container}}.{{instance}}"""
+
 
 class RstudioEmailPasswordsStack(cdk.Stack):
     def __init__(
@@ -64,26 +97,32 @@ class RstudioEmailPasswordsStack(cdk.Stack):
 
         shiny_url = f"https://{shiny_zone.zone_name}"
 
-        # Send email here
+        # Send the emails of all the containers with a single custom resource
+        emails = []
+
         for i in range(1, number_of_rstudio_containers + 1):
             rstudio_url = f"https://container{i}.{rstudio_zone.zone_name}"
-            ses_send_email = SESSendEmail(
-                self,
-                id=f"SES-Send-container{i}-{instance}",
-                email_from=sns_email,
-                email_to=sns_email,
-                secret_arn=secretpass_arn[i - 1],
-                subject="Welcome to RStudio",
-                message=f"""Hello rstudio@container{i},<br/><br/>Your username is: rstudio <br/>
-                                                Your password is: <password><br/><br/>
-                                                To acess rstudio click {rstudio_url}<br/><br/>
-                                                  To acess shiny click {shiny_url}<br/><br/>
-                                                  In RStudio, save shiny app files in: /srv/shiny-server to deploy shiny apps.<br/><br/>
-                                            Regards,
-                                            <br>Rstudio@container{i}.{instance}""",
-                region=self.region,
-                account_id=self.account,
-                counter=i,
-                instance=instance,
-                rstudio_user_key_alias=rstudio_user_key_alias,
+            emails.append(
+                {
+                    "name": f"container{i}",
+                    "email_to": sns_email,
+                    "secret_arn": secretpass_arn[i - 1],
+                    "template_data": {"container": str(i), "rstudio_url": rstudio_url},
+                }
             )
+
+        ses_send_emails = SESSendEmails(
+            self,
+            id=f"SES-Send-{instance}",
+            email_from=sns_email,
+            emails=emails,
+            template_name=f"rstudio-welcome-{instance}",
+            subject=WELCOME_EMAIL_SUBJECT,
+            html_part=WELCOME_EMAIL_HTML,
+            text_part=WELCOME_EMAIL_TEXT,
+            default_template_data={"shiny_url": shiny_url, "instance": instance},
+            region=self.region,
+            account_id=self.account,
+            instance=instance,
+            rstudio_user_key_alias=rstudio_user_key_alias,
+        )
@@ -25,6 +25,7 @@ from aws_cdk import (
     aws_iam as iam,
     aws_s3 as s3,
     aws_kms as kms,
+    aws_ses as ses,
     aws_cloudformation as cfn,
     aws_lambda as lambda_,
 )
@@ -36,11 +37,21 @@ from aws_cdk.custom_resources import (
 
 from datetime import datetime
 
+from ..custom.lambda_layer import (
+    get_lambda_layer,
+    get_logging_environment,
+)
+
 
-class SESSendEmail(core.Construct):
-    """SSM Parameter constructs that retrieves the parameter value form an environment
+class SESSendEmails(core.Construct):
+    """SES constructs that registers an email template and sends a batch of templated
+    emails with the passwords of the users. The password of each recipient is added
+    to its template data as "password".
     Arguments:
-        :param parameter_name -- The name of the SSM parameter to retrieve its value
+        :param emails -- The emails to send, dictionaries with the name of the
+            recipient, the email address, the password secret arn and the template
+            data of the recipient
+        :param default_template_data -- The template data shared by all the emails
     """
 
     def __init__(
@@ -48,13 +59,14 @@ class SESSendEmail(core.Construct):
         scope: core.Construct,
         id: str,
         email_from: str,
-        email_to: str,
-        secret_arn: str,
+        emails: list,
+        template_name: str,
         subject: str,
-        message: str,
+        html_part: str,
+        text_part: str,
+        default_template_data: dict,
         region: str,
         account_id: str,
-        counter: int,
         instance: str,
         rstudio_user_key_alias: str,
         **kwargs,
@@ -67,13 +79,7 @@ class SESSendEmail(core.Construct):
             alias_name=rstudio_user_key_alias,
         )
 
-        with open(
-            "rstudio_fargate/rstudio/ses/ses_custom_resource_handler.py",
-            encoding="utf-8",
-        ) as fp:
-            code_body = fp.read()
-
-        function_name = f"rstudio_send_email_{instance}_" + str(counter)
+        function_name = f"rstudio_send_email_{instance}"
         # function_name = f"rstudio_send_email"
         policy = [
             iam.PolicyStatement(
@@ -90,8 +96,26 @@ class SESSendEmail(core.Construct):
             ),
             iam.PolicyStatement(
                 effect=iam.Effect.ALLOW,
-                actions=["ses:SendEmail", "ses:SendRawEmail", "ses:SendTemplatedEmail"],
-                resources=[f"arn:aws:ses:{region}:{account_id}:identity/*"],
+                actions=[
+                    "ses:SendEmail",
+                    "ses:SendRawEmail",
+                    "ses:SendTemplatedEmail",
+                    "ses:SendBulkTemplatedEmail",
+                ],
+                resources=[
+                    f"arn:aws:ses:{region}:{account_id}:identity/*",
+                    f"arn:aws:ses:{region}:{account_id}:template/*",
+                ],
+            ),
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["ses:GetSendQuota"],
+                resources=["*"],
+            ),
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["secretsmanager:BatchGetSecretValue"],
+                resources=["*"],
             ),
             iam.PolicyStatement(
                 effect=iam.Effect.ALLOW,
@@ -113,12 +137,31 @@ class SESSendEmail(core.Construct):
             ),
         ]
 
+        # Registered by CloudFormation, so that it is only updated when it changes
+        template = ses.CfnTemplate(
+            self,
+            id="Template",
+            template=ses.CfnTemplate.TemplateProperty(
+                template_name=template_name,
+                subject_part=subject,
+                html_part=html_part,
+                text_part=text_part,
+            ),
+        )
+
         params = {
             "EmailFrom": email_from,
-            "EmailTo": email_to,
-            "SecretArn": secret_arn,
-            "Subject": subject,
-            "Message": message,
+            "TemplateName": template.ref,
+            "DefaultTemplateData": default_template_data,
+            "Emails": [
+                {
+                    "Name": email["name"],
+                    "EmailTo": email["email_to"],
+                    "SecretArn": email["secret_arn"],
+                    "TemplateData": email["template_data"],
+                }
+                for email in emails
+            ],
         }
 
         func = lambda_.SingletonFunction(
@@ -127,11 +170,14 @@ class SESSendEmail(core.Construct):
             lambda_purpose="SesSingleton-Lambda",
             function_name=function_name,
             uuid="f3d4f730-4ee1-11e8-9c2d-fd7ae01bbebc",
-            code=lambda_.InlineCode(code_body),
-            handler="index.main",
-            timeout=core.Duration.seconds(300),
+            code=lambda_.Code.from_asset("rstudio_fargate/rstudio/ses/ses_mailer/"),
+            handler="ses_custom_resource_handler.main",
+            # Emails are sent at the SES send rate, one per second in the SES sandbox
+            timeout=core.Duration.minutes(15),
             runtime=lambda_.Runtime.PYTHON_3_8,
             initial_policy=policy,
+            layers=[get_lambda_layer(self)],
+            environment=get_logging_environment(self),
         )
 
         self.resource = cfn.CustomResource(
@@ -0,0 +1,200 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script creates the lambda function handler for the lambda function sending emails
+to users via SES. A single request sends the emails of all the containers: the
+passwords are read with BatchGetSecretValue and the emails are sent from an SES
+template with SendBulkTemplatedEmail, at the SES maximum send rate of the account.
+The template data of each email only holds the fields of its user. An update
+only emails the recipients that were added since the previous deployment. The
+result of each recipient is logged, and the request fails with the list of the failed
+recipients if any. The deployed properties then do not hold them, so the next
+deployment emails them again.
+
+"""
+
+import boto3
+import json
+import time
+import cfn_response
+from structured_logging import get_logger
+
+logger = get_logger("ses_custom_resource")
+
+ses_client = boto3.client("ses")
+sm_client = boto3.client("secretsmanager")
+
+# Maximum number of secrets of a BatchGetSecretValue call
+MAX_SECRETS_PER_CALL = 20
+# Maximum number of destinations of a SendBulkTemplatedEmail call
+MAX_DESTINATIONS_PER_CALL = 50
+
+
+def main(event, context):
+    physical_id = event.get("PhysicalResourceId")
+
+    logger.start_invocation(context, event, event.get("RequestId"))
+
+    try:
+        # Derived from the properties, kept by an update that only changes the
+        # service token. Such an update sends no email, and still answers with all
+        # the attributes.
+        physical_id = cfn_response.get_physical_resource_id(event)
+
+        # Check if this is a Create and we're failing Creates
+        if event["RequestType"] == "Create" and event["ResourceProperties"].get(
+            "FailCreate", False
+        ):
+            raise RuntimeError("Create failure requested")
+        if event["RequestType"] in ["Create", "Update"]:
+            email_from = event["ResourceProperties"]["EmailFrom"]
+            template_name = event["ResourceProperties"]["TemplateName"]
+            default_template_data = event["ResourceProperties"]["DefaultTemplateData"]
+            emails = get_new_emails(
+                event["ResourceProperties"]["Emails"],
+                event.get("OldResourceProperties", {}).get("Emails", []),
+            )
+
+            failed_recipients = []
+
+            if emails:
+                passwords = get_secret_values([email["SecretArn"] for email in emails])
+                failed_recipients = send_emails(
+                    email_from, template_name, default_template_data, emails, passwords
+                )
+
+            if failed_recipients:
+                raise RuntimeError(f"Failed to send emails to: {failed_recipients}")
+
+            attributes = {"Response": f"Sent {len(emails)} emails"}
+            cfn_response.send(
+                event, context, cfn_response.SUCCESS, attributes, physical_id
+            )
+
+        if event["RequestType"] in ["Delete"]:
+            attributes = {"Response": "Delete performed"}
+            cfn_response.send(
+                event, context, cfn_response.SUCCESS, attributes, physical_id
+            )
+    except Exception as e:
+        logger.exception("Request failed", e)
+        cfn_response.send(
+            event, context, cfn_response.FAILED, {}, physical_id, reason=str(e)
+        )
+
+
+def get_new_emails(emails, old_emails):
+    """Return the emails whose recipient, by name and address, is not in the emails
+    of the previous deployment."""
+    old_recipients = {(email["Name"], email["EmailTo"]) for email in old_emails}
+
+    return [
+        email
+        for email in emails
+        if (email["Name"], email["EmailTo"]) not in old_recipients
+    ]
+
+
+def get_secret_values(secret_arns):
+    """Return the secret strings by secret arn, reading them in chunks of the
+    BatchGetSecretValue limit. Falls back to GetSecretValue with a boto3 version
+    older than BatchGetSecretValue."""
+    if not hasattr(sm_client, "batch_get_secret_value"):
+        return {
+            secret_arn: sm_client.get_secret_value(SecretId=secret_arn)["SecretString"]
+            for secret_arn in secret_arns
+        }
+
+    values = {}
+
+    for start in range(0, len(secret_arns), MAX_SECRETS_PER_CALL):
+        response = sm_client.batch_get_secret_value(
+            SecretIdList=secret_arns[start : start + MAX_SECRETS_PER_CALL]
+        )
+
+        if response["Errors"]:
+            raise RuntimeError(f"Failed to read secrets: {response['Errors']}")
+
+        for secret in response["SecretValues"]:
+            values[secret["ARN"]] = secret["SecretString"]
+
+    return values
+
+
+def send_emails(email_from, template_name, default_template_data, emails, passwords):
+    """Send the emails in chunks of the SendBulkTemplatedEmail limit, at the maximum
+    send rate of the account, and return the names of the recipients whose email
+    could not be sent."""
+    max_send_rate = ses_client.get_send_quota()["MaxSendRate"]
+    failed_recipients = []
+
+    for start in range(0, len(emails), MAX_DESTINATIONS_PER_CALL):
+        started_at = time.time()
+        chunk = emails[start : start + MAX_DESTINATIONS_PER_CALL]
+
+        try:
+            statuses = send_bulk_email(
+                email_from, template_name, default_template_data, chunk, passwords
+            )
+        except Exception as e:
+            logger.exception("Failed to send emails", e)
+            statuses = [{"Status": "Failed", "Error": str(e)}] * len(chunk)
+
+        for email, status in zip(chunk, statuses):
+            if status["Status"] == "Success":
+                logger.info(
+                    "Sent email",
+                    recipient=email["Name"],
+                    message_id=status["MessageId"],
+                )
+            else:
+                logger.error(
+                    "Failed to send email",
+                    recipient=email["Name"],
+                    status=status["Status"],
+                    error=status.get("Error"),
+                )
+                failed_recipients.append(email["Name"])
+
+        # Each destination counts as one message against the send rate
+        time.sleep(max(len(chunk) / max_send_rate - (time.time() - started_at), 0))
+
+    return failed_recipients
+
+
+def send_bulk_email(
+    email_from, template_name, default_template_data, emails, passwords
+):
+    destinations = [
+        {
+            "Destination": {"ToAddresses": [email["EmailTo"]]},
+            "ReplacementTemplateData": json.dumps(
+                dict(email["TemplateData"], password=passwords[email["SecretArn"]])
+            ),
+        }
+        for email in emails
+    ]
+
+    return ses_client.send_bulk_templated_email(
+        Source=email_from,
+        ReplyToAddresses=[
+            "no-reply@test.com",
+        ],
+        Template=template_name,
+        DefaultTemplateData=json.dumps(default_template_data),
+        Destinations=destinations,
+    )["Status"]
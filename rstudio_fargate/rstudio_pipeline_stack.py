@@ -124,6 +124,39 @@ class RstudioPipelineStack(Stack):
         shiny_share_container_path: str,
         hourly_sync_container_path: str,
         instant_sync_container_path: str,
+        datasync_task_arn: str,
+        datasync_task_arn_cache_ttl_seconds: int,
+        datasync_trigger_queue_name: str,
+        datasync_trigger_queue_arn: str,
+        datasync_trigger_sqs_enabled: bool,
+        datasync_trigger_sqs_batch_size: int,
+        datasync_trigger_sqs_max_batching_window_seconds: int,
+        datasync_trigger_sqs_max_receive_count: int,
+        datasync_directory_filter_threshold: int,
+        datasync_hourly_task_arn_ssm_param_name: str,
+        datasync_incremental_sync_enabled: bool,
+        datasync_incremental_sync_schedule_expression: str,
+        datasync_full_sync_schedule_expression: str,
+        datasync_hourly_task_options: dict,
+        datasync_instant_task_options: dict,
+        datasync_hourly_shards: list,
+        datasync_sync_latency_alarm_threshold_seconds: int,
+        rstudio_shared_service_enabled: bool,
+        rstudio_containers_per_stack: int,
+        rstudio_scale_to_zero_enabled: bool,
+        rstudio_idle_timeout_minutes: int,
+        rstudio_capacity_provider_strategy: dict,
+        shiny_capacity_provider_strategy: dict,
+        rstudio_container_cpu: float,
+        shiny_container_cpu: float,
+        shiny_scaling_schedules: list,
+        shiny_predictive_scaling_enabled: bool,
+        shiny_predictive_scaling_history_weeks: int,
+        shiny_sessions_per_target: int,
+        shiny_apps: list,
+        shiny_app_cache_enabled: bool,
+        shiny_app_cache_refresh_seconds: int,
+        efs_file_system_options: dict,
         **kwargs,
     ) -> None:
         super().__init__(scope, id, **kwargs)
@@ -424,6 +457,20 @@ class RstudioPipelineStack(Stack):
             ssm_cross_account_lambda_role_name=ssm_cross_account_lambda_role_name,
             datasync_task_arn_ssm_param_name=datasync_task_arn_ssm_param_name,
             datasync_function_name=datasync_function_name,
+            datasync_task_arn=datasync_task_arn,
+            datasync_task_arn_cache_ttl_seconds=datasync_task_arn_cache_ttl_seconds,
+            datasync_trigger_queue_name=datasync_trigger_queue_name,
+            datasync_trigger_sqs_enabled=datasync_trigger_sqs_enabled,
+            datasync_trigger_sqs_batch_size=datasync_trigger_sqs_batch_size,
+            datasync_trigger_sqs_max_batching_window_seconds=datasync_trigger_sqs_max_batching_window_seconds,
+            datasync_trigger_sqs_max_receive_count=datasync_trigger_sqs_max_receive_count,
+            datalake_source_bucket_key_instant=datalake_source_bucket_key_instant,
+            datasync_directory_filter_threshold=datasync_directory_filter_threshold,
+            datalake_source_bucket_key_hourly=datalake_source_bucket_key_hourly,
+            datasync_hourly_task_arn_ssm_param_name=datasync_hourly_task_arn_ssm_param_name,
+            datasync_incremental_sync_enabled=datasync_incremental_sync_enabled,
+            datasync_incremental_sync_schedule_expression=datasync_incremental_sync_schedule_expression,
+            datasync_hourly_shards=datasync_hourly_shards,
             env={
                 "account": self.account,
                 "region": self.region,
@@ -441,6 +488,9 @@ class RstudioPipelineStack(Stack):
             datalake_source_bucket_key_hourly=datalake_source_bucket_key_hourly,
             datalake_source_bucket_key_instant=datalake_source_bucket_key_instant,
             lambda_datasync_trigger_function_arn=lambda_datasync_trigger_function_arn,
+            datasync_trigger_sqs_enabled=datasync_trigger_sqs_enabled,
+            datasync_trigger_queue_arn=datasync_trigger_queue_arn,
+            datasync_incremental_sync_enabled=datasync_incremental_sync_enabled,
             athena_output_bucket_name=athena_output_bucket_name,
             athena_workgroup_name=athena_workgroup_name,
             athena_output_bucket_key=athena_output_bucket_key,
@@ -532,11 +582,34 @@ class RstudioPipelineStack(Stack):
             access_point_path_hourly=access_point_path_hourly,
             datalake_source_bucket_key_instant=datalake_source_bucket_key_instant,
             access_point_path_instant=access_point_path_instant,
+            datasync_hourly_task_arn_ssm_param_name=datasync_hourly_task_arn_ssm_param_name,
+            datasync_incremental_sync_enabled=datasync_incremental_sync_enabled,
+            datasync_full_sync_schedule_expression=datasync_full_sync_schedule_expression,
+            datasync_hourly_task_options=datasync_hourly_task_options,
+            datasync_instant_task_options=datasync_instant_task_options,
+            datasync_hourly_shards=datasync_hourly_shards,
+            datasync_sync_latency_alarm_threshold_seconds=datasync_sync_latency_alarm_threshold_seconds,
             athena_output_bucket_key=athena_output_bucket_key,
             home_container_path=home_container_path,
             shiny_share_container_path=shiny_share_container_path,
             hourly_sync_container_path=hourly_sync_container_path,
             instant_sync_container_path=instant_sync_container_path,
+            rstudio_shared_service_enabled=rstudio_shared_service_enabled,
+            rstudio_containers_per_stack=rstudio_containers_per_stack,
+            rstudio_scale_to_zero_enabled=rstudio_scale_to_zero_enabled,
+            rstudio_idle_timeout_minutes=rstudio_idle_timeout_minutes,
+            rstudio_capacity_provider_strategy=rstudio_capacity_provider_strategy,
+            shiny_capacity_provider_strategy=shiny_capacity_provider_strategy,
+            rstudio_container_cpu=rstudio_container_cpu,
+            shiny_container_cpu=shiny_container_cpu,
+            shiny_scaling_schedules=shiny_scaling_schedules,
+            shiny_predictive_scaling_enabled=shiny_predictive_scaling_enabled,
+            shiny_predictive_scaling_history_weeks=shiny_predictive_scaling_history_weeks,
+            shiny_sessions_per_target=shiny_sessions_per_target,
+            shiny_apps=shiny_apps,
+            shiny_app_cache_enabled=shiny_app_cache_enabled,
+            shiny_app_cache_refresh_seconds=shiny_app_cache_refresh_seconds,
+            efs_file_system_options=efs_file_system_options,
             env={
                 "account": self.account,
                 "region": self.region,
@@ -43,6 +43,7 @@ setuptools.setup(
         "aws_cdk.aws_ecs",
         "aws_cdk.aws_eks",
         "aws_cdk.aws_ecs-patterns",
+        "aws_cdk.aws_applicationautoscaling",
         "aws_cdk.aws_certificatemanager",
         "aws_cdk.aws_route53",
         "aws_cdk.aws_route53_targets",
@@ -53,7 +54,13 @@ setuptools.setup(
         "aws_cdk.aws_sns_subscriptions",
         "aws_cdk.aws_events",
         "aws_cdk.aws_events_targets",
+        "aws_cdk.aws_sqs",
+        "aws_cdk.aws_lambda_event_sources",
+        "aws_cdk.aws_dynamodb",
+        "aws_cdk.aws_cloudwatch",
+        "aws_cdk.aws_ses",
         "aws_cdk.aws_elasticloadbalancingv2",
+        "aws_cdk.aws_elasticloadbalancingv2_targets",
         "aws_cdk.aws_secretsmanager",
         "aws_cdk.aws_ecr_assets",
         "aws_cdk.aws_datasync",
@@ -0,0 +1,234 @@
+"""
+Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+SPDX-License-Identifier: MIT-0
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this
+software and associated documentation files (the "Software"), to deal in the Software
+without restriction, including without limitation the rights to use, copy, modify,
+merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+permit persons to whom the Software is furnished to do so.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+ OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+OFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+This script is the local test harness of the DataSync trigger. It replays bursts of
+S3 object created events against the trigger handler, with a fake DataSync client
+whose executions take a fixed time and the in-memory execution store, and reports
+the executions started against the objects they cover. It needs no AWS account:
+
+    python tools/replay_s3_events.py --bursts 5 --objects-per-burst 200 --execution-seconds 60
+
+Every event runs through the same handler code as in the lambda, including the
+coalescing of the keys, the include filters and the DataSync state change events.
+
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import types
+from datetime import datetime, timedelta, timezone
+
+# The handler reads its configuration and the lambda layer at import time
+REPOSITORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TRIGGER_PATH = os.path.join(REPOSITORY_PATH, "rstudio_fargate", "datasync_trigger")
+LAMBDA_LAYER_PATH = os.path.join(
+    REPOSITORY_PATH, "rstudio_fargate", "rstudio", "custom", "lambda_layer", "python"
+)
+TASK_ARN = "arn:aws:datasync:us-east-1:111111111111:task/task-replay"
+SOURCE_SUBDIRECTORY = "instant"
+
+
+class InvalidRequestException(Exception):
+    pass
+
+
+class FakeDataSync:
+    """DataSync client running one execution of the task at a time, each execution
+    taking execution_seconds of the replay clock."""
+
+    exceptions = types.SimpleNamespace(InvalidRequestException=InvalidRequestException)
+
+    def __init__(self, execution_seconds):
+        self.execution_seconds = execution_seconds
+        self.now = datetime(2021, 1, 1, tzinfo=timezone.utc)
+        self.running = None
+        self.executions = []
+        self.rejected = 0
+
+    def describe_task(self, TaskArn):
+        if self.running is None:
+            return {"Status": "AVAILABLE"}
+
+        return {
+            "Status": "RUNNING",
+            "CurrentTaskExecutionArn": self.running["TaskExecutionArn"],
+        }
+
+    def start_task_execution(self, TaskArn, OverrideOptions, Includes):
+        if self.running is not None:
+            self.rejected += 1
+            raise InvalidRequestException("An execution of the task is running")
+
+        self.running = {
+            "TaskExecutionArn": f"{TaskArn}/execution/exec-{len(self.executions)}",
+            "Includes": Includes,
+            "finishes_at": self.now + timedelta(seconds=self.execution_seconds),
+        }
+        self.executions.append(self.running)
+        return {"TaskExecutionArn": self.running["TaskExecutionArn"]}
+
+    def describe_task_execution(self, TaskExecutionArn):
+        return {"Status": "SUCCESS", "Result": {}}
+
+
+def install_fake_boto3(datasync):
+    # The handler creates its clients at import time
+    boto3 = types.ModuleType("boto3")
+    boto3.client = lambda service_name, **kwargs: (
+        datasync if service_name == "datasync" else None
+    )
+    sys.modules["boto3"] = boto3
+
+
+def get_s3_event(object_keys, event_time):
+    return {
+        "Records": [
+            {
+                "eventSource": "aws:s3",
+                "eventTime": event_time.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                "s3": {"object": {"key": object_key}},
+            }
+            for object_key in object_keys
+        ]
+    }
+
+
+def get_state_change_event(execution):
+    return {
+        "source": "aws.datasync",
+        "resources": [execution["TaskExecutionArn"]],
+        "detail": {"State": "SUCCESS"},
+    }
+
+
+def get_bursts(bursts, objects_per_burst, burst_seconds, gap_seconds, seed):
+    """Return the (seconds since the start, object key) uploads of the bursts, spread
+    at random within each burst."""
+    rng = random.Random(seed)
+    uploads = []
+
+    for burst in range(bursts):
+        burst_start = burst * (burst_seconds + gap_seconds)
+
+        for index in range(objects_per_burst):
+            folder = f"folder{rng.randrange(max(objects_per_burst // 50, 1))}"
+            uploads.append(
+                (
+                    burst_start + rng.uniform(0, burst_seconds),
+                    f"{SOURCE_SUBDIRECTORY}/burst{burst}/{folder}/object{index}.csv",
+                )
+            )
+
+    return sorted(uploads)
+
+
+def replay(uploads, records_per_event, execution_seconds, verbose):
+    datasync = FakeDataSync(execution_seconds)
+    install_fake_boto3(datasync)
+    sys.path[:0] = [TRIGGER_PATH, LAMBDA_LAYER_PATH]
+    os.environ.update(
+        DATASYNC_TASK_ARN=TASK_ARN,
+        DATASYNC_SOURCE_SUBDIRECTORY=SOURCE_SUBDIRECTORY,
+        DATASYNC_SCHEDULER_TABLE_NAME="",
+    )
+    import trigger_datasync_handler as handler
+
+    start = datasync.now
+    context = types.SimpleNamespace(aws_request_id="replay")
+    covered_keys = set()
+    remove_pending = handler.scheduler.store.remove_pending
+
+    def record_covered_keys(scope, object_keys):
+        covered_keys.update(object_keys)
+        remove_pending(scope, object_keys)
+
+    handler.scheduler.store.remove_pending = record_covered_keys
+
+    def invoke(event):
+        # The handler logs and metrics go to stdout like in the lambda
+        output = io.StringIO()
+
+        with contextlib.redirect_stdout(sys.stdout if verbose else output):
+            handler.lambda_handler(event, context)
+
+    def finish_executions(until):
+        # Deliver the state change events of the executions finished by then
+        while datasync.running and datasync.running["finishes_at"] <= until:
+            execution = datasync.running
+            datasync.now = execution["finishes_at"]
+            datasync.running = None
+            invoke(get_state_change_event(execution))
+
+    events = 0
+
+    for index in range(0, len(uploads), records_per_event):
+        batch = uploads[index : index + records_per_event]
+        event_time = start + timedelta(seconds=batch[-1][0])
+
+        finish_executions(event_time)
+        datasync.now = event_time
+        invoke(get_s3_event([object_key for _, object_key in batch], event_time))
+        events += 1
+
+    finish_executions(datetime.max.replace(tzinfo=timezone.utc))
+
+    objects = len({object_key for _, object_key in uploads})
+    executions = len(datasync.executions)
+
+    print(f"events: {events}")
+    print(f"objects uploaded: {objects}")
+    print(f"executions started: {executions}")
+    print(f"executions rejected by DataSync: {datasync.rejected}")
+    print(f"objects covered: {len(covered_keys)}")
+    print(f"objects still queued: {objects - len(covered_keys)}")
+
+    if executions:
+        print(f"objects per execution: {len(covered_keys) / executions:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay bursts of S3 events against the DataSync trigger"
+    )
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--objects-per-burst", type=int, default=200)
+    parser.add_argument("--records-per-event", type=int, default=1)
+    parser.add_argument("--burst-seconds", type=float, default=10)
+    parser.add_argument("--gap-seconds", type=float, default=300)
+    parser.add_argument("--execution-seconds", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--verbose", action="store_true", help="Print the handler logs and metrics"
+    )
+    args = parser.parse_args()
+
+    replay(
+        get_bursts(
+            args.bursts,
+            args.objects_per_burst,
+            args.burst_seconds,
+            args.gap_seconds,
+            args.seed,
+        ),
+        args.records_per_event,
+        args.execution_seconds,
+        args.verbose,
+    )